@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+
+"""
+measures the memory allocated while building the contraptions of the synthetic songs (see bench.py) with tracemalloc,
+per placed block, in several commits, so that the trees before and after a change can be compared
+
+    python benchmarks/alloc_bench.py                       # before and after the immutable vectors, and this tree
+    python benchmarks/alloc_bench.py small -r HEAD~3 HEAD  # only the small case, in these commits
+
+a commit is taken out of git (only its galaxy_jukebox) into a temporary directory, "." is the tree next to this
+directory, with its uncommitted changes; every tree is measured in a process of its own, so nothing is shared
+the schematic isn't written, only built, and for every tree it's printed per placed block:
+- peak: the most memory that was allocated at the same time while the song was read and built
+- kept: the memory allocated when the build is done, and the contraption is still there
+- allocations: how many memory blocks that is (tracemalloc's traces)
+tracemalloc sees the memory that is allocated at a given moment, so a temporary object (e.g. a vector that is only
+used to compute a position) shows up in the peak only, if there are enough of them at the same time
+"""
+
+import sys
+from os.path import dirname, abspath, join
+from subprocess import run
+from json import loads, dumps
+from io import BytesIO
+import tarfile
+
+HERE = dirname(abspath(__file__))
+CONVERTER = dirname(HERE)
+
+# runs in the measuring process: builds song_path with the galaxy_jukebox in tree, prints the measurements as json
+def measure(tree, song_path):
+    sys.path.insert(0, tree)
+    import tracemalloc
+    import galaxy_jukebox.main as m
+    built = {}
+    if hasattr(m, "export"): # the block buffer, with the exporters
+        m.export = lambda blocks, *args: built.update(blocks=blocks, count=len(blocks))
+    elif hasattr(m, "save_schematic"): # the block buffer, written by sponge.save_schematic
+        m.save_schematic = lambda blocks, *args, **kwargs: built.update(blocks=blocks, count=len(blocks))
+    else: # built into mcschematic, like in the beginning, every setBlock is a placement
+        set_block = m.MCSchematic.setBlock
+        def counting_set_block(schem, *args):
+            built["count"] = built.get("count", 0) + 1
+            return set_block(schem, *args)
+        m.MCSchematic.setBlock = counting_set_block
+        m.MCSchematic.save = lambda schem, *args: built.update(blocks=schem)
+    tracemalloc.start()
+    m.convert(song_path, song_path[:-4] + ".schem")
+    kept, peak = tracemalloc.get_traced_memory()
+    allocations = len(tracemalloc.take_snapshot().traces)
+    tracemalloc.stop()
+    print(dumps({"blocks": built["count"], "peak": peak, "kept": kept, "allocations": allocations}))
+
+# the galaxy_jukebox of revision, extracted into directory, returns the directory that has to be on the path
+def extract(revision, directory):
+    if revision == ".":
+        return CONVERTER
+    archive = run(["git", "archive", "--format=tar", revision, "galaxy_jukebox"], cwd=CONVERTER, capture_output=True, check=True).stdout
+    with tarfile.open(fileobj=BytesIO(archive)) as tar:
+        tar.extractall(directory)
+    return directory
+
+# the commit that made the vectors immutable (the first one with a Cursor), and the one before it
+def default_revisions():
+    introduced = run(["git", "log", "--reverse", "--format=%h", "-S", "class Cursor", "--", "galaxy_jukebox/vector.py"],
+                     cwd=CONVERTER, capture_output=True, text=True).stdout.split()
+    return [introduced[0] + "^", introduced[0], "."] if introduced else ["."]
+
+def main():
+    from argparse import ArgumentParser
+    from tempfile import TemporaryDirectory
+    sys.path.insert(0, HERE)
+    from bench import CASES
+    from synthetic_song import synthetic_song
+
+    parser = ArgumentParser(description="Measures the memory allocated per placed block while building, in several commits.")
+    parser.add_argument("cases", nargs="*", metavar="case", help=f"the cases to run: {', '.join(CASES)} (default: small medium)")
+    parser.add_argument("-r", "--revisions", nargs="+", default=None, help="the commits to compare, . is this tree (default: before and after the immutable vectors, and .)")
+    args = parser.parse_args()
+    for name in args.cases:
+        if name not in CASES:
+            parser.error(f"there's no case {name}, only {', '.join(CASES)}")
+
+    revisions = args.revisions or default_revisions()
+    with TemporaryDirectory() as directory:
+        trees = {}
+        for index, revision in enumerate(revisions):
+            trees[revision] = extract(revision, join(directory, f"tree{index}"))
+        for name in args.cases or ["small", "medium"]:
+            song_path = join(directory, name + ".nbs")
+            synthetic_song(**CASES[name]).save(song_path)
+            for revision in revisions:
+                output = run([sys.executable, abspath(__file__), "--measure", trees[revision], song_path], capture_output=True, text=True, check=True).stdout
+                result = loads(output.splitlines()[-1])
+                blocks = result["blocks"]
+                print(f"{name:<7} {revision:<10} {blocks:8} blocks   peak {result['peak'] / blocks:7.1f} B   kept {result['kept'] / blocks:7.1f} B   "
+                      f"{result['allocations'] / blocks:6.3f} allocations per placed block", flush=True)
+
+
+if __name__ == '__main__':
+    if sys.argv[1:2] == ["--measure"]:
+        measure(sys.argv[2], sys.argv[3])
+    else:
+        main()
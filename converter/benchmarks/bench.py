@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+
+"""
+benchmarks the conversion of synthetic songs, from 10 up to 2000 lines, stage by stage
+
+    python benchmarks/bench.py                  # every case, checked against golden.json
+    python benchmarks/bench.py tiny small       # only these cases
+    python benchmarks/bench.py --record         # also append the results to results.jsonl
+    python benchmarks/bench.py --update-golden  # after a change that is meant to change the output
+
+the galaxy_jukebox next to this directory is benchmarked (not an installed one), so the results of
+different commits can be compared: --record saves the commit along with the times
+the golden hash of a case is the hash of the uncompressed schematic, so it proves that the
+output (every block, the palette, the block entities) didn't change
+"""
+
+import sys
+from os.path import dirname, abspath, join
+sys.path.insert(0, dirname(dirname(abspath(__file__))))
+
+from argparse import ArgumentParser
+from hashlib import sha256
+from gzip import decompress
+from json import load, dump, dumps
+from tempfile import TemporaryDirectory
+from time import strftime
+from platform import python_version, machine, system
+from subprocess import run
+from synthetic_song import synthetic_song
+from galaxy_jukebox import convert, __version__
+from galaxy_jukebox.profiler import Profiler
+
+HERE = dirname(abspath(__file__))
+GOLDEN_PATH = join(HERE, "golden.json")
+RESULTS_PATH = join(HERE, "results.jsonl")
+
+# name: the arguments of synthetic_song
+CASES = {
+    "tiny": dict(notes=100, pitches=6, odd_ratio=0.0), # about 10 lines, all even
+    "small": dict(notes=1000, pitches=40), # about 150 lines
+    "medium": dict(notes=4000, pitches=150, polyphony=2), # about 700 lines
+    "large": dict(notes=10000, pitches=400, polyphony=2), # about 2000 lines
+    "long": dict(notes=20000, pitches=100, length=12000, odd_ratio=0.2), # 10 minutes, long spirals
+}
+
+def _hash(data):
+    return sha256(data).hexdigest()
+
+# the commit of the benchmarked tree, and whether it has uncommitted changes, None if it isn't a git repository
+def _commit():
+    try:
+        commit = run(["git", "rev-parse", "HEAD"], cwd=HERE, capture_output=True, text=True).stdout.strip()
+        dirty = run(["git", "status", "--porcelain", "--", ".."], cwd=HERE, capture_output=True, text=True).stdout.strip() != ""
+    except OSError:
+        return None, None
+    return commit or None, dirty
+
+# converts the song of the case repeat times, returns the result of the fastest run
+def run_case(name, directory, repeat=1):
+    song_path = join(directory, name + ".nbs")
+    schem_path = join(directory, name + ".schem")
+    synthetic_song(**CASES[name]).save(song_path)
+    with open(song_path, "rb") as nbs:
+        song_hash = _hash(nbs.read())
+    best = None
+    for i in range(repeat):
+        profile = Profiler()
+        convert(song_path, schem_path, profile=profile)
+        total = sum(wall for wall, cpu, calls, depth in profile.stages.values() if depth == 0)
+        if best is None or total < best[0]:
+            best = total, profile
+    total, profile = best
+    with open(schem_path, "rb") as schem:
+        output_hash = _hash(decompress(schem.read()))
+    return {
+        "lines": len(profile.lines),
+        "total": total,
+        "stages": {name: wall for name, (wall, cpu, calls, depth) in profile.stages.items()},
+        "song": song_hash,
+        "output": output_hash,
+    }
+
+def main():
+    parser = ArgumentParser(description="Benchmarks the conversion of synthetic songs.")
+    parser.add_argument("cases", nargs="*", metavar="case", help=f"the cases to run: {', '.join(CASES)} (default: all)")
+    parser.add_argument("-r", "--repeat", type=int, default=1, help="convert every song this many times, the fastest one counts (default: 1)")
+    parser.add_argument("--record", action="store_true", help=f"append the results to {RESULTS_PATH}")
+    parser.add_argument("--update-golden", action="store_true", help=f"save the output hashes as the golden ones into {GOLDEN_PATH}")
+    args = parser.parse_args()
+    for name in args.cases:
+        if name not in CASES:
+            parser.error(f"there's no case {name}, only {', '.join(CASES)}")
+
+    with open(GOLDEN_PATH) as golden_file:
+        golden = load(golden_file)
+    results = {}
+    mismatches = []
+    with TemporaryDirectory() as directory:
+        for name in args.cases or CASES:
+            result = results[name] = run_case(name, directory, args.repeat)
+            expected = golden.get(name)
+            if args.update_golden:
+                golden[name] = {"song": result["song"], "output": result["output"]}
+                status = "golden updated"
+            elif expected is None:
+                status = "no golden hash"
+            elif expected["song"] != result["song"]:
+                status = "THE SONG CHANGED, the generator isn't the same"
+                mismatches.append(name)
+            elif expected["output"] != result["output"]:
+                status = "THE OUTPUT CHANGED"
+                mismatches.append(name)
+            else:
+                status = "same output"
+            slowest = sorted(((wall, stage) for stage, wall in result["stages"].items() if stage != "build_contraption"), reverse=True)[:3]
+            print(f"{name:<7} {result['lines']:5} lines {result['total']:7.3f}s  {status}  (slowest: "
+                  + ", ".join(f"{stage} {wall:.3f}s" for wall, stage in slowest) + ")", flush=True)
+
+    if args.update_golden:
+        with open(GOLDEN_PATH, "w") as golden_file:
+            dump(golden, golden_file, indent=1, sort_keys=True)
+            golden_file.write("\n")
+    if args.record:
+        commit, dirty = _commit()
+        record = {"date": strftime("%Y-%m-%dT%H:%M:%S%z"), "commit": commit, "dirty": dirty, "version": __version__,
+                  "python": python_version(), "platform": f"{system()} {machine()}", "repeat": args.repeat,
+                  "cases": {name: {key: result[key] for key in ["lines", "total", "stages"]} for name, result in results.items()}}
+        with open(RESULTS_PATH, "a") as results_file:
+            results_file.write(dumps(record) + "\n")
+    if mismatches:
+        print(f"The output of {', '.join(mismatches)} doesn't match the golden hash!")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
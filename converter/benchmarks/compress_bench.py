@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+
+"""
+compares saving the schematics of the synthetic songs (see bench.py) with one thread and with the
+parallel gzip writer (see galaxy_jukebox.parallel_gzip), at a few compression levels
+
+    python benchmarks/compress_bench.py                       # every case, levels 1, 6 and 9, one thread per CPU core (at least 2)
+    python benchmarks/compress_bench.py large long -t 4 -l 9  # only these cases, with 4 threads, level 9
+
+the contraption is built once per case, and resolved into a Volume, so only the writing of the
+schematic is timed; the uncompressed schematics are checked to be the same
+the parallel writer runs on at least 2 threads, with 1 it would be the same GzipFile as the single threaded one,
+but with fewer cores than threads, it can't be faster, so its times only say something on a multi-core machine
+"""
+
+import sys
+from os import cpu_count
+from os.path import dirname, abspath, join, getsize
+sys.path.insert(0, dirname(dirname(abspath(__file__))))
+
+from argparse import ArgumentParser
+from gzip import decompress
+from tempfile import TemporaryDirectory
+from time import perf_counter
+from bench import CASES
+from synthetic_song import synthetic_song
+from galaxy_jukebox.nbs import read_song
+from galaxy_jukebox.main import get_lines
+from galaxy_jukebox.layout import get_layout
+from galaxy_jukebox.block_buffer import BlockBuffer
+from galaxy_jukebox.split_lines import build_contraption
+from galaxy_jukebox.volume import Volume
+from galaxy_jukebox.sponge import save_schematic
+
+# the Volume of the contraption of the song of the case
+def case_volume(name, directory):
+    song_path = join(directory, name + ".nbs")
+    synthetic_song(**CASES[name]).save(song_path)
+    title, unsplit_lines, lines = get_lines(read_song(song_path), song_path)
+    blocks = BlockBuffer()
+    build_contraption(blocks, lines, *get_layout(len(lines), -1), title, True)
+    return Volume.from_buffer(blocks)
+
+# saves volume repeat times, returns the fastest time, the size and the uncompressed content of the file
+def time_save(volume, path, level, threads, repeat):
+    best = None
+    for i in range(repeat):
+        start = perf_counter()
+        save_schematic(volume, path, compress_level=level, compress_threads=threads)
+        seconds = perf_counter() - start
+        best = seconds if best is None else min(best, seconds)
+    with open(path, "rb") as schem:
+        content = decompress(schem.read())
+    return best, getsize(path), content
+
+def main():
+    parser = ArgumentParser(description="Compares single threaded and parallel gzip compression of the schematics.")
+    parser.add_argument("cases", nargs="*", metavar="case", help=f"the cases to run: {', '.join(CASES)} (default: all)")
+    parser.add_argument("-t", "--threads", type=int, default=max(2, cpu_count() or 1), help="threads of the parallel writer, at least 2 (default: CPU count, at least 2)")
+    parser.add_argument("-l", "--levels", type=int, nargs="+", default=[1, 6, 9], help="the compression levels to compare (default: 1 6 9)")
+    parser.add_argument("-r", "--repeat", type=int, default=3, help="save every schematic this many times, the fastest one counts (default: 3)")
+    args = parser.parse_args()
+    for name in args.cases:
+        if name not in CASES:
+            parser.error(f"there's no case {name}, only {', '.join(CASES)}")
+    if args.threads < 2:
+        parser.error("the parallel writer needs at least 2 threads, with 1 it's the same as the single threaded one")
+
+    print(f"{cpu_count()} CPU cores, parallel writer on {args.threads} threads")
+    if (cpu_count() or 1) < 2:
+        print("There's only one core, the parallel writer can't be faster here, measure it on a multi-core machine!")
+    mismatches = []
+    with TemporaryDirectory() as directory:
+        for name in args.cases or CASES:
+            volume = case_volume(name, directory)
+            path = join(directory, name + ".schem")
+            for level in args.levels:
+                single, single_size, single_content = time_save(volume, path, level, 1, args.repeat)
+                parallel, parallel_size, parallel_content = time_save(volume, path, level, args.threads, args.repeat)
+                status = "same content" if single_content == parallel_content else "THE CONTENT DIFFERS"
+                if single_content != parallel_content:
+                    mismatches.append(f"{name} (level {level})")
+                print(f"{name:<7} level {level}  1 thread {single:6.3f}s {single_size / 1024:8.0f} KiB   "
+                      f"{args.threads} threads {parallel:6.3f}s {parallel_size / 1024:8.0f} KiB   {single / parallel:4.2f}x  {status}", flush=True)
+    if mismatches:
+        print(f"The parallel output of {', '.join(mismatches)} isn't the same schematic!")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+
+from random import Random
+import pynbs
+
+"""
+a deterministic random song: the same arguments always give the same song (and the same .nbs bytes)
+notes: how many notes there are in the song
+pitches: how many different instrument-pitch pairs they are spread over (at most 16*25), this is roughly
+         the number of lines, before they are split further
+polyphony: the most notes of the same instrument and pitch at the same time (a chord plays 1 to polyphony of them)
+length: the length of the song, in ticks (by default every pitch has a note every 16 ticks on average)
+odd_ratio: how many of the notes are on odd ticks, the tempo is 20 ticks/s, so these are odd gameticks
+           and need their own lines
+"""
+def synthetic_song(notes, pitches=50, polyphony=1, length=None, odd_ratio=0.5, seed=0):
+    assert 1 <= pitches <= 16 * 25, f"There are only 16*25 instrument-pitch pairs, {pitches} is too many!"
+    rng = Random(seed)
+    if length is None:
+        length = max(2, 16 * notes // pitches)
+    chosen = rng.sample([(instrument, key) for instrument in range(16) for key in range(33, 58)], pitches)
+    chords = {} # tick: [(instrument, key)]
+    placed = 0
+    while placed < notes:
+        tick = rng.randrange(0, length, 2)
+        if rng.random() < odd_ratio:
+            tick += 1
+        instrument, key = rng.choice(chosen)
+        count = min(rng.randint(1, polyphony), notes - placed)
+        chords.setdefault(tick, []).extend([(instrument, key)] * count)
+        placed += count
+
+    song = pynbs.new_file(song_name=f"Synthetic {notes} {pitches} {polyphony} {length} {odd_ratio} {seed}", tempo=20.0)
+    for tick in sorted(chords):
+        for layer, (instrument, key) in enumerate(sorted(chords[tick])):
+            song.notes.append(pynbs.Note(tick, layer, instrument, key))
+    song.layers = [pynbs.Layer(layer) for layer in range(max(len(chord) for chord in chords.values()))]
+    return song
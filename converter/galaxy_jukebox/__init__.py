@@ -4,4 +4,6 @@
 
 __version__ = "1.0.0"
 
-from .main import convert
\ No newline at end of file
+from .main import convert, estimate
+from .batch import convert_many
+from .watch import watch_folder
@@ -1,23 +1,120 @@
 #!/usr/bin/env python3
 
-from sys import argv
-from .main import convert
+from sys import exit
+from os.path import isfile, isdir
+from argparse import ArgumentParser
+from .main import convert, estimate
+from .nbs import read_song
+from .unsplit_lines import song_min_line_count
+from .batch import collect_inputs, convert_many
+from .watch import watch_folder
+from .cache import ConversionCache, DEFAULT_MAX_SIZE
+from .profiler import Profiler
+from .layout import OBJECTIVES, LINE_ORDERS
+from .exporters import FORMATS
 from . import __version__
 
+# input is converted as a batch, if it's a directory, a glob pattern or a manifest file instead of a single .nbs
+def is_batch_input(input):
+    return input[-4:] != ".nbs" or (not isfile(input) and any(c in input for c in "*?["))
+
 def cli_main():
-    if not 3 <= len(argv) <= 5:
-        print(f"Version {__version__}\nUsage: {argv[0]} input.nbs output.schem [use_redstone_lamp: True or False] [sides: -1, 1, 2 or 3]\n(Where [...] is optional)")
-    else:
-        lamp = True
-        sides = -1
-        if len(argv) >= 4:
-            assert argv[3] == "True" or argv[3] == "False", "Use redstone lamp's value should be True or False!"
-            lamp = argv[3] == "True"
-        if len(argv) == 5:
-            sides = int(argv[4])
-            assert sides == -1 or sides == 1 or sides == 2 or sides == 3, "Sides mode's value should be -1, 1, 2 or 3!"
-        convert(argv[1], argv[2], use_redstone_lamp=lamp, sides_mode=sides)
+    parser = ArgumentParser(prog="galaxy-jukebox", description=f"Galaxy Jukebox {__version__}: converts Note Block Studio songs into schematics.")
+    parser.add_argument("input", nargs="?", help="input.nbs, or for batch mode: a directory, a glob pattern (quoted) or a manifest file listing one .nbs per line")
+    parser.add_argument("output", nargs="?", help="output.schem, or the output directory in batch mode")
+    parser.add_argument("use_redstone_lamp", nargs="?", default="True", choices=["True", "False"], metavar="use_redstone_lamp", help="place redstone lamp next to the noteblocks (default: True)")
+    parser.add_argument("sides", nargs="?", type=int, default=-1, choices=[-1, 1, 2, 3], metavar="sides", help="how many sides the noteblocks should have, -1 is automatic (default: -1)")
+    parser.add_argument("--layout", choices=list(OBJECTIVES), default=None, help="search for the layout with the smallest render distance, schematic volume or block count, instead of the fixed 2:1 rectangles (sides -1 lets it choose the side count too)")
+    parser.add_argument("--line-order", choices=LINE_ORDERS, default="pitch", help="pitch: the lines are placed on the wall by instrument and note, spiral: the ones with the longest spirals go into the first columns, for a smaller render distance (default: pitch)")
+    parser.add_argument("--format", choices=list(FORMATS), default=None, help="sponge: .schem, litematic: .litematic (Litematica), anvil: written straight into the region files of a world, the output is its region directory (default: from the extension of the output, otherwise sponge)")
+    parser.add_argument("--offset", type=int, nargs=3, default=None, metavar=("X", "Y", "Z"), help="with --format anvil (and only with it, it's needed there): where the start button goes in the world")
+    parser.add_argument("--compress-level", type=int, default=9, choices=range(10), metavar="LEVEL", help="the gzip level of the schematic, 0-9, lower is faster but bigger (default: 9)")
+    parser.add_argument("--compress-threads", type=int, default=1, metavar="N", help="compress the schematic in blocks on N threads, 0 is one per CPU core (default: 1, in one piece)")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="worker processes to use: in batch mode one song is converted by each (default: CPU count), otherwise they build the lines of the song (default: 1)")
+    parser.add_argument("--no-cache", action="store_true", help="convert every song, even if it has been converted with the same options already")
+    parser.add_argument("--cache-dir", default=None, help="where the converted schematics are cached (default: the user cache directory, or GALAXY_JUKEBOX_CACHE_DIR)")
+    parser.add_argument("--cache-size", type=int, default=None, help=f"the least recently used schematics are removed from the cache above this size, in MiB (default: {DEFAULT_MAX_SIZE >> 20})")
+    parser.add_argument("--prune-cache", action="store_true", help="shrink the cache to --cache-size if given, otherwise empty it (input and output can be left out then)")
+    parser.add_argument("--estimate", action="store_true", help="only estimate the size, block count, render distance and conversion time, without converting (the output can be left out then)")
+    parser.add_argument("--watch", action="store_true", help="keep running, and convert every .nbs file in the input directory into the output directory whenever one is added or saved (stop it with Ctrl+C)")
+    parser.add_argument("--debounce", type=float, default=0.5, metavar="SECONDS", help="with --watch: convert a file only when it hasn't changed for this long (default: 0.5)")
+    parser.add_argument("--profile", metavar="REPORT", default=None, help="time every stage of the conversion (of a single song), write the times into REPORT as JSON, and print a summary")
+    parser.add_argument("--profile-top", type=int, default=10, metavar="N", help="how many of the slowest lines the profile summary lists (default: 10)")
+    parser.add_argument("--version", action="version", version=__version__)
+    args = parser.parse_args()
+    lamp = args.use_redstone_lamp == "True"
+    compression = dict(compress_level=args.compress_level, compress_threads=args.compress_threads or None)
+    cache_size = DEFAULT_MAX_SIZE if args.cache_size is None else args.cache_size << 20
+    cache = None if args.no_cache else ConversionCache(args.cache_dir, cache_size)
+
+    if args.prune_cache:
+        pruned = ConversionCache(args.cache_dir)
+        removed, freed = pruned.prune(0 if args.cache_size is None else cache_size)
+        print(f"Removed {removed} schematics ({freed / (1 << 20):.1f} MiB) from the cache in {pruned.directory}")
+        if args.input is None:
+            return
+    if args.input is not None and args.estimate:
+        for input in ([args.input] if not is_batch_input(args.input) else collect_inputs(args.input)):
+            try:
+                e = estimate(input, use_redstone_lamp=lamp, sides_mode=args.sides, layout_objective=args.layout, line_order=args.line_order)
+            except Exception as error:
+                print(f"{input}: FAILED {type(error).__name__}: {error}", flush=True)
+                continue
+            print(f"{input}: {e.lines} lines (at least {e.min_lines} needed), {'x'.join(map(str, e.size))} blocks big, about {e.blocks} blocks, "
+                  f"render distance {e.render_distance}, about {e.seconds:.1f}s to convert "
+                  f"(sides {e.widths[0]}+{e.widths[1]}+{e.widths[2]} wide, {e.height} high)", flush=True)
+        return
+    if args.input is None or args.output is None:
+        parser.error("the input and the output are required")
+
+    if args.format == "anvil" and is_batch_input(args.input):
+        parser.error("--format anvil only works when converting a single song")
+    if args.format == "anvil" and args.offset is None:
+        parser.error("--format anvil needs --offset X Y Z, where the start button goes in the world (the contraption goes below and behind it)")
+
+    if args.watch:
+        if not isdir(args.input):
+            parser.error("--watch needs an input directory")
+        if args.format == "anvil":
+            parser.error("--watch can't write into a world, the songs would be built into each other")
+        print(f"Watching {args.input}, converting into {args.output} (stop with Ctrl+C)", flush=True)
+        try:
+            for result in watch_folder(args.input, args.output, lamp, args.sides, args.jobs, cache=cache, layout_objective=args.layout, line_order=args.line_order,
+                                       output_format=args.format or "sponge", debounce=args.debounce, **compression):
+                if result.ok:
+                    print(f"{result.input} -> {result.output} ({result.seconds:.1f}s)", flush=True)
+                else:
+                    print(f"FAILED {result.input}: {result.error}", flush=True)
+        except KeyboardInterrupt:
+            print("Stopped watching")
+        return
+
+    if not is_batch_input(args.input):
+        profile = None if args.profile is None else Profiler()
+        convert(args.input, args.output, use_redstone_lamp=lamp, sides_mode=args.sides, cache=cache, jobs=args.jobs or 1, profile=profile, layout_objective=args.layout, line_order=args.line_order,
+                output_format=args.format, world_offset=args.offset and tuple(args.offset), **compression)
+        print(f"{args.input}: at least {song_min_line_count(read_song(args.input))} lines needed", flush=True)
+        if profile is not None:
+            profile.save(args.profile)
+            print(profile.summary(args.profile_top))
+        return
+    if args.profile is not None:
+        parser.error("--profile only works when converting a single song")
+
+    inputs = collect_inputs(args.input) # only once, a manifest or a glob could change between two reads
+    total = len(inputs)
+    failed = 0
+    for done, result in enumerate(convert_many(inputs, args.output, lamp, args.sides, args.jobs, cache=cache, layout_objective=args.layout, line_order=args.line_order,
+                                                          output_format=args.format or "sponge", **compression), start=1):
+        if result.ok:
+            print(f"[{done}/{total}] {result.input} -> {result.output} ({result.seconds:.1f}s)", flush=True)
+        else:
+            failed += 1
+            print(f"[{done}/{total}] FAILED {result.input}: {result.error}", flush=True)
+    if failed:
+        print(f"{failed} of {total} conversions failed!")
+        exit(1)
 
 
 if __name__ == '__main__':
-    cli_main()
\ No newline at end of file
+    cli_main()
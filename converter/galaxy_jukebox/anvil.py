@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+
+from io import BytesIO
+from os import makedirs, replace, getpid
+from os.path import join, isfile, dirname
+from time import time
+from struct import Struct
+from zlib import compress, decompress
+from gzip import decompress as gzip_decompress
+import numpy as np
+from nbtlib import parse_nbt, load, File, Compound, List, String, Byte, Int, LongArray
+from .nbt import NbtWriter, COMPOUND
+from .volume import Volume, block_state, parse_state, pack_bits, unpack_bits, block_entity_id
+from .sponge import DATA_VERSION_1_14
+
+SECTOR = 4096 # region files are allocated in sectors of this many bytes
+ZLIB = 2 # the compression type of the chunks
+
+_location = Struct(">I") # sector offset << 8 | sector count
+_timestamp = Struct(">I") # when the chunk was last written, in seconds
+_chunk_header = Struct(">IB") # length (with the compression type), compression type
+
+"""
+writes volume (a Volume, or a BlockBuffer which is resolved into one) straight into the region files (r.X.Z.mca)
+of a world, in directory (the world's region directory), so that the world doesn't have to be edited afterwards
+offset is where the buffer's origin (the position of the start button, see split_lines.build_contraption) goes in the world,
+there's no default, as the contraption goes below the start button, and it has to fit into the world
+this only works with the worlds of Minecraft 1.14 and 1.15: the new chunks are written for 1.14 (data_version),
+without light, that the game computes when it loads them, and the chunks that already exist are merged into
+(see _merge_chunk): the bounding box of the contraption is replaced, air included, the blocks, block entities and
+everything else outside of it are kept; from 1.16 on, the blocks of a section are packed differently, and 1.18
+moved everything in a chunk around, so a world (its level.dat next to directory, if there is one) or an existing
+chunk of any other version is refused, before anything is written
+the chunks that are written get the current time as their timestamp, the others in the region files keep theirs
+a region file is written into a temporary file first, and moved into place when it's complete, so a region
+file is never left half written, but the world shouldn't be open in the game (or a server) while it's written
+returns the paths of the region files written
+"""
+def save_region_files(volume, directory, offset, data_version=DATA_VERSION_1_14):
+    _check_world_version(directory)
+    if not isinstance(volume, Volume):
+        volume = Volume.from_buffer(volume)
+    width, height, length = volume.size
+    world_x, world_y, world_z = (volume.origin[0] + offset[0], volume.origin[1] + offset[1], volume.origin[2] + offset[2])
+    assert world_y >= 0 and world_y + height <= 256, f"The contraption would be between Y={world_y} and Y={world_y + height - 1}, but it has to fit between 0 and 255!"
+    blocks = volume.blocks.reshape(height, length, width)
+    states = [parse_state(state) for state in volume.states]
+    box = ((world_x, world_y, world_z), (world_x + width, world_y + height, world_z + length))
+
+    # the block entities of every chunk, in world coordinates
+    chunk_entities = {}
+    for x, y, z, block in volume.block_entities:
+        x, y, z = x + world_x, y + world_y, z + world_z
+        chunk_entities.setdefault((x >> 4, z >> 4), []).append((x, y, z, block))
+
+    # every chunk of the regions that are written, the existing ones too, so all of them are merged before anything is written
+    regions = {}
+    now = int(time())
+    state_entries = None # the palette entries of the states, only made if a chunk is merged
+    for chunk_x in range(world_x >> 4, ((world_x + width - 1) >> 4) + 1):
+        for chunk_z in range(world_z >> 4, ((world_z + length - 1) >> 4) + 1):
+            region = (chunk_x >> 5, chunk_z >> 5)
+            path = join(directory, f"r.{region[0]}.{region[1]}.mca")
+            if region not in regions:
+                regions[region] = _read_region(path) if isfile(path) else {}
+            chunks = regions[region]
+            entities = chunk_entities.get((chunk_x, chunk_z), [])
+            if (chunk_x & 31, chunk_z & 31) in chunks:
+                if state_entries is None:
+                    state_entries = [(_palette_key(entry), entry) for entry in (_palette_entry(*state) for state in states)]
+                compression, data, timestamp = chunks[(chunk_x & 31, chunk_z & 31)]
+                chunks[(chunk_x & 31, chunk_z & 31)] = (ZLIB, _merge_chunk(compression, data, chunk_x, chunk_z, blocks, box, state_entries, entities, path), now)
+                continue
+            sections = []
+            for section_y in range(world_y >> 4, ((world_y + height - 1) >> 4) + 1):
+                section = _section(blocks, (chunk_x << 4) - world_x, (section_y << 4) - world_y, (chunk_z << 4) - world_z)
+                if section.any():
+                    sections.append((section_y, section))
+            if sections or entities:
+                chunks[(chunk_x & 31, chunk_z & 31)] = (ZLIB, _chunk(chunk_x, chunk_z, sections, states, entities, data_version), now)
+
+    makedirs(directory, exist_ok=True)
+    paths = []
+    for (region_x, region_z), chunks in sorted(regions.items()):
+        path = join(directory, f"r.{region_x}.{region_z}.mca")
+        _write_region(path, chunks)
+        paths.append(path)
+    return paths
+
+# the 16x16x16 local palette ids of the section whose -X -Y -Z corner is at x, y, z relative to the origin of blocks
+# (a numpy array in YZX order), 0 (air) outside of it
+def _section(blocks, x, y, z):
+    height, length, width = blocks.shape
+    section = np.zeros((16, 16, 16), dtype=blocks.dtype)
+    part = blocks[max(0, y):y + 16, max(0, z):z + 16, max(0, x):x + 16]
+    section[max(0, -y):max(0, -y) + part.shape[0], max(0, -z):max(0, -z) + part.shape[1], max(0, -x):max(0, -x) + part.shape[2]] = part
+    return section
+
+# the zlib compressed NBT of a chunk with sections (section Y, local palette ids of the section) and entities
+def _chunk(chunk_x, chunk_z, sections, states, entities, data_version):
+    out = BytesIO()
+    writer = NbtWriter(out)
+    writer.compound("")
+    writer.int("DataVersion", data_version)
+    writer.compound("Level")
+    writer.int("xPos", chunk_x)
+    writer.int("zPos", chunk_z)
+    writer.long("LastUpdate", 0)
+    writer.long("InhabitedTime", 0)
+    writer.string("Status", "full")
+    writer.byte("isLightOn", 0)
+    writer.compound_list("Sections", len(sections))
+    for section_y, section in sections:
+        # every section has its own palette, with at least 4 bits per block
+        section_states, indices = np.unique(section.ravel(), return_inverse=True)
+        writer.byte("Y", section_y)
+        writer.compound_list("Palette", len(section_states))
+        for state_id in section_states.tolist():
+            name, properties = states[state_id]
+            writer.string("Name", name)
+            if properties:
+                writer.compound("Properties")
+                for key, value in properties.items():
+                    writer.string(key, value)
+                writer.end()
+            writer.end()
+        writer.long_array("BlockStates", pack_bits(indices, max(4, (len(section_states) - 1).bit_length())))
+        writer.end()
+    writer.compound_list("TileEntities", len(entities))
+    for x, y, z, block in entities:
+        for key, tag in parse_nbt(block[len(block_state(block)):]).items():
+            writer.tag(key, tag)
+        writer.string("id", block_entity_id(block))
+        writer.int("x", x)
+        writer.int("y", y)
+        writer.int("z", z)
+        writer.byte("keepPacked", 0)
+        writer.end()
+    writer.list("Entities", COMPOUND, 0)
+    writer.list("TileTicks", COMPOUND, 0)
+    writer.int_array("Biomes", np.ones(256, dtype=np.int32)) # plains
+    writer.end()
+    writer.end()
+    return compress(out.getvalue())
+
+# 20w17a (1.16) packs the BlockStates so that a value never spans two longs, the chunks before it are the same as 1.14 writes them
+DATA_VERSION_1_16_PACKING = 2529
+
+# the Compound of the palette of a chunk section for a parsed state (see volume.parse_state)
+def _palette_entry(name, properties):
+    entry = Compound({"Name": String(name)})
+    if properties:
+        entry["Properties"] = Compound({key: String(value) for key, value in properties.items()})
+    return entry
+
+# what tells two palette entries apart
+def _palette_key(entry):
+    return str(entry["Name"]), tuple(sorted((key, str(value)) for key, value in entry.get("Properties", {}).items()))
+
+"""
+the zlib compressed NBT of an existing chunk (compressed with compression, the way it's in the region file at path),
+with the contraption merged into it: every section that the bounding box of the contraption (box: the lowest corner
+and the one past the highest corner, in world coordinates) goes into is decoded, the positions inside the box get the
+contraption's blocks (air included, so that nothing is left in the way of the redstone, and the noteblocks have air
+above them), the rest keeps its blocks, and the sections are packed again with a palette of their own
+state_entries are the (_palette_key, palette entry) of the states of the contraption, air first
+the block entities and the block and liquid ticks inside the box are replaced by the contraption's entities,
+the light of the changed sections and the heightmaps are left out, so the game computes them again when it loads the chunk
+everything else (other sections, entities, biomes, ...) is kept as it is
+"""
+def _merge_chunk(compression, data, chunk_x, chunk_z, blocks, box, state_entries, entities, path):
+    assert compression in (1, ZLIB), f"Chunk {chunk_x}, {chunk_z} of {path} has an unknown compression {compression}!"
+    chunk = File.parse(BytesIO(gzip_decompress(data) if compression == 1 else decompress(data)))
+    version = int(chunk.get("DataVersion", 0))
+    assert "Level" in chunk and DATA_VERSION_1_14 <= version < DATA_VERSION_1_16_PACKING, \
+        f"Chunk {chunk_x}, {chunk_z} of {path} was saved by a version of Minecraft (data version {version}) whose chunks can't be merged into, only the ones of 1.14 and 1.15 can!"
+    level = chunk["Level"]
+    (low_x, low_y, low_z), (high_x, high_y, high_z) = box
+    inside = lambda x, y, z: low_x <= x < high_x and low_y <= y < high_y and low_z <= z < high_z
+
+    sections = {int(section["Y"]): section for section in level.get("Sections", [])}
+    for section_y in range(low_y >> 4, ((high_y - 1) >> 4) + 1):
+        x, y, z = (chunk_x << 4) - low_x, (section_y << 4) - low_y, (chunk_z << 4) - low_z
+        contraption = _section(blocks, x, y, z).ravel()
+        in_box = _section(np.broadcast_to(True, blocks.shape), x, y, z).ravel()
+        palette = [state_entries[0]] # air
+        existing = np.zeros(4096, dtype=np.uint32)
+        if section_y in sections and "Palette" in sections[section_y]:
+            palette = [(_palette_key(entry), entry) for entry in sections[section_y]["Palette"]]
+            existing = unpack_bits(sections[section_y]["BlockStates"], max(4, (len(palette) - 1).bit_length()), 4096)
+        # the ids of the contraption's states come after the existing palette
+        merged = np.where(in_box, contraption.astype(np.uint32) + len(palette), existing)
+        palette += state_entries
+        # the same entry can be in there twice (in both palettes), and most of them aren't used
+        positions = {}
+        entries = []
+        lookup = np.zeros(len(palette), dtype=np.uint32)
+        for index, (key, entry) in enumerate(palette):
+            if key not in positions:
+                positions[key] = len(entries)
+                entries.append(entry)
+            lookup[index] = positions[key]
+        used, indices = np.unique(lookup[merged], return_inverse=True)
+        sections[section_y] = Compound({
+            "Y": Byte(section_y),
+            "Palette": List[Compound]([entries[entry] for entry in used.tolist()]),
+            "BlockStates": LongArray(pack_bits(indices, max(4, (len(used) - 1).bit_length()))),
+        })
+    level["Sections"] = List[Compound]([sections[section_y] for section_y in sorted(sections)])
+
+    tile_entities = [entity for entity in level.get("TileEntities", []) if not inside(int(entity["x"]), int(entity["y"]), int(entity["z"]))]
+    for x, y, z, block in entities:
+        entity = parse_nbt(block[len(block_state(block)):])
+        entity.update({"id": String(block_entity_id(block)), "x": Int(x), "y": Int(y), "z": Int(z), "keepPacked": Byte(0)})
+        tile_entities.append(entity)
+    level["TileEntities"] = List[Compound](tile_entities)
+    for ticks in ["TileTicks", "LiquidTicks"]:
+        if ticks in level:
+            level[ticks] = List[Compound]([tick for tick in level[ticks] if not inside(int(tick["x"]), int(tick["y"]), int(tick["z"]))])
+    level.pop("Heightmaps", None)
+    level["isLightOn"] = Byte(0)
+    level["Status"] = String("full") # the contraption is complete, whatever the chunk was before
+    out = BytesIO()
+    chunk.write(out)
+    return compress(out.getvalue())
+
+# the chunks in the region file at path: (compression type, compressed chunk data, timestamp) by their (x, z) inside the region
+def _read_region(path):
+    chunks = {}
+    with open(path, "rb") as region:
+        data = region.read()
+    for index in range(1024):
+        location = _location.unpack_from(data, 4 * index)[0]
+        if location >> 8 == 0:
+            continue
+        start = (location >> 8) * SECTOR
+        chunk_length, compression = _chunk_header.unpack_from(data, start)
+        timestamp = _timestamp.unpack_from(data, SECTOR + 4 * index)[0]
+        chunks[(index & 31, index >> 5)] = (compression, data[start + 5:start + 4 + chunk_length], timestamp)
+    return chunks
+
+# writes chunks ((compression type, compressed chunk data, timestamp) by (x, z) inside the region) into the region
+# file at path, every chunk of it, the existing ones are read with _read_region first
+def _write_region(path, chunks):
+    header = bytearray(2 * SECTOR) # the locations, then the timestamps
+    temp_path = f"{path}.{getpid()}.tmp"
+    with open(temp_path, "wb") as region:
+        region.write(header)
+        sector = 2
+        for (x, z), (compression, data, timestamp) in sorted(chunks.items(), key=lambda item: (item[0][1], item[0][0])):
+            chunk = _chunk_header.pack(len(data) + 1, compression) + data
+            sectors = (len(chunk) + SECTOR - 1) // SECTOR
+            assert sectors < 256, f"Chunk {x}, {z} of {path} is too big for a region file!"
+            region.write(chunk + bytes(sectors * SECTOR - len(chunk)))
+            _location.pack_into(header, 4 * (x + 32 * z), sector << 8 | sectors)
+            _timestamp.pack_into(header, SECTOR + 4 * (x + 32 * z), timestamp)
+            sector += sectors
+        region.seek(0)
+        region.write(header)
+    replace(temp_path, path)
+
+# refuses the world of directory (a region directory) if its level.dat was saved by a version whose chunks are
+# different from the ones of 1.14 and 1.15, a directory without a level.dat next to it is checked chunk by chunk only
+def _check_world_version(directory):
+    path = join(dirname(directory.rstrip("/\\")), "level.dat")
+    if not isfile(path):
+        return
+    version = int(load(path).get("Data", {}).get("DataVersion", 0))
+    assert DATA_VERSION_1_14 <= version < DATA_VERSION_1_16_PACKING, \
+        f"The world of {directory} was saved by a version of Minecraft (data version {version}) that can't be written into, only 1.14 and 1.15 can!"
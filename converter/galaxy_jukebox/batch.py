@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+
+from os import makedirs, cpu_count
+from os.path import isdir, isfile, join, basename, splitext, dirname
+from glob import glob
+from time import perf_counter
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from .main import convert
+from .exporters import FORMATS
+
+# outcome of converting one file in a batch, error is None on success, otherwise the reason it failed
+class ConversionResult:
+
+    def __init__(self, input, output, error=None, seconds=0.0):
+        self.input = input
+        self.output = output
+        self.error = error
+        self.seconds = seconds
+
+    def __repr__(self):
+        return f"[ConversionResult {self.input} -> {self.output} {'ok' if self.ok else 'failed: ' + self.error} in {self.seconds:.2f}s]"
+
+    @property
+    def ok(self):
+        return self.error is None
+
+"""
+source is either
+- a list of input paths,
+- a directory (every .nbs file directly inside it is used),
+- a glob pattern (e.g. "songs/**/*.nbs"), or
+- a manifest: a text file with one input path per line, relative paths are relative to the manifest
+  (empty lines and lines starting with # are skipped)
+returns the list of input paths, in a deterministic order
+"""
+def collect_inputs(source):
+    if type(source) != str:
+        return list(source)
+    if isdir(source):
+        return sorted(glob(join(source, "*.nbs")))
+    if source[-4:] == ".nbs" and isfile(source):
+        return [source]
+    if any(c in source for c in "*?["):
+        return sorted(glob(source, recursive=True))
+    assert isfile(source), f"Input {source} is neither a directory, a glob pattern, an .nbs file nor a manifest!"
+    inputs = []
+    with open(source) as manifest:
+        for line in manifest:
+            line = line.strip()
+            if line != "" and line[0] != "#":
+                inputs.append(join(dirname(source), line))
+    return inputs
+
+# every input file gets its own output file in out_dir, with the same name, but extension (.schem by default)
+def output_paths(inputs, out_dir, extension=".schem"):
+    outputs = [join(out_dir, splitext(basename(infile))[0] + extension) for infile in inputs]
+    assert len(set(outputs)) == len(outputs), "Some input files have the same name, their outputs would overwrite each other!"
+    return outputs
+
+# runs in the worker process, it must not raise, so that one bad song can't take the others down with it
+def _convert_one(input, output, use_redstone_lamp, sides_mode, cache, layout_objective, line_order, output_format, compress_level, compress_threads):
+    start = perf_counter()
+    try:
+        convert(input, output, use_redstone_lamp, sides_mode, cache, layout_objective=layout_objective, line_order=line_order, output_format=output_format,
+                compress_level=compress_level, compress_threads=compress_threads)
+        error = None
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    return ConversionResult(input, output, error, perf_counter() - start)
+
+"""
+converts every song from source (see collect_inputs) into out_dir, using jobs worker processes
+out_dir can also be a list of output paths, one for every input
+jobs=None means one process per CPU core, jobs=1 converts in this process, without a pool
+this is a generator: ConversionResults are yielded as soon as each song finishes (not in input order),
+and a failing song is reported in its result instead of aborting the others
+cancel is an optional threading.Event, setting it cancels the conversions that haven't started yet, they are
+reported as cancelled, the songs that are already being converted in a worker process still finish (and write
+their output), and their results are yielded as usual, so the generator ends only when no worker is converting
+closing the generator early cancels the rest the same way, and waits for the running ones too
+cache is an optional cache.ConversionCache, shared by the workers, see convert
+layout_objective and line_order are the same as for convert, for every song
+output_format is one of exporters.FORMATS (but not "anvil", the songs would be built into each other), the default is sponge
+compress_level and compress_threads are the same as for convert, compress_threads is per song
+"""
+def convert_many(source, out_dir, use_redstone_lamp=True, sides_mode=-1, jobs=None, cancel=None, cache=None, layout_objective=None, line_order="pitch",
+                 output_format="sponge", compress_level=9, compress_threads=1):
+    assert output_format in FORMATS and output_format != "anvil", f"Songs can't be converted into {output_format} as a batch!"
+    inputs = collect_inputs(source)
+    if type(out_dir) == str:
+        outputs = output_paths(inputs, out_dir, FORMATS[output_format][0])
+        makedirs(out_dir, exist_ok=True)
+    else:
+        outputs = list(out_dir)
+        assert len(outputs) == len(inputs), f"There are {len(inputs)} inputs, but {len(outputs)} outputs!"
+
+    if jobs == 1:
+        for input, output in zip(inputs, outputs):
+            if cancel is not None and cancel.is_set():
+                yield ConversionResult(input, output, "Cancelled")
+            else:
+                yield _convert_one(input, output, use_redstone_lamp, sides_mode, cache, layout_objective, line_order, output_format, compress_level, compress_threads)
+        return
+
+    if jobs is None:
+        jobs = cpu_count() or 1
+    executor = ProcessPoolExecutor(max_workers=max(1, min(jobs, len(inputs))))
+    try:
+        futures = {executor.submit(_convert_one, input, output, use_redstone_lamp, sides_mode, cache, layout_objective, line_order, output_format, compress_level, compress_threads): (input, output)
+                   for input, output in zip(inputs, outputs)}
+        pending = set(futures)
+        while pending:
+            # waking up regularly, so that cancel is noticed even while long conversions are running
+            done, pending = wait(pending, timeout=0.1, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    yield future.result()
+                except Exception as e: # the worker process itself died (e.g. ran out of memory)
+                    input, output = futures[future]
+                    yield ConversionResult(input, output, f"{type(e).__name__}: {e}")
+            if cancel is not None and cancel.is_set():
+                # a future that can't be cancelled is already running, it's waited for like before
+                for future in [future for future in pending if future.cancel()]:
+                    pending.discard(future)
+                    input, output = futures[future]
+                    yield ConversionResult(input, output, "Cancelled")
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+
+from array import array
+from struct import Struct
+from sys import byteorder
+import numpy as np
+from . import builder as bld
+
+_HEADER = Struct("<4sII") # magic, record count, palette length
+_LENGTH = Struct("<I")
+_MAGIC = b"GJB1"
+
+# the intermediate representation between the layout and the schematic output:
+# an append-only list of block placements, (x, y, z, palette id) records, stored column by column in int arrays
+# every builder function writes into one of these, and nothing is looked up or deduplicated while building:
+# if a position is placed more than once, the last placement wins when the buffer is committed
+class BlockBuffer:
+    __slots__ = ("_x", "_y", "_z", "_block", "_append_x", "_append_y", "_append_z", "_append_block", "_stamps", "_stamped")
+
+    def __init__(self):
+        self._x = array("i")
+        self._y = array("i")
+        self._z = array("i")
+        self._block = array("i") # palette ids, see builder.palette
+        self._stamps = [] # (placements before it, template, x, y, z), see stamp
+        self._stamped = 0 # the placements in _stamps
+        self._bind()
+
+    # binding the append methods once, as placing is the hottest path of the whole conversion
+    def _bind(self):
+        self._append_x = self._x.append
+        self._append_y = self._y.append
+        self._append_z = self._z.append
+        self._append_block = self._block.append
+
+    # the columns, with every stamp expanded in its place
+    @property
+    def x(self):
+        self._expand_stamps()
+        return self._x
+
+    @property
+    def y(self):
+        self._expand_stamps()
+        return self._y
+
+    @property
+    def z(self):
+        self._expand_stamps()
+        return self._z
+
+    @property
+    def block(self):
+        self._expand_stamps()
+        return self._block
+
+    def __len__(self):
+        return len(self._block) + self._stamped
+
+    def __repr__(self):
+        return f"[BlockBuffer with {len(self)} placements]"
+
+    def place(self, x, y, z, block):
+        self._append_x(x)
+        self._append_y(y)
+        self._append_z(z)
+        self._append_block(block)
+
+    # appends every placement of other after the ones already here
+    def extend(self, other):
+        self._expand_stamps()
+        self._x.extend(other.x)
+        self._y.extend(other.y)
+        self._z.extend(other.z)
+        self._block.extend(other.block)
+
+    """
+    appends every placement of template (another BlockBuffer, positions relative to its origin), moved by x, y, z
+    this is how a prebuilt structure is placed many times (see builder.build_delay): only a reference is stored
+    here, and all the stamps are expanded at once (with numpy) when the placements are first needed
+    the template must not change afterwards
+    """
+    def stamp(self, template, x, y, z):
+        self._stamps.append((len(self._block), template, x, y, z))
+        self._stamped += len(template)
+
+    def _expand_stamps(self):
+        if not self._stamps:
+            return
+        stamps = self._stamps
+        templates = [template for placed_before, template, x, y, z in stamps]
+        lengths = np.array([len(template) for template in templates], dtype=np.int64)
+        placed_before = np.array([stamp[0] for stamp in stamps], dtype=np.int64)
+        stamped_before = np.cumsum(lengths) - lengths
+        direct = len(self._block)
+        # where the records end up: a placement is moved after every stamp that came before it
+        direct_index = np.arange(direct, dtype=np.int64)
+        direct_index += np.concatenate([[0], np.cumsum(lengths)])[np.searchsorted(placed_before, direct_index, side="right")]
+        stamp_start = np.repeat(placed_before + stamped_before, lengths)
+        stamp_index = stamp_start + np.arange(self._stamped, dtype=np.int64) - np.repeat(stamped_before, lengths)
+        columns = []
+        for i, name in enumerate(["x", "y", "z", "block"]):
+            column = np.empty(direct + self._stamped, dtype=np.intc)
+            column[direct_index] = np.frombuffer(getattr(self, "_" + name), dtype=np.intc)
+            placed = np.concatenate([np.frombuffer(getattr(template, name), dtype=np.intc) for template in templates])
+            if name != "block":
+                placed += np.repeat(np.array([stamp[2 + i] for stamp in stamps], dtype=np.intc), lengths)
+            column[stamp_index] = placed
+            columns.append(array("i", column.tobytes()))
+        self._x, self._y, self._z, self._block = columns
+        self._stamps = []
+        self._stamped = 0
+        self._bind()
+
+    # returns the -X -Y -Z and the +X +Y +Z corners, the same as MCStructure.getBounds would after committing
+    def bounds(self):
+        if len(self) == 0:
+            return (0, 0, 0), (0, 0, 0)
+        return (min(self.x), min(self.y), min(self.z)), (max(self.x), max(self.y), max(self.z))
+
+    # every position that has been placed, once, as a sorted numpy array of int64 keys
+    # the keys of the same position are the same in every buffer, so buffers can be checked for overlaps
+    def position_keys(self):
+        x, y, z = (np.frombuffer(column, dtype=np.intc).astype(np.int64) + (1 << 20) for column in (self.x, self.y, self.z))
+        return np.unique((x << 42) | (y << 21) | z)
+
+    # materializes the buffer into an MCSchematic (or anything with a setBlock((x, y, z), block_data) method)
+    # the output is written by sponge.save_schematic instead, this is kept for debugging: mcschematic_safe warns
+    # if an already set block is replaced, helping us find bugs/obvious problems in our algorithm
+    # https://github.com/4321ba/Galaxy_Jukebox/blob/ee404ddf33f0d11f4d2c8b10caf065a8ac8374fd/mcschematic_safe.py
+    def commit(self, schem):
+        set_block = schem.setBlock
+        for x, y, z, block in zip(self.x, self.y, self.z, self.block):
+            set_block((x, y, z), bld.palette[block])
+
+    """
+    serializes the buffer into a compact binary form (for caching it, or sending it to another process)
+    the palette is included, because the ids of blocks interned at runtime (e.g. signs) differ between processes
+    """
+    def to_bytes(self):
+        used = sorted(set(self.block))
+        parts = [_HEADER.pack(_MAGIC, len(self), len(used))]
+        for block in used:
+            encoded = bld.palette[block].encode()
+            parts.append(_LENGTH.pack(len(encoded)))
+            parts.append(_LENGTH.pack(block))
+            parts.append(encoded)
+        for column in (self.x, self.y, self.z, self.block):
+            if byteorder != "little":
+                column = array("i", column)
+                column.byteswap()
+            parts.append(column.tobytes())
+        return b"".join(parts)
+
+    # the inverse of to_bytes, the palette ids are remapped to this process' palette
+    @staticmethod
+    def from_bytes(data):
+        magic, count, palette_length = _HEADER.unpack_from(data)
+        assert magic == _MAGIC, "This is not a serialized BlockBuffer!"
+        offset = _HEADER.size
+        remap = {}
+        for i in range(palette_length):
+            length, = _LENGTH.unpack_from(data, offset)
+            old_id, = _LENGTH.unpack_from(data, offset + _LENGTH.size)
+            offset += 2 * _LENGTH.size
+            remap[old_id] = bld.block_id(data[offset:offset + length].decode())
+            offset += length
+        buffer = BlockBuffer()
+        for column in (buffer.x, buffer.y, buffer.z, buffer.block):
+            column.frombytes(data[offset:offset + 4 * count])
+            if byteorder != "little":
+                column.byteswap()
+            offset += 4 * count
+        if any(old_id != new_id for old_id, new_id in remap.items()):
+            buffer._block = array("i", (remap[block] for block in buffer._block))
+            buffer._bind()
+        return buffer
+
+
+"""
+stands in for a BlockBuffer when the contraption is only estimated (see main.estimate): the placements
+are only counted, and the bounds are kept, nothing is stored
+the spirals of the lines aren't built at all, count_line adds the straight stretches of them instead,
+and the rest of the lines isn't either, count_box adds the box of every part of them (see SplitLine.estimate_noteblock)
+"""
+class CountingBuffer:
+    __slots__ = ("count", "_min_x", "_min_y", "_min_z", "_max_x", "_max_y", "_max_z")
+
+    def __init__(self):
+        self.count = 0
+        self._min_x = self._min_y = self._min_z = 1 << 30
+        self._max_x = self._max_y = self._max_z = -(1 << 30)
+
+    def __len__(self):
+        return self.count
+
+    def __repr__(self):
+        return f"[CountingBuffer with {self.count} placements]"
+
+    def place(self, x, y, z, block):
+        self.count += 1
+        if x < self._min_x:
+            self._min_x = x
+        if x > self._max_x:
+            self._max_x = x
+        if y < self._min_y:
+            self._min_y = y
+        if y > self._max_y:
+            self._max_y = y
+        if z < self._min_z:
+            self._min_z = z
+        if z > self._max_z:
+            self._max_z = z
+
+    # count placements, on a stretch of length blocks from v (a Cursor) forward, height blocks high
+    def count_line(self, v, length, height, count):
+        self.count += count - 2
+        self.place(v.x, v.y, v.z, None)
+        end = length - 1
+        self.place(v.x + end * v.forward.x, v.y + height - 1, v.z + end * v.forward.z, None)
+
+    # count placements, in the box between the corners a and b (Vectors or Cursors, any two opposite corners)
+    def count_box(self, a, b, count):
+        self.count += count
+        low_x, high_x = (a.x, b.x) if a.x < b.x else (b.x, a.x)
+        low_y, high_y = (a.y, b.y) if a.y < b.y else (b.y, a.y)
+        low_z, high_z = (a.z, b.z) if a.z < b.z else (b.z, a.z)
+        if low_x < self._min_x:
+            self._min_x = low_x
+        if high_x > self._max_x:
+            self._max_x = high_x
+        if low_y < self._min_y:
+            self._min_y = low_y
+        if high_y > self._max_y:
+            self._max_y = high_y
+        if low_z < self._min_z:
+            self._min_z = low_z
+        if high_z > self._max_z:
+            self._max_z = high_z
+
+    # the same as BlockBuffer.bounds
+    def bounds(self):
+        if self.count == 0:
+            return (0, 0, 0), (0, 0, 0)
+        return (self._min_x, self._min_y, self._min_z), (self._max_x, self._max_y, self._max_z)
@@ -1,6 +1,9 @@
 #!/usr/bin/env python3
 
-from .vector import Vector
+from functools import lru_cache
+from contextlib import contextmanager
+from .vector import DIRECTIONS, Vector, Cursor
+from . import block_buffer # the other way around, block_buffer imports builder too
 
 instrument_name = [
     "harp",
@@ -21,7 +24,35 @@ instrument_name = [
     "pling",
 ]
 
-instrument_material = [
+# every block state that gets placed is interned into this palette once, and is referred to by its index
+# (palette id) afterwards, so that building doesn't need to format any block state strings
+palette = []
+_palette_ids = {}
+
+# returns the palette id of block (a block state string), adding it to the palette if it isn't there yet
+def block_id(block):
+    if block not in _palette_ids:
+        _palette_ids[block] = len(palette)
+        palette.append(block)
+    return _palette_ids[block]
+
+"""
+the blocks that are interned while building a contraption (the signs, with the title of the song on them) are
+forgotten when this ends, so that converting song after song in the same process (e.g. watch_folder, or the gui)
+doesn't keep growing the palette; the buffers built in it can't be resolved after it, so the contraption has
+to be saved inside of it (and it's not for building several contraptions on threads at the same time)
+"""
+@contextmanager
+def building():
+    size = len(palette)
+    try:
+        yield
+    finally:
+        for block in palette[size:]:
+            del _palette_ids[block]
+        del palette[size:]
+
+instrument_material = [block_id(block) for block in [
     "lapis_block",
     "jungle_wood",
     "black_concrete",
@@ -38,9 +69,9 @@ instrument_material = [
     "emerald_block",
     "hay_block",
     "glowstone", 
-]
+]]
 
-building_material = [
+building_material = [block_id(block) for block in [
     "blue_concrete",
     "green_concrete",
     "black_concrete",
@@ -57,14 +88,21 @@ building_material = [
     "lime_concrete",
     "red_concrete",
     "gray_concrete", 
-]
-
-even_delay_buildblock = "polished_andesite"
-even_delay_buildblock_slab = "polished_andesite_slab[type=top]"
-odd_delay_buildblock = "polished_granite"
-odd_delay_buildblock_slab = "polished_granite_slab[type=top]"
-start_line_buildblock = "polished_diorite"
-start_line_buildblock_slab = "polished_diorite_slab[type=top]"
+]]
+
+even_delay_buildblock = block_id("polished_andesite")
+even_delay_buildblock_slab = block_id("polished_andesite_slab[type=top]")
+odd_delay_buildblock = block_id("polished_granite")
+odd_delay_buildblock_slab = block_id("polished_granite_slab[type=top]")
+start_line_buildblock = block_id("polished_diorite")
+start_line_buildblock_slab = block_id("polished_diorite_slab[type=top]")
+
+redstone_lamp = block_id("redstone_lamp")
+tripwire = block_id("tripwire")
+glass = block_id("glass")
+ladder = block_id("ladder")
+scaffolding = block_id("scaffolding")
+redstone_torch = block_id("redstone_torch")
 
 def cardinal_direction(v):
     assert v.y==0 and ((abs(v.x)==1 and v.z==0) or (v.x==0 and abs(v.z)==1))
@@ -77,28 +115,63 @@ def cardinal_direction(v):
     if v.z == -1:
         return "north"
 
+# indexed with [instrument][note]
+note_block = [[block_id(f"note_block[note={note},instrument={name}]") for note in range(25)] for name in instrument_name]
+# indexed with [powered]
+_redstone_wire = [block_id(f"redstone_wire[east=side,north=side,power={15 if powered else 0},south=side,west=side]") for powered in [False, True]]
+# indexed with [direction the signal goes][delay][locked][powered], the facing property is the opposite of the direction
+_repeater = {
+    d: [None] + [[[block_id(f"repeater[delay={delay},facing={cardinal_direction(-d)},locked={locked},powered={powered}]")
+                   for powered in [False, True]] for locked in [False, True]] for delay in [1, 2, 3, 4]]
+    for d in DIRECTIONS
+}
+# these are indexed with the facing
+_observer = {d: block_id(f"observer[facing={cardinal_direction(d)}]") for d in DIRECTIONS}
+_trapdoor_top = {d: block_id(f"oak_trapdoor[facing={cardinal_direction(d)},half=top]") for d in DIRECTIONS}
+_floor_stone_button = {d: block_id(f"stone_button[face=floor,facing={cardinal_direction(d)}]") for d in DIRECTIONS}
+
+def observer(facing):
+    return _observer[facing]
+
+def trapdoor_top(facing):
+    return _trapdoor_top[facing]
+
+def floor_stone_button(facing):
+    return _floor_stone_button[facing]
+
 
 # these 3 functions are used throughout split_lines and here in build_delay, exclusively, to create blocks:
+# blocks is the BlockBuffer being built, block and buildblock are palette ids, v is a Vector or a Cursor, facing_direction is one of vector.DIRECTIONS
 
-def setblock(schem, v, block):
-    schem.setBlock((v.x, v.y, v.z), block)
+def setblock(blocks, v, block):
+    blocks.place(v.x, v.y, v.z, block)
 
-def block_and_redstone(schem, v, buildblock, powered=False):
-    schem.setBlock((v.x, v.y+0, v.z), buildblock)
-    schem.setBlock((v.x, v.y+1, v.z), f"redstone_wire[east=side,north=side,power={15 if powered else 0},south=side,west=side]")
+def block_and_redstone(blocks, v, buildblock, powered=False):
+    blocks.place(v.x, v.y, v.z, buildblock)
+    blocks.place(v.x, v.y+1, v.z, _redstone_wire[powered])
     
-def block_and_repeater(schem, v, buildblock, facing_direction, delay=1, locked=False, powered=False):
+def block_and_repeater(blocks, v, buildblock, facing_direction, delay=1, locked=False, powered=False):
     assert delay in [1, 2, 3, 4], f"Cannot create a repeater with a delay of {delay}!"
-    schem.setBlock((v.x, v.y+0, v.z), buildblock)
-    schem.setBlock((v.x, v.y+1, v.z), f"repeater[delay={delay},facing={cardinal_direction(-facing_direction)},locked={locked},powered={powered}]")
+    blocks.place(v.x, v.y, v.z, buildblock)
+    blocks.place(v.x, v.y+1, v.z, _repeater[facing_direction][delay][locked][powered])
+
 
+# redstone both in the lower and the upper row, one block long, used as a spacer that doesn't add any delay
+# v is a Cursor, it is moved forward
+def build_spacer(blocks, buildblock, v):
+    block_and_redstone(blocks, v, buildblock)
+    v.y += 2
+    block_and_redstone(blocks, v, buildblock)
+    v.y -= 2
+    v.advance()
 
-# return the space/blocks/length needed for the delay-md pair, when built by build_delay
+
+# the space/blocks/length needed for the delay-md pair, when built by build_delay, 2 <= md <= 9
+# get_delay_length looks this up in tables instead of computing it every time
 # for the previous implementation of this function, see commit
 # https://github.com/4321ba/Galaxy_Jukebox/commit/7fa774baea0a696d32a1dadd3fbe13be6f24ac02
 # and lines https://github.com/4321ba/Galaxy_Jukebox/blob/7fa774baea0a696d32a1dadd3fbe13be6f24ac02/builder.py#L96-L131
-def get_delay_length(delay, md):
-    assert 2 <= min(md, 9) <= delay, f"Wrong parameters {delay} and {md} for get_delay_length!"
+def delay_length_formula(delay, md):
     if md == 2:
         return int(delay / 1.5 + 1.5) # +0.5 for rounding
     if md == 3:
@@ -115,6 +188,63 @@ def get_delay_length(delay, md):
         return int(delay / 8 + 2.0625) if delay != 8 else 2
     return int(delay / 8 + 1.9375)
 
+# the delays below this are looked up in tables, the longer ones (long pauses) are computed
+DELAY_TABLE_SIZE = 1 << 12
+# _delay_lengths[md][delay] = delay_length_formula(delay, md) for every delay >= md, md = 2..9
+_delay_lengths = [None] * 10
+"""
+_max_fitting_delay[md][blocks] is the biggest delay that can be built with md on at most blocks blocks
+(or md - 1 if not even md fits), while that delay is in the table
+a bigger delay never needs less blocks, so the delays that fit are always the ones up to this
+"""
+_max_fitting_delay = [None] * 10
+for md in range(2, 10):
+    _delay_lengths[md] = [None] * md + [delay_length_formula(delay, md) for delay in range(md, DELAY_TABLE_SIZE)]
+    fitting = [md - 1] * _delay_lengths[md][-1] # for more blocks, the answer can be out of the table
+    for delay in range(md, DELAY_TABLE_SIZE - 1):
+        if _delay_lengths[md][delay] < len(fitting):
+            fitting[_delay_lengths[md][delay]] = delay
+    for blocks in range(1, len(fitting)):
+        fitting[blocks] = max(fitting[blocks], fitting[blocks - 1])
+    _max_fitting_delay[md] = fitting
+
+def get_delay_length(delay, md):
+    md = min(md, 9)
+    assert 2 <= md <= delay, f"Wrong parameters {delay} and {md} for get_delay_length!"
+    if delay < DELAY_TABLE_SIZE:
+        return _delay_lengths[md][delay]
+    return delay_length_formula(delay, md)
+
+# the biggest delay that can be built with md on at most blocks blocks, or None if it's out of the tables
+def get_max_fitting_delay(blocks, md):
+    fitting = _max_fitting_delay[min(md, 9)]
+    return fitting[blocks] if blocks < len(fitting) else None
+
+"""
+asserts that the tables give the same as the formula, for every delay and block count they have
+and that a bigger delay never needs less blocks, which split_lines.delay_halving_point relies on
+"""
+def check_delay_tables():
+    for md in range(2, 10):
+        for delay in range(md, DELAY_TABLE_SIZE):
+            assert get_delay_length(delay, md) == delay_length_formula(delay, md), f"Wrong delay length for {delay} {md}!"
+            assert delay == md or delay_length_formula(delay - 1, md) <= delay_length_formula(delay, md), f"Delay length decreases at {delay} {md}!"
+        expected = md - 1
+        for blocks, fitting in enumerate(_max_fitting_delay[md]):
+            while delay_length_formula(expected + 1, md) <= blocks:
+                expected += 1
+            assert fitting == expected, f"Wrong max fitting delay for {blocks} blocks and md {md}: {fitting} instead of {expected}!"
+
+
+# the delays build_delay has built lately, built at the origin, see BlockBuffer.stamp: (template, length)
+# a template is mostly reused by the lines built soon after it, so keeping the latest ones is enough,
+# and converting many songs in one process (e.g. watch_folder) doesn't keep every template of every song in memory
+@lru_cache(maxsize=2048)
+def _delay_template(delay, md, loopback, forward, buildblock):
+    template = block_buffer.BlockBuffer()
+    v = Cursor(Vector(0, 0, 0), forward)
+    _create_delay(template, buildblock, v, delay, md, loopback)
+    return template, v.get_coord(forward)
 
 """
 creates the delay in the form:
@@ -135,37 +265,58 @@ the signal goes in on the top, and after delay time, it comes back at the bottom
 these can be stacked one after another, creating the heart of the whole contraption
 
 if loopback is false, the redstone at the end won't get placed, making it useful for turning sideway
-v is modified to represent the actual position!
+v is a Cursor, it is moved forward to represent the actual position!
+the same delays come up again and again, so every distinct one is only built once, as a template,
+and only stamped into blocks afterwards
 """
-def build_delay(schem, buildblock, v, forward, delay, md, loopback=True):
+def build_delay(blocks, buildblock, v, delay, md, loopback=True):
+    assert 2 <= min(md, 9) <= delay, f"Wrong parameters {delay} and {md} for get_delay_length!"
+    template, length = _delay_template(delay, min(md, 9), loopback, v.forward, buildblock)
+    blocks.stamp(template, v.x, v.y, v.z)
+    v.advance(length)
+
+# builds the delay block by block, see build_delay
+def _create_delay(blocks, buildblock, v, delay, md, loopback):
     assert 2 <= min(md, 9) <= delay, f"Wrong parameters {delay} and {md} for get_delay_length!"
+    forward = v.forward
     
     
     # helper functions for e.g.: placing a redstone down and a repeater up
     # these additionally move v forward, as it is always needed after placing these
-
-    def d_redstone_u_repeater(schem, buildblock, v, forward, u_delay):
-        block_and_redstone(schem, v, buildblock)
-        block_and_repeater(schem, v + Vector(0, 2, 0), buildblock, forward, delay=u_delay)
-        v += forward
-
-    def d_repeater_u_repeater(schem, buildblock, v, forward, d_delay, u_delay):
-        block_and_repeater(schem, v, buildblock, -forward, delay=d_delay)
-        block_and_repeater(schem, v + Vector(0, 2, 0), buildblock, forward, delay=u_delay)
-        v += forward
-
-    def d_block_u_repeater(schem, buildblock, v, forward, u_delay):
-        setblock(schem, v + Vector(0, 1, 0), buildblock)
-        block_and_repeater(schem, v + Vector(0, 2, 0), buildblock, forward, delay=u_delay)
-        v += forward
-
-    def d_loopback_u_block(schem, buildblock, v, forward, loopback):
+    # the upper row is reached by moving v up and back down in place, so that no new positions are created
+
+    def d_redstone_u_repeater(blocks, buildblock, v, forward, u_delay):
+        block_and_redstone(blocks, v, buildblock)
+        v.y += 2
+        block_and_repeater(blocks, v, buildblock, forward, delay=u_delay)
+        v.y -= 2
+        v.advance()
+
+    def d_repeater_u_repeater(blocks, buildblock, v, forward, d_delay, u_delay):
+        block_and_repeater(blocks, v, buildblock, v.backward, delay=d_delay)
+        v.y += 2
+        block_and_repeater(blocks, v, buildblock, forward, delay=u_delay)
+        v.y -= 2
+        v.advance()
+
+    def d_block_u_repeater(blocks, buildblock, v, forward, u_delay):
+        v.y += 1
+        setblock(blocks, v, buildblock)
+        v.y += 1
+        block_and_repeater(blocks, v, buildblock, forward, delay=u_delay)
+        v.y -= 2
+        v.advance()
+
+    def d_loopback_u_block(blocks, buildblock, v, forward, loopback):
+        v.y += 1
         if loopback:
-            block_and_redstone(schem, v + Vector(0, 1, 0), buildblock)
+            block_and_redstone(blocks, v, buildblock)
         else:
-            setblock(schem, v + Vector(0, 1, 0), buildblock)
-        setblock(schem, v + Vector(0, 3, 0), buildblock)
-        v += forward
+            setblock(blocks, v, buildblock)
+        v.y += 2
+        setblock(blocks, v, buildblock)
+        v.y -= 3
+        v.advance()
 
 
     # md: minimum of the delays in the entire line afterwards, determines how much delay we can put onto the repeaters
@@ -176,132 +327,132 @@ def build_delay(schem, buildblock, v, forward, delay, md, loopback=True):
     # a 3 tick repeater can only go after a 1 tick one if the pulse is already 3 tick long, it doesn't work if the pulse is shorter
 
     # 1 tick repeaters everywhere, repeater chaining only at the top
-    def create_delay_md2(schem, buildblock, v, forward, delay, loopback):
+    def create_delay_md2(blocks, buildblock, v, forward, delay, loopback):
         if delay % 3 != 2: # 0 or 1 is the remainder
             delay -= 1
-            d_redstone_u_repeater(schem, buildblock, v, forward, 1)
+            d_redstone_u_repeater(blocks, buildblock, v, forward, 1)
         if delay % 3 == 2: # 0 or 2 was the remainder originally
             delay -= 2
-            d_repeater_u_repeater(schem, buildblock, v, forward, 1, 1)
+            d_repeater_u_repeater(blocks, buildblock, v, forward, 1, 1)
         while delay > 0:
             delay -= 3
-            d_block_u_repeater(schem, buildblock, v, forward, 1)
-            d_repeater_u_repeater(schem, buildblock, v, forward, 1, 1)
+            d_block_u_repeater(blocks, buildblock, v, forward, 1)
+            d_repeater_u_repeater(blocks, buildblock, v, forward, 1, 1)
         assert delay == 0, f"There shouldn't be any delay remaining, but it is {delay}!"
-        d_loopback_u_block(schem, buildblock, v, forward, loopback)
+        d_loopback_u_block(blocks, buildblock, v, forward, loopback)
 
     # 1 tick repeaters everywhere, repeater chaining at the bottom and the top too
-    def create_delay_md3(schem, buildblock, v, forward, delay, loopback):
+    def create_delay_md3(blocks, buildblock, v, forward, delay, loopback):
         if delay % 2 == 1:
             delay -= 1
-            d_redstone_u_repeater(schem, buildblock, v, forward, 1)
+            d_redstone_u_repeater(blocks, buildblock, v, forward, 1)
         while delay > 0:
             delay -= 2
-            d_repeater_u_repeater(schem, buildblock, v, forward, 1, 1)
+            d_repeater_u_repeater(blocks, buildblock, v, forward, 1, 1)
         assert delay == 0, f"There shouldn't be any delay remaining, but it is {delay}!"
-        d_loopback_u_block(schem, buildblock, v, forward, loopback)
+        d_loopback_u_block(blocks, buildblock, v, forward, loopback)
 
     # 2 tick repeaters everywhere, repeater chaining at the bottom needs to end with a 1 tick repeater
     # this is becoming a bit of a pattern, but here it still may be better written out explicit
     # I'll generalize with md6
-    def create_delay_md4(schem, buildblock, v, forward, delay, loopback):
+    def create_delay_md4(blocks, buildblock, v, forward, delay, loopback):
         if delay == 4:
             delay -= 4
-            d_repeater_u_repeater(schem, buildblock, v, forward, 2, 2)
+            d_repeater_u_repeater(blocks, buildblock, v, forward, 2, 2)
         elif delay % 4 == 0:
             delay -= 4
-            d_repeater_u_repeater(schem, buildblock, v, forward, 1, 1)
-            d_repeater_u_repeater(schem, buildblock, v, forward, 1, 1)
+            d_repeater_u_repeater(blocks, buildblock, v, forward, 1, 1)
+            d_repeater_u_repeater(blocks, buildblock, v, forward, 1, 1)
         elif delay % 4 == 1:
             delay -= 5
-            d_repeater_u_repeater(schem, buildblock, v, forward, 1, 1)
-            d_repeater_u_repeater(schem, buildblock, v, forward, 1, 2)
+            d_repeater_u_repeater(blocks, buildblock, v, forward, 1, 1)
+            d_repeater_u_repeater(blocks, buildblock, v, forward, 1, 2)
         elif delay % 4 == 2:
             delay -= 2
-            d_repeater_u_repeater(schem, buildblock, v, forward, 1, 1)
+            d_repeater_u_repeater(blocks, buildblock, v, forward, 1, 1)
         elif delay % 4 == 3:
             delay -= 3
-            d_repeater_u_repeater(schem, buildblock, v, forward, 1, 2)
+            d_repeater_u_repeater(blocks, buildblock, v, forward, 1, 2)
         while delay > 0:
             delay -= 4
-            d_repeater_u_repeater(schem, buildblock, v, forward, 2, 2)
+            d_repeater_u_repeater(blocks, buildblock, v, forward, 2, 2)
         assert delay == 0, f"There shouldn't be any delay remaining, but it is {delay}!"
-        d_loopback_u_block(schem, buildblock, v, forward, loopback)
+        d_loopback_u_block(blocks, buildblock, v, forward, loopback)
 
     # same as md4, except we can chain 2 tick repeaters everywhere
-    def create_delay_md5(schem, buildblock, v, forward, delay, loopback):
+    def create_delay_md5(blocks, buildblock, v, forward, delay, loopback):
         if delay % 4 == 0:
             while delay > 0:
                 delay -= 4
-                d_repeater_u_repeater(schem, buildblock, v, forward, 2, 2)
+                d_repeater_u_repeater(blocks, buildblock, v, forward, 2, 2)
             assert delay == 0, f"There shouldn't be any delay remaining, but it is {delay}!"
-            d_loopback_u_block(schem, buildblock, v, forward, loopback)
+            d_loopback_u_block(blocks, buildblock, v, forward, loopback)
         else:
-            create_delay_md4(schem, buildblock, v, forward, delay, loopback)
+            create_delay_md4(blocks, buildblock, v, forward, delay, loopback)
 
     # 3 tick repeaters everywhere, repeater chaining at the bottom needs to end with a 2 or 1 tick repeater
-    def create_delay_md6(schem, buildblock, v, forward, delay, loopback):
+    def create_delay_md6(blocks, buildblock, v, forward, delay, loopback):
         if delay == 6:
             delay -= 6
-            d_repeater_u_repeater(schem, buildblock, v, forward, 3, 3)
+            d_repeater_u_repeater(blocks, buildblock, v, forward, 3, 3)
         elif delay % 6 in [0, 1]:
             rem = delay % 6
             delay -= (6 + rem)
-            d_repeater_u_repeater(schem, buildblock, v, forward, 1, 1)
-            d_repeater_u_repeater(schem, buildblock, v, forward, 1 + rem, 3)
+            d_repeater_u_repeater(blocks, buildblock, v, forward, 1, 1)
+            d_repeater_u_repeater(blocks, buildblock, v, forward, 1 + rem, 3)
         elif delay % 6 in [2, 3, 4, 5]:
             rem = delay % 6
             delay -= rem
             d_delay = 2 if rem == 5 else 1
-            d_repeater_u_repeater(schem, buildblock, v, forward, d_delay, rem - d_delay)
+            d_repeater_u_repeater(blocks, buildblock, v, forward, d_delay, rem - d_delay)
         while delay > 0:
             delay -= 6
-            d_repeater_u_repeater(schem, buildblock, v, forward, 3, 3)
+            d_repeater_u_repeater(blocks, buildblock, v, forward, 3, 3)
         assert delay == 0, f"There shouldn't be any delay remaining, but it is {delay}!"
-        d_loopback_u_block(schem, buildblock, v, forward, loopback)
+        d_loopback_u_block(blocks, buildblock, v, forward, loopback)
 
     # same as md6, except we can chain 3 tick repeaters everywhere
-    def create_delay_md7(schem, buildblock, v, forward, delay, loopback):
+    def create_delay_md7(blocks, buildblock, v, forward, delay, loopback):
         if delay % 6 == 0:
             while delay > 0:
                 delay -= 6
-                d_repeater_u_repeater(schem, buildblock, v, forward, 3, 3)
+                d_repeater_u_repeater(blocks, buildblock, v, forward, 3, 3)
             assert delay == 0, f"There shouldn't be any delay remaining, but it is {delay}!"
-            d_loopback_u_block(schem, buildblock, v, forward, loopback)
+            d_loopback_u_block(blocks, buildblock, v, forward, loopback)
         else:
-            create_delay_md6(schem, buildblock, v, forward, delay, loopback)
+            create_delay_md6(blocks, buildblock, v, forward, delay, loopback)
 
     # 4 tick repeaters everywhere, repeater chaining at the bottom needs to end with a <4 tick repeater
-    def create_delay_md8(schem, buildblock, v, forward, delay, loopback):
+    def create_delay_md8(blocks, buildblock, v, forward, delay, loopback):
         if delay == 8:
             delay -= 8
-            d_repeater_u_repeater(schem, buildblock, v, forward, 4, 4)
+            d_repeater_u_repeater(blocks, buildblock, v, forward, 4, 4)
         elif delay % 8 in [0, 1]:
             rem = delay % 8
             delay -= (8 + rem)
-            d_repeater_u_repeater(schem, buildblock, v, forward, 1, 1)
-            d_repeater_u_repeater(schem, buildblock, v, forward, 2 + rem, 4)
+            d_repeater_u_repeater(blocks, buildblock, v, forward, 1, 1)
+            d_repeater_u_repeater(blocks, buildblock, v, forward, 2 + rem, 4)
         elif delay % 8 in [2, 3, 4, 5, 6, 7]:
             rem = delay % 8
             delay -= rem
             d_delay = rem - 4 if rem in [6, 7] else 1
-            d_repeater_u_repeater(schem, buildblock, v, forward, d_delay, rem - d_delay)
+            d_repeater_u_repeater(blocks, buildblock, v, forward, d_delay, rem - d_delay)
         while delay > 0:
             delay -= 8
-            d_repeater_u_repeater(schem, buildblock, v, forward, 4, 4)
+            d_repeater_u_repeater(blocks, buildblock, v, forward, 4, 4)
         assert delay == 0, f"There shouldn't be any delay remaining, but it is {delay}!"
-        d_loopback_u_block(schem, buildblock, v, forward, loopback)
+        d_loopback_u_block(blocks, buildblock, v, forward, loopback)
 
     # same as md8, except we can chain 4 tick repeaters everywhere
-    def create_delay_md9_or_above(schem, buildblock, v, forward, delay, loopback):
+    def create_delay_md9_or_above(blocks, buildblock, v, forward, delay, loopback):
         if delay % 8 == 0:
             while delay > 0:
                 delay -= 8
-                d_repeater_u_repeater(schem, buildblock, v, forward, 4, 4)
+                d_repeater_u_repeater(blocks, buildblock, v, forward, 4, 4)
             assert delay == 0, f"There shouldn't be any delay remaining, but it is {delay}!"
-            d_loopback_u_block(schem, buildblock, v, forward, loopback)
+            d_loopback_u_block(blocks, buildblock, v, forward, loopback)
         else:
-            create_delay_md8(schem, buildblock, v, forward, delay, loopback)
+            create_delay_md8(blocks, buildblock, v, forward, delay, loopback)
 
     delay_functions = {
         2: create_delay_md2,
@@ -315,4 +466,4 @@ def build_delay(schem, buildblock, v, forward, delay, md, loopback=True):
     }
     
     # actually executing the needed thing:
-    delay_functions[min(md, 9)](schem, buildblock, v, forward, delay, loopback)
+    delay_functions[min(md, 9)](blocks, buildblock, v, forward, delay, loopback)
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+
+from os import environ, makedirs, scandir, replace, remove, utime, getpid
+from os.path import join, expanduser, dirname, exists, getsize
+from shutil import copyfile
+from hashlib import sha256
+from . import __version__
+
+DEFAULT_MAX_SIZE = 1 << 30 # 1 GiB
+_FORMAT = 1 # increase if the layout of the cache directory changes
+
+# cache directory: its size in bytes, as far as this process knows: it's scanned once, kept up to date by the stores
+# of this process, and scanned again when it's pruned, so the directory isn't scanned after every store
+# (it's per process and not per ConversionCache, as the workers of convert_many get a new copy of the cache with every song)
+_known_sizes = {}
+
+# GALAXY_JUKEBOX_CACHE_DIR if it's set, otherwise the per user cache directory of the platform
+def default_cache_dir():
+    if "GALAXY_JUKEBOX_CACHE_DIR" in environ:
+        return environ["GALAXY_JUKEBOX_CACHE_DIR"]
+    if "LOCALAPPDATA" in environ: # windows
+        return join(environ["LOCALAPPDATA"], "galaxy_jukebox", "cache")
+    return join(environ.get("XDG_CACHE_HOME") or expanduser("~/.cache"), "galaxy_jukebox")
+
+"""
+content-addressed cache of converted schematics: the key is the hash of the .nbs file's bytes, the title on
+the sign (see main.get_title), the conversion options, the output format and the version of galaxy_jukebox,
+so a cached schematic is never stale
+every entry is one file, the last time it was used is its modification time: when the cache gets bigger
+than max_size bytes, the least recently used entries are removed
+(only the entries stored by the same process are counted until the next prune, so with several processes
+storing at the same time, the cache can grow a bit above max_size before it's pruned)
+it can be shared by several processes (e.g. the workers of convert_many), entries are written atomically
+"""
+class ConversionCache:
+
+    def __init__(self, directory=None, max_size=DEFAULT_MAX_SIZE):
+        self.directory = directory if directory is not None else default_cache_dir()
+        self.max_size = max_size
+
+    def __repr__(self):
+        return f"[ConversionCache in {self.directory}, max {self.max_size} bytes]"
+
+    def key(self, nbs_bytes, title, use_redstone_lamp, sides_mode, output_format, layout_objective=None, line_order="pitch"):
+        digest = sha256(nbs_bytes)
+        options = (title, use_redstone_lamp, sides_mode, output_format, __version__, _FORMAT)
+        if layout_objective is not None or line_order != "pitch":
+            options += (layout_objective, line_order)
+        digest.update(repr(options).encode())
+        return digest.hexdigest()
+
+    def _path(self, key):
+        return join(self.directory, key[:2], key + ".schem")
+
+    # copies the cached schematic to out_path, returns whether it was in the cache
+    # it's copied into a temporary file first, so out_path is never left half written
+    def fetch(self, key, out_path):
+        path = self._path(key)
+        temp_path = f"{out_path}.{getpid()}.tmp"
+        try:
+            copyfile(path, temp_path)
+            replace(temp_path, out_path)
+        except FileNotFoundError: # also if it was removed by another process meanwhile
+            return False
+        finally:
+            if exists(temp_path):
+                remove(temp_path)
+        try:
+            utime(path) # it's the most recently used now
+        except FileNotFoundError:
+            pass
+        return True
+
+    # stores the schematic at schem_path under key, then removes the least recently used entries if the cache got too big
+    def store(self, key, schem_path):
+        path = self._path(key)
+        makedirs(dirname(path), exist_ok=True)
+        temp_path = f"{path}.{getpid()}.tmp"
+        copyfile(schem_path, temp_path)
+        added = getsize(temp_path)
+        size = self._known_size()
+        try: # replacing an entry that was stored meanwhile by another process
+            size -= getsize(path)
+        except FileNotFoundError:
+            pass
+        replace(temp_path, path)
+        _known_sizes[self.directory] = size + added
+        if size + added > self.max_size:
+            self.prune()
+
+    def _known_size(self):
+        if self.directory not in _known_sizes:
+            _known_sizes[self.directory] = self.size()
+        return _known_sizes[self.directory]
+
+    # every entry: (path, size, last use)
+    def _entries(self):
+        entries = []
+        try:
+            subdirs = [entry.path for entry in scandir(self.directory) if entry.is_dir()]
+        except FileNotFoundError:
+            return entries
+        for subdir in subdirs:
+            for entry in scandir(subdir):
+                if entry.name[-6:] == ".schem":
+                    try:
+                        stat = entry.stat()
+                        entries.append((entry.path, stat.st_size, stat.st_mtime))
+                    except FileNotFoundError:
+                        pass
+        return entries
+
+    def size(self):
+        return sum(size for path, size, last_use in self._entries())
+
+    # removes the least recently used entries, until the cache is at most max_size (default: self.max_size) bytes
+    # returns how many entries were removed, and how many bytes were freed
+    def prune(self, max_size=None):
+        if max_size is None:
+            max_size = self.max_size
+        entries = self._entries()
+        total = sum(size for path, size, last_use in entries)
+        removed = 0
+        freed = 0
+        for path, size, last_use in sorted(entries, key=lambda e: e[2]):
+            if total <= max_size:
+                break
+            try:
+                remove(path)
+                removed += 1
+                freed += size
+            except FileNotFoundError:
+                pass
+            total -= size
+        _known_sizes[self.directory] = total
+        return removed, freed
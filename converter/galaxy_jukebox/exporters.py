@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+
+from .sponge import save_schematic
+from .litematic import save_litematic
+from .anvil import save_region_files
+
+# every exporter is called with the BlockBuffer of the contraption, the output path, the title of the song,
+# the world offset (only the anvil exporter uses it, the others are pasted wherever the player wants),
+# and the gzip level and thread count (only the gzipped formats use them)
+def _sponge(blocks, path, title, offset, compress_level, compress_threads):
+    save_schematic(blocks, path, compress_level=compress_level, compress_threads=compress_threads)
+
+def _litematic(blocks, path, title, offset, compress_level, compress_threads):
+    save_litematic(blocks, path, title, compress_level=compress_level, compress_threads=compress_threads)
+
+def _anvil(blocks, path, title, offset, compress_level, compress_threads):
+    save_region_files(blocks, path, offset)
+
+"""
+the output formats: name: (extension of the output, exporter), all of them are written from the same blocks
+"sponge": a sponge schematic (version 2) for WorldEdit and the like
+"litematic": a Litematica schematic
+"anvil": the region files of a Java world, the output is the world's region directory (without extension)
+"""
+FORMATS = {
+    "sponge": (".schem", _sponge),
+    "litematic": (".litematic", _litematic),
+    "anvil": ("", _anvil),
+}
+
+# the format of an output path from its extension, sponge if it doesn't have a known one
+def format_of(path):
+    for name, (extension, exporter) in FORMATS.items():
+        if extension != "" and path.endswith(extension):
+            return name
+    return "sponge"
+
+# out_path with the extension of output_format, if it doesn't have it yet
+def with_extension(out_path, output_format):
+    extension = FORMATS[output_format][0]
+    return out_path if out_path.endswith(extension) else out_path + extension
+
+# writes blocks (a BlockBuffer) into out_path in output_format (one of FORMATS)
+def export(blocks, out_path, output_format, title, offset=None, compress_level=9, compress_threads=1):
+    assert output_format in FORMATS, f"Unknown output format {output_format}, it should be one of {', '.join(FORMATS)}!"
+    FORMATS[output_format][1](blocks, out_path, title, offset, compress_level, compress_threads)
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+
+from math import sqrt, ceil
+import numpy as np
+from .split_lines import build_contraption
+from . import builder as bld
+from .block_buffer import CountingBuffer
+
+# returns the width of the left, middle and right side, and the height, for count lines, see main.convert for sides_mode
+def get_layout(count, sides_mode):
+    if sides_mode == -1:
+        if count <= 128: # 16*8
+            sides_mode = 1
+        elif count <= 256: # 2 * 16*8
+            sides_mode = 2
+        else:
+            sides_mode = 3
+
+    # imagining every side as a 2:1 rectangle, but we need to round to whole numbers:
+    height = int(0.5 + ceil(sqrt( count / (2 * sides_mode) )))
+    return _split_width(count, sides_mode, height)
+
+# the widths for height rows, the sides are as wide as possible, but not wider than the middle
+# side_change moves columns from the middle to the left and right sides (or back, if it's negative)
+def _split_width(count, sides_mode, height, side_change=0):
+    whole_width = int(0.5 + ceil(count / height))
+
+    # edge case if there's a single note block line (we do this so the redstone lamp doesn't collide with glass):
+    if whole_width == 1:
+        whole_width += 1
+
+    if sides_mode == 1:
+        left_width = 0
+        middle_width = whole_width
+        right_width = 0
+    elif sides_mode == 2:
+        left_width = whole_width // 2 + side_change
+        middle_width = whole_width - left_width
+        right_width = 0
+    else:
+        left_width = whole_width // 3 + side_change
+        middle_width = whole_width - 2 * left_width
+        right_width = left_width
+    return left_width, middle_width, right_width, height
+
+# every layout the optimizer looks at: every sides mode (or only sides_mode, if it isn't -1),
+# with heights around the default one, and a few different side widths
+def layout_candidates(count, sides_mode=-1):
+    candidates = []
+    for sides in ([1, 2, 3] if sides_mode == -1 else [sides_mode]):
+        default_height = get_layout(count, sides)[3]
+        for height in range(max(1, default_height - 4), default_height + 5):
+            for side_change in ([0] if sides == 1 else [-1, 0, 1]):
+                layout = _split_width(count, sides, height, side_change)
+                left_width, middle_width, right_width, height = layout
+                if min(left_width, right_width) >= 0 and (sides == 1 or left_width > 0) and middle_width >= max(1, left_width) \
+                        and (left_width + middle_width + right_width) * height >= count and layout not in candidates:
+                    candidates.append(layout)
+    return candidates
+
+# the order of the lines on the wall without assign_lines: from the lowest instrument and note
+def pitch_order(line):
+    return line.note + 100 * line.instrument
+
+# the orders the lines can be placed in, see assign_lines
+LINE_ORDERS = ["pitch", "spiral"]
+
+"""
+puts lines (SplitLines in pitch order) into the places of layout, returns them in the order begin_lines places them
+"pitch": as they are, the lowest instrument and note is in the upper left corner
+"spiral": the lines with the longest spirals (see SplitLine.spiral_length) go into the first columns, whose spirals
+are the innermost ones with the shortest rings, so that the long spirals don't have to go around all the others,
+this makes the contraption smaller horizontally, and the recommended render distance lower
+inside every column, the lines are still in pitch order
+"""
+def assign_lines(lines, layout, line_order="pitch"):
+    assert line_order in LINE_ORDERS, f"Unknown line order {line_order}, it should be one of {', '.join(LINE_ORDERS)}!"
+    if line_order == "pitch":
+        return lines
+    cols = _line_columns(len(lines), *layout)[0]
+    by_length = sorted(lines, key=lambda l: -l.spiral_length())
+    assigned = []
+    begin = 0
+    for end in range(1, len(lines) + 1):
+        if end == len(lines) or cols[end] != cols[begin]:
+            assigned += sorted(by_length[begin:end], key=pitch_order)
+            begin = end
+    return assigned
+
+# the column and the number of columns until the middle of every line, in the order they are placed,
+# the same way split_lines.build_contraption.begin_lines places them
+def _line_columns(count, left_width, middle_width, right_width, height):
+    cols = []
+    dists = []
+    prev_width = 0
+    for width, side in [(left_width, "left"), (middle_width, "middle"), (right_width, "right")]:
+        for col in range(2 * width):
+            for row in range((height + (1 - col % 2)) // 2):
+                if len(cols) == count:
+                    return np.array(cols), np.array(dists)
+                cols.append(prev_width + col // 2)
+                dists.append(0 if side == "middle" else (2 * width - col if side == "left" else col + 1))
+        prev_width += width
+    return np.array(cols), np.array(dists)
+
+"""
+the fast cost model: what the contraption of layout would be like, from the lengths of the spirals (in the
+order the lines are placed, see SplitLine.spiral_length), without building anything
+a spiral goes around in rings, with the same turns as in split_lines.build_contraption, every ring is
+2*width blocks longer on both sides than the previous one, this gives how many sides along Z and X every
+spiral needs, and how far out its last ones are
+returns the approximate (X extent, Y extent, Z extent, block count)
+"""
+def model_layout(spiral_lengths, left_width, middle_width, right_width, height):
+    width = left_width + middle_width + right_width
+    view_distance = max(left_width, right_width, middle_width)
+    cols, dists = _line_columns(len(spiral_lengths), left_width, middle_width, right_width, height)
+    walkway_length = max(1, left_width * 2 - view_distance)
+    # the first side along Z starts behind the glass walkway, and ends in front of the noteblocks, the side turns, and the adjustments
+    first_z = view_distance + max(right_width * 2 - view_distance, 2 + walkway_length) + height + 27
+    first_x = 2 * width + 13
+    # the blocks until the end of the n-th ring: first + n * per_ring + 2 * width * n * (n - 1), solving for n,
+    # without rounding it up, so that a spiral that barely gets into its last ring counts less than one that fills it
+    first = 11 + 6 * cols
+    per_ring = first_z + first_x + 8 * cols
+    a = 2 * width
+    b = per_ring - a
+    c = first - spiral_lengths
+    rings = np.maximum(0, (-b + np.sqrt(np.maximum(0, b * b - 4 * a * c))) / (2 * a))
+    # the last ring may end before its side along X
+    until_x_side = first + (rings - 1) * per_ring + a * (rings - 1) * (rings - 2) + first_z + 4 * cols + a * (rings - 1)
+    x_sides = np.where(spiral_lengths > until_x_side, rings, rings - 1)
+    z_extent = int((first_z + 4 * cols + a * (rings - 1))[rings > 0].max(initial=first_z))
+    x_extent = int((first_x + 4 * cols + a * (x_sides - 1))[x_sides > 0].max(initial=first_x))
+    y_extent = 4 * height + 2
+    # a delay n blocks long has about 4n blocks, the lines have their noteblock, their turn and adjustments in front of it
+    blocks = int(4 * spiral_lengths.sum() + (4 * dists + 2 * height + 40).sum())
+    return x_extent, y_extent, z_extent, blocks
+
+# what measure_layout returns
+class LayoutMeasure:
+
+    def __init__(self, layout, size, blocks, render_distance):
+        self.layout = layout # (left width, middle width, right width, height)
+        self.size = size # (width, height, length) of the schematic, along X, Y and Z
+        self.blocks = blocks # approximately how many blocks are placed
+        self.render_distance = render_distance # the recommended render distance (on the sign)
+
+    def __repr__(self):
+        return f"[LayoutMeasure of {self.layout}: {'x'.join(map(str, self.size))}, {self.blocks} blocks, render distance {self.render_distance}]"
+
+    @property
+    def volume(self):
+        return self.size[0] * self.size[1] * self.size[2]
+
+# lays out lines (SplitLines, they are changed, so they can't be built afterwards) without building it, see main.estimate
+def measure_layout(lines, layout, title="", use_redstone_lamp=True):
+    left_width, middle_width, right_width, height = layout
+    blocks = CountingBuffer()
+    with bld.building():
+        render_distance = build_contraption(blocks, lines, left_width, middle_width, right_width, height, title, use_redstone_lamp)
+    low, high = blocks.bounds()
+    size = (high[0] - low[0] + 1, high[1] - low[1] + 1, high[2] - low[2] + 1)
+    return LayoutMeasure(layout, size, len(blocks), render_distance)
+
+# what the layouts are compared by: the objective first, then the others, for the model and for the measure
+OBJECTIVES = {
+    "render_distance": (lambda x, y, z, blocks: (max(x, z), x * y * z, blocks),
+                        lambda m: (m.render_distance, m.volume, m.blocks)),
+    "volume": (lambda x, y, z, blocks: (x * y * z, max(x, z), blocks),
+               lambda m: (m.volume, m.render_distance, m.blocks)),
+    "blocks": (lambda x, y, z, blocks: (blocks, x * y * z),
+               lambda m: (m.blocks, m.volume, m.render_distance)),
+}
+
+"""
+searches for the layout with the best objective (one of OBJECTIVES): the smallest recommended render distance,
+the smallest volume of the schematic, or the least blocks
+make_lines is a function that returns new SplitLines of the song every time (they are changed while laid out),
+they are placed in line_order (see assign_lines)
+every candidate (see layout_candidates) is ranked by the fast model (see model_layout), then the best
+exact ones, and the default layout, are laid out for real (see measure_layout), and the best of these wins,
+so the result is never worse than the default layout
+returns the LayoutMeasure of the chosen layout
+"""
+def optimize_layout(make_lines, objective="render_distance", sides_mode=-1, title="", use_redstone_lamp=True, exact=4, line_order="pitch"):
+    assert objective in OBJECTIVES, f"Unknown objective {objective}, it should be one of {', '.join(OBJECTIVES)}!"
+    model_key, measure_key = OBJECTIVES[objective]
+    lines = make_lines()
+    spiral_lengths = np.array([line.spiral_length() for line in lines], dtype=np.float64)
+    if line_order == "spiral": # the order inside the columns doesn't matter for the model
+        spiral_lengths = -np.sort(-spiral_lengths)
+    candidates = layout_candidates(len(lines), sides_mode)
+    ranked = sorted(candidates, key=lambda layout: model_key(*model_layout(spiral_lengths, *layout)))
+    default = get_layout(len(lines), sides_mode)
+    chosen = [default] + [layout for layout in ranked[:exact] if layout != default]
+    measures = [measure_layout(assign_lines(make_lines(), layout, line_order), layout, title, use_redstone_lamp) for layout in chosen]
+    return min(measures, key=measure_key)
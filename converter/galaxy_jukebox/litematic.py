@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+
+import numpy as np
+from nbtlib import parse_nbt
+from .nbt import NbtWriter, COMPOUND
+from .parallel_gzip import gzip_writer
+from .volume import Volume, block_state, parse_state, pack_bits, block_entity_id
+from .sponge import DATA_VERSION_1_14
+
+LITEMATIC_VERSION = 4 # the schematic format version of Litematica for Minecraft 1.13-1.17
+
+"""
+writes volume (a Volume, or a BlockBuffer which is resolved into one) into path as a Litematica schematic,
+with one region, named name, the same blocks as the sponge schematic, and the origin at its -X -Y -Z corner
+the file doesn't depend on when it was written (the creation and modification times are 0)
+compress_level and compress_threads are the same as for sponge.save_schematic
+"""
+def save_litematic(volume, path, name="Galaxy Jukebox", data_version=DATA_VERSION_1_14, compress_level=9, compress_threads=1):
+    if not isinstance(volume, Volume):
+        volume = Volume.from_buffer(volume)
+    width, height, length = volume.size
+    # every value takes the same number of bits, at least 2
+    bits = max(2, (len(volume.states) - 1).bit_length())
+    block_states = pack_bits(volume.blocks, bits)
+
+    with open(path, "wb") as raw, gzip_writer(raw, compress_level, compress_threads) as out:
+        writer = NbtWriter(out)
+        writer.compound("")
+        writer.int("MinecraftDataVersion", data_version)
+        writer.int("Version", LITEMATIC_VERSION)
+        writer.compound("Metadata")
+        _write_xyz(writer, "EnclosingSize", width, height, length)
+        writer.string("Author", "Galaxy Jukebox")
+        writer.string("Description", "")
+        writer.string("Name", name)
+        writer.int("RegionCount", 1)
+        writer.long("TimeCreated", 0)
+        writer.long("TimeModified", 0)
+        writer.int("TotalBlocks", int(np.count_nonzero(volume.blocks)))
+        writer.int("TotalVolume", width * height * length)
+        writer.end()
+        writer.compound("Regions")
+        writer.compound(name)
+        _write_xyz(writer, "Position", 0, 0, 0)
+        _write_xyz(writer, "Size", width, height, length)
+        writer.compound_list("BlockStatePalette", len(volume.states))
+        for state in volume.states:
+            block, properties = parse_state(state)
+            writer.string("Name", block)
+            if properties:
+                writer.compound("Properties")
+                for key, value in properties.items():
+                    writer.string(key, value)
+                writer.end()
+            writer.end()
+        writer.long_array("BlockStates", block_states)
+        writer.compound_list("TileEntities", len(volume.block_entities))
+        for x, y, z, block in volume.block_entities:
+            for key, tag in parse_nbt(block[len(block_state(block)):]).items():
+                writer.tag(key, tag)
+            writer.string("id", block_entity_id(block))
+            writer.int("x", x)
+            writer.int("y", y)
+            writer.int("z", z)
+            writer.end()
+        writer.list("Entities", COMPOUND, 0)
+        writer.list("PendingBlockTicks", COMPOUND, 0)
+        writer.list("PendingFluidTicks", COMPOUND, 0)
+        writer.end()
+        writer.end()
+        writer.end()
+
+def _write_xyz(writer, name, x, y, z):
+    writer.compound(name)
+    writer.int("x", x)
+    writer.int("y", y)
+    writer.int("z", z)
+    writer.end()
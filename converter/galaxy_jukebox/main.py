@@ -1,14 +1,20 @@
 #!/usr/bin/env python3
 
 from os.path import basename
-from pynbs import read
-from .unsplit_lines import lines_from_song
+from .nbs import read_song
+from .unsplit_lines import lines_from_song, song_min_line_count
 from .split_lines import SplitLine, build_contraption
-from math import sqrt, ceil
+from . import builder as bld
+from .block_buffer import BlockBuffer, CountingBuffer
+from .sponge import DATA_VERSION_1_14
+from .exporters import FORMATS, export, format_of, with_extension
+from .profiler import NULL_PROFILER
+from .layout import get_layout, optimize_layout, assign_lines, pitch_order
 
-#from mcschematic_safe import MCSchematic, Version # mcschematic_safe has a warning if we're replacing an already set block with setblock, helping us find bugs/obvious problems in our algorithm
-# https://github.com/4321ba/Galaxy_Jukebox/blob/ee404ddf33f0d11f4d2c8b10caf065a8ac8374fd/mcschematic_safe.py
-from mcschematic import MCSchematic, Version
+# how long the conversion takes, for every block placed and for every block of the volume of the schematic
+# measured on the benchmarks (see benchmarks/bench.py), with one CPU core
+_SECONDS_PER_BLOCK = 2.2e-6
+_SECONDS_PER_VOLUME = 1.0e-8
 
 # filename can be empty string
 def get_title(song, filename):
@@ -25,69 +31,148 @@ def get_title(song, filename):
         title += " orig.: " + song.header.original_author
     return title
 
+# new SplitLines from the UnsplitLines (see unsplit_lines.lines_from_song), in pitch order
+# building them changes them, so every layout that is tried needs new ones
+def split_lines(unsplit_lines):
+    lines = []
+    # converting from UnsplitLine to SplitLine
+    # note that the actual splitting has already happened in lines_from_song
+    for line in unsplit_lines:
+        lines.append(SplitLine(line.key, line.instrument, line.ticks))
+    lines.sort(key=pitch_order)
+    return lines
+
+# returns the title, the UnsplitLines, and the SplitLines of song (a pynbs.File or nbs.SongTicks)
+def get_lines(song, filename, profile=NULL_PROFILER):
+    title = get_title(song, filename)
+
+    with profile.stage("lines_from_song"):
+        unsplit_lines = lines_from_song(song)
+    with profile.stage("split_lines"):
+        lines = split_lines(unsplit_lines)
+    assert len(lines) > 0, "There is no line to convert, I need notes!"
+    return title, unsplit_lines, lines
+
+# the width of the left, middle and right side, and the height, the fixed one if objective is None, see convert
+def choose_layout(unsplit_lines, lines, sides_mode, objective, title, use_redstone_lamp, line_order):
+    if objective is None:
+        return get_layout(len(lines), sides_mode)
+    return optimize_layout(lambda: split_lines(unsplit_lines), objective, sides_mode, title, use_redstone_lamp, line_order=line_order).layout
+
 """
-song is either pynbs.File or string (= input path)
+song is either pynbs.File, nbs.SongTicks or string (= input path)
 use_redstone_lamp: whether or not to place redstone lamp next to the noteblock
 sides_mode is how many sides the noteblocks should have (-1, or between 1 and 3)
 -1: using one of the 3 based on noteblock count
 1: 2n wide, n high rectangle in front
 2: 2n×n rectangle to the right and another in front
 3: 2n×n rectangles on all 3 sides
+cache is an optional cache.ConversionCache: if song is an input path that has already been converted
+with the same options, the cached schematic is copied to out_path instead of converting it again
+jobs is how many worker processes build the lines (None: one per CPU core), the result is the same with any
+profile is an optional profiler.Profiler, it records how long every stage of the conversion takes
+layout_objective: None places the noteblocks in the fixed 2:1 rectangles of sides_mode, otherwise the layout is searched
+for that is the best for it (see layout.optimize_layout, sides_mode -1 lets it choose the side count too):
+"render_distance": the smallest recommended render distance, "volume": the smallest schematic, "blocks": the least blocks
+line_order is which line goes where on the wall (see layout.assign_lines): "pitch" orders them by instrument and note,
+"spiral" puts the lines with the longest spirals into the first columns, for a smaller render distance
+output_format is one of exporters.FORMATS, None: from the extension of out_path (sponge, if it doesn't have a known one),
+out_path gets the extension of the format, if it doesn't have it yet
+"anvil" writes the region files of a (1.14 or 1.15) world into the directory out_path, with the start button at
+world_offset (X, Y, Z), which it needs (the other formats are pasted wherever the player wants, world_offset doesn't
+matter for them), it isn't cached
+compress_level (0-9) and compress_threads are how the gzipped formats are compressed: compress_threads=1 compresses
+on this thread, otherwise the file is compressed in blocks, on that many threads (None: one per CPU core),
+see parallel_gzip.ParallelGzipFile; they don't change the content of the schematic, so the cache ignores them
 """
-def convert(song, out_path, use_redstone_lamp=True, sides_mode=-1):
+def convert(song, out_path, use_redstone_lamp=True, sides_mode=-1, cache=None, jobs=1, profile=None, layout_objective=None, line_order="pitch",
+            output_format=None, world_offset=None, compress_level=9, compress_threads=1):
+    if profile is None:
+        profile = NULL_PROFILER
+    if output_format is None:
+        output_format = format_of(out_path)
+    assert output_format != "anvil" or world_offset is not None, "The contraption can't be written into a world without a world offset!"
+    out_path = with_extension(out_path, output_format)
     filename = ""
+    cache_key = None
     if type(song) == str:
         filename = song
-        song = read(song)
+        with profile.stage("read_song"):
+            song = read_song(song)
+        # the title is on the sign, and it comes from the filename if the song has no name, so it's a part of the key too
+        if cache is not None and output_format != "anvil":
+            output_version = ("sponge2" if output_format == "sponge" else output_format) + f"/{DATA_VERSION_1_14}"
+            with profile.stage("cache_fetch"):
+                with open(filename, "rb") as nbs:
+                    cache_key = cache.key(nbs.read(), get_title(song, filename), use_redstone_lamp, sides_mode, output_version, layout_objective, line_order)
+                if cache.fetch(cache_key, out_path):
+                    return
     
-    title = get_title(song, filename)
-
-    unsplit_lines = lines_from_song(song)
-    lines = []
-    # converting from UnsplitLine to SplitLine
-    # note that the actual splitting has already happened in lines_from_song
-    for line in unsplit_lines:
-        lines.append(SplitLine(line.key, line.instrument, line.ticks))
-    lines.sort(key=lambda l: l.note + 100 * l.instrument)
-        
-    count = len(lines)
-    assert count > 0, "There is no line to convert, I need notes!"
-    if count <= 0: # if assertions are excluded, we just silently exit
+    title, unsplit_lines, lines = get_lines(song, filename, profile)
+    if not lines: # if assertions are excluded, we just silently exit
         return
-    
-    if sides_mode == -1:
-        if count <= 128: # 16*8
-            sides_mode = 1
-        elif count <= 256: # 2 * 16*8
-            sides_mode = 2
-        else:
-            sides_mode = 3
-    
-    # imagining every side as a 2:1 rectangle, but we need to round to whole numbers:
-    height = int(0.5 + ceil(sqrt( count / (2 * sides_mode) )))
-    whole_width = int(0.5 + ceil(count / height))
-    
-    # edge case if there's a single note block line (we do this so the redstone lamp doesn't collide with glass):
-    if whole_width == 1:
-        whole_width += 1
+    build_schematic(title, unsplit_lines, lines, out_path, use_redstone_lamp, sides_mode, jobs, profile, layout_objective, line_order,
+                    output_format, world_offset, compress_level, compress_threads)
+    if cache_key is not None:
+        with profile.stage("cache_store"):
+            cache.store(cache_key, out_path)
 
-    schem = MCSchematic()
+# lays out and builds lines (the SplitLines of unsplit_lines), and saves it to out_path, see convert for the rest
+def build_schematic(title, unsplit_lines, lines, out_path, use_redstone_lamp, sides_mode, jobs, profile, layout_objective, line_order,
+                    output_format="sponge", world_offset=None, compress_level=9, compress_threads=1):
+    with profile.stage("layout"):
+        layout = choose_layout(unsplit_lines, lines, sides_mode, layout_objective, title, use_redstone_lamp, line_order)
+        lines = assign_lines(lines, layout, line_order)
+    left_width, middle_width, right_width, height = layout
     
-    if sides_mode == 1:
-        left_width = 0
-        middle_width = whole_width
-        right_width = 0
-    elif sides_mode == 2:
-        left_width = whole_width // 2
-        middle_width = whole_width - left_width
-        right_width = 0
-    else:
-        left_width = whole_width // 3
-        middle_width = whole_width - 2 * left_width
-        right_width = left_width
-    
-    build_contraption(schem, lines, left_width, middle_width, right_width, height, title, use_redstone_lamp)
-    
-    if out_path[-6:] == ".schem": # library adds extension even if present
-        out_path = out_path[:-6]
-    schem.save("", out_path, Version.JE_1_14)
+    # the contraption is built into a buffer of block placements first, and it is turned into a schematic only at the end
+    with bld.building():
+        blocks = BlockBuffer()
+        with profile.stage("build_contraption"):
+            render_distance = build_contraption(blocks, lines, left_width, middle_width, right_width, height, title, use_redstone_lamp, jobs, profile)
+        with profile.stage("save_schematic"):
+            export(blocks, out_path, output_format, title, world_offset, compress_level, compress_threads)
+
+
+# what a conversion would produce, see estimate
+class Estimate:
+
+    def __init__(self, title, lines, min_lines, widths, height, size, blocks, render_distance, seconds):
+        self.title = title
+        self.lines = lines # the number of noteblock lines
+        self.min_lines = min_lines # the least number of lines the song can be built with, see unsplit_lines.song_min_line_count
+        self.widths = widths # (left, middle, right), the noteblock columns on the sides
+        self.height = height # the noteblock rows
+        self.size = size # (width, height, length) of the schematic, along X, Y and Z
+        self.blocks = blocks # approximately how many blocks are placed
+        self.render_distance = render_distance # the recommended render distance (on the sign)
+        self.seconds = seconds # roughly how long the conversion takes (on a computer like the one it was measured on)
+
+    def __repr__(self):
+        return (f"[Estimate of {self.title!r}: {self.lines} lines, {'x'.join(map(str, self.size))} blocks big, "
+                f"{self.blocks} blocks, render distance {self.render_distance}, {self.seconds:.1f}s]")
+
+"""
+estimates what convert would produce, without building the contraption: the song is read and split into lines,
+and the layout is computed the same way, but the blocks are only counted (see block_buffer.CountingBuffer):
+the spirals are only walked along (see split_lines.SplitLine.estimate_delays), and the rest of the lines is
+counted part by part, without placing the blocks (see split_lines.SplitLine.estimate_noteblock)
+song, use_redstone_lamp, sides_mode, layout_objective and line_order are the same as for convert, returns an Estimate
+the size and the render distance are exact, the block count is a slight overestimate
+"""
+def estimate(song, use_redstone_lamp=True, sides_mode=-1, layout_objective=None, line_order="pitch"):
+    filename = ""
+    if type(song) == str:
+        filename = song
+        song = read_song(song)
+    title, unsplit_lines, lines = get_lines(song, filename)
+    layout = choose_layout(unsplit_lines, lines, sides_mode, layout_objective, title, use_redstone_lamp, line_order)
+    lines = assign_lines(lines, layout, line_order)
+    left_width, middle_width, right_width, height = layout
+    blocks = CountingBuffer()
+    with bld.building():
+        render_distance = build_contraption(blocks, lines, left_width, middle_width, right_width, height, title, use_redstone_lamp)
+    low, high = blocks.bounds()
+    size = (high[0] - low[0] + 1, high[1] - low[1] + 1, high[2] - low[2] + 1)
+    seconds = _SECONDS_PER_BLOCK * len(blocks) + _SECONDS_PER_VOLUME * size[0] * size[1] * size[2]
+    return Estimate(title, len(lines), song_min_line_count(song), (left_width, middle_width, right_width), height, size, len(blocks), render_distance, seconds)
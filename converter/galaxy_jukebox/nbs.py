@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+
+from array import array
+from pynbs import Parser
+
+"""
+a song, decoded only as far as the conversion needs it
+header is a pynbs.Header
+ticks is a dict indexed with (key, instrument), the values are array("i")s of the (NBS) ticks of the notes
+of that line, in increasing order, a tick is repeated if more notes of the line play at the same time
+the lines are in the order of their first note, like iterating over a pynbs.File gives them
+custom instruments are left out
+"""
+class SongTicks:
+
+    def __init__(self, header, ticks):
+        self.header = header
+        self.ticks = ticks
+
+    def __repr__(self):
+        return f"[SongTicks of {self.header.song_name!r} with {len(self.ticks)} lines]"
+
+"""
+reads an .nbs file straight into a SongTicks
+the header is parsed by pynbs, but the notes are decoded here in one pass over the bytes,
+without creating an object for every note, the layers and custom instruments after them aren't read
+"""
+def read_song(filename):
+    with open(filename, "rb") as nbs:
+        header = Parser(nbs).parse_header()
+        data = nbs.read()
+    # after the instrument and the key, version 4 and above has velocity, panning and pitch (2 bytes)
+    skip = 6 if header.version >= 4 else 2
+    default_instruments = header.default_instruments
+    lines = {} # indexed with key + 256 * instrument, until the end
+    pos = 0
+    tick = -1
+    try:
+        while True:
+            jump = data[pos] | data[pos + 1] << 8 # jump to the next tick
+            pos += 2
+            if jump == 0:
+                break
+            tick += jump
+            while True:
+                jump = data[pos] | data[pos + 1] << 8 # jump to the next layer, we don't need which one
+                pos += 2
+                if jump == 0:
+                    break
+                instrument = data[pos]
+                if instrument < default_instruments: # skipping custom instruments
+                    code = data[pos + 1] + 256 * instrument
+                    line = lines.get(code)
+                    if line is None:
+                        line = lines[code] = array("i")
+                    line.append(tick)
+                pos += skip
+    except IndexError:
+        raise ValueError(f"The notes of {filename} are cut off, it isn't a valid .nbs file!") from None
+    return SongTicks(header, {(code % 256, code // 256): line for code, line in lines.items()})
+
+# the same SongTicks from an already read pynbs.File
+def song_ticks(song):
+    lines = {}
+    for tick, chord in song:
+        for note in chord:
+            if note.instrument < song.header.default_instruments:
+                code = (note.key, note.instrument)
+                if code not in lines:
+                    lines[code] = array("i")
+                lines[code].append(tick)
+    return SongTicks(song.header, lines)
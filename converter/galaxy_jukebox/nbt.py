@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+
+from struct import Struct
+import numpy as np
+
+# tag ids
+END, BYTE, SHORT, INT, LONG, FLOAT, DOUBLE, BYTE_ARRAY, STRING, LIST, COMPOUND, INT_ARRAY, LONG_ARRAY = range(13)
+
+# a minimal streaming NBT writer: every tag is written straight into out (a binary file object, e.g. a gzip file)
+# when it is given, so huge arrays never have to be turned into tag objects first
+# named tags are written with the methods named after their type, a compound is opened with compound() and
+# closed with end(); lists of compounds are opened with compound_list(), then every element is the
+# entries written after each other, closed with end(), other lists are opened with list()
+class NbtWriter:
+
+    def __init__(self, out, byteorder="big"):
+        self.out = out
+        self.byteorder = byteorder
+        prefix = ">" if byteorder == "big" else "<"
+        self._byte = Struct(prefix + "b")
+        self._ushort = Struct(prefix + "H")
+        self._short = Struct(prefix + "h")
+        self._int = Struct(prefix + "i")
+        self._long = Struct(prefix + "q")
+        self._array_dtype = {INT_ARRAY: prefix + "i4", LONG_ARRAY: prefix + "i8"}
+
+    def _string_payload(self, value):
+        data = value.encode("utf-8")
+        self.out.write(self._ushort.pack(len(data)))
+        self.out.write(data)
+
+    def _header(self, tag_id, name):
+        self.out.write(self._byte.pack(tag_id))
+        self._string_payload(name)
+
+    def compound(self, name):
+        self._header(COMPOUND, name)
+
+    def end(self):
+        self.out.write(self._byte.pack(END))
+
+    def byte(self, name, value):
+        self._header(BYTE, name)
+        self.out.write(self._byte.pack(value))
+
+    def short(self, name, value):
+        self._header(SHORT, name)
+        self.out.write(self._short.pack(value))
+
+    def int(self, name, value):
+        self._header(INT, name)
+        self.out.write(self._int.pack(value))
+
+    def long(self, name, value):
+        self._header(LONG, name)
+        self.out.write(self._long.pack(value))
+
+    def string(self, name, value):
+        self._header(STRING, name)
+        self._string_payload(value)
+
+    # data is anything bytes-like
+    def byte_array(self, name, data):
+        self._header(BYTE_ARRAY, name)
+        self.out.write(self._int.pack(len(data)))
+        self.out.write(data)
+
+    # only the header of a byte array, the caller writes the length bytes of data after it (e.g. streamed from a file)
+    def byte_array_header(self, name, length):
+        self._header(BYTE_ARRAY, name)
+        self.out.write(self._int.pack(length))
+
+    # values is a numpy array (or any sequence of ints)
+    def int_array(self, name, values):
+        self._number_array(INT_ARRAY, name, values)
+
+    def long_array(self, name, values):
+        self._number_array(LONG_ARRAY, name, values)
+
+    def _number_array(self, tag_id, name, values):
+        data = np.asarray(values).astype(self._array_dtype[tag_id]).tobytes()
+        self._header(tag_id, name)
+        self.out.write(self._int.pack(len(values)))
+        self.out.write(data)
+
+    def compound_list(self, name, length):
+        self.list(name, COMPOUND, length)
+
+    # opens a list of length tag_id elements, they are written after it without names (compounds are the entries
+    # written after each other and end())
+    def list(self, name, tag_id, length):
+        self._header(LIST, name)
+        self.out.write(self._byte.pack(tag_id if length > 0 else END))
+        self.out.write(self._int.pack(length))
+
+    # writes an nbtlib tag (e.g. one parsed from SNBT) under name
+    def tag(self, name, value):
+        self._header(value.tag_id, name)
+        value.write(self.out, self.byteorder)
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+
+from os import cpu_count
+from gzip import GzipFile
+from struct import pack
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from zlib import compressobj, crc32, DEFLATED, MAX_WBITS, Z_SYNC_FLUSH, Z_FINISH
+
+BLOCK_SIZE = 1 << 20 # how much uncompressed data is compressed at once by a thread
+_WINDOW = 1 << 15 # deflate looks back at most this far, so this much of the previous block is the dictionary of the next
+
+# the deflate data of block, continuing from dictionary (the end of the previous block), it runs in the thread pool
+# zlib doesn't hold the GIL while it compresses, so the blocks are compressed at the same time
+def _compress_block(block, dictionary, level, last):
+    compressor = compressobj(level, DEFLATED, -MAX_WBITS, zdict=dictionary) if dictionary else compressobj(level, DEFLATED, -MAX_WBITS)
+    # a sync flush ends the block on a byte boundary, so the next one can simply be appended
+    return compressor.compress(block) + compressor.flush(Z_FINISH if last else Z_SYNC_FLUSH)
+
+"""
+a write-only gzip file, like GzipFile(fileobj=out, mode="wb", mtime=0), but compressed on threads threads:
+the data is cut into block_size pieces, every one is compressed on its own (with the end of the previous one as
+its dictionary, like pigz does), and the pieces are written in order, as one gzip member
+the output is the same with any number of threads (but not the same as GzipFile's), and it doesn't depend on
+when it was written, there's no file name or mtime in it
+at most 2*threads blocks are waiting to be compressed or written, so the memory needed doesn't depend on the
+size of the file
+"""
+class ParallelGzipFile:
+
+    def __init__(self, out, compresslevel=9, threads=None, block_size=BLOCK_SIZE):
+        self.out = out
+        self.compresslevel = compresslevel
+        self.threads = threads or cpu_count() or 1
+        self.block_size = block_size
+        self._executor = ThreadPoolExecutor(self.threads)
+        self._pending = deque() # the futures of the compressed blocks, in order
+        self._buffer = bytearray()
+        self._dictionary = b""
+        self._crc = 0
+        self._size = 0
+        # the gzip header: no file name, mtime 0, the extra flags GzipFile writes for the level, unknown OS
+        extra_flags = 2 if compresslevel == 9 else 4 if compresslevel == 1 else 0
+        self.out.write(b"\x1f\x8b\x08\x00" + pack("<I", 0) + bytes([extra_flags, 255]))
+
+    def __repr__(self):
+        return f"[ParallelGzipFile of {self._size} bytes, level {self.compresslevel}, on {self.threads} threads]"
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+        return False
+
+    def write(self, data):
+        self._crc = crc32(data, self._crc)
+        self._size += len(data)
+        self._buffer += data
+        while len(self._buffer) >= self.block_size:
+            block = bytes(self._buffer[:self.block_size])
+            del self._buffer[:self.block_size]
+            self._submit(block, False)
+        return len(data)
+
+    def _submit(self, block, last):
+        self._pending.append(self._executor.submit(_compress_block, block, self._dictionary, self.compresslevel, last))
+        self._dictionary = block[-_WINDOW:]
+        while len(self._pending) > 2 * self.threads:
+            self.out.write(self._pending.popleft().result())
+
+    def close(self):
+        if self._executor is None:
+            return
+        self._submit(bytes(self._buffer), True)
+        self._buffer = bytearray()
+        while self._pending:
+            self.out.write(self._pending.popleft().result())
+        self._executor.shutdown()
+        self._executor = None
+        self.out.write(pack("<II", self._crc, self._size & 0xffffffff))
+
+"""
+opens the gzip file the schematics are written into, on out (a binary file):
+threads=1 is a GzipFile, like it has always been, otherwise a ParallelGzipFile on threads threads (None: one per CPU core)
+the file doesn't depend on when it was written either way
+"""
+def gzip_writer(out, compresslevel=9, threads=1):
+    assert 0 <= compresslevel <= 9, f"The compression level has to be between 0 and 9, not {compresslevel}!"
+    if threads == 1:
+        return GzipFile(filename="", fileobj=out, mode="wb", compresslevel=compresslevel, mtime=0)
+    return ParallelGzipFile(out, compresslevel, threads)
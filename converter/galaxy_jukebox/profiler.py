@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+
+from time import perf_counter, process_time
+from json import dump
+from . import builder as bld
+
+# measures one stage (or one stage of one line) in a with statement, see Profiler
+class _Timer:
+    __slots__ = ("_profiler", "_name", "_line", "_wall", "_cpu")
+
+    def __init__(self, profiler, name, line):
+        self._profiler = profiler
+        self._name = name
+        self._line = line
+
+    def __enter__(self):
+        self._profiler._stage(self._name)
+        self._profiler._depth += 1
+        self._wall = perf_counter()
+        self._cpu = process_time()
+        return self
+
+    def __exit__(self, *exc_info):
+        wall = perf_counter() - self._wall
+        cpu = process_time() - self._cpu
+        self._profiler._depth -= 1
+        self._profiler.add(self._name, wall, cpu, self._line)
+        return False
+
+"""
+collects where the time goes in a conversion, pass one to convert(profile=...)
+every stage has its wall and CPU time, and the number of times it ran; the stages that are done
+line by line (building the noteblocks, the turns, ..., the spirals) are also recorded for every line
+stages are listed in the order they first start, a stage started inside another one is nested in it, with:
+    with profile.stage("read"):
+        ...
+    with profile.line(line, "build_delays"):
+        ...
+the CPU time of the stages run by worker processes (see split_lines.build_delays_parallel) is the
+CPU time of the worker, and their wall time is the time they took in the worker
+"""
+class Profiler:
+
+    def __init__(self):
+        self.stages = {} # name: [wall seconds, CPU seconds, calls, depth]
+        self.lines = {} # SplitLine: {name: [wall seconds, CPU seconds]}
+        self._depth = 0 # how many stages are running now
+
+    def __repr__(self):
+        return f"[Profiler of {len(self.stages)} stages and {len(self.lines)} lines]"
+
+    def stage(self, name):
+        return _Timer(self, name, None)
+
+    def line(self, line, name):
+        return _Timer(self, name, line)
+
+    def _stage(self, name):
+        stage = self.stages.get(name)
+        if stage is None:
+            stage = self.stages[name] = [0.0, 0.0, 0, self._depth]
+        return stage
+
+    # records a measurement that was taken elsewhere (e.g. in a worker process), nested in the running stages
+    def add(self, name, wall, cpu, line=None):
+        stage = self._stage(name)
+        stage[0] += wall
+        stage[1] += cpu
+        stage[2] += 1
+        if line is not None:
+            times = self.lines.setdefault(line, {}).setdefault(name, [0.0, 0.0])
+            times[0] += wall
+            times[1] += cpu
+
+    # the lines, from the slowest one (all of its stages added up), as (line, wall, CPU, {name: [wall, CPU]})
+    def slowest_lines(self):
+        lines = [(line, sum(t[0] for t in times.values()), sum(t[1] for t in times.values()), times)
+                 for line, times in self.lines.items()]
+        return sorted(lines, key=lambda l: -l[1])
+
+    # everything that was recorded, as a dict that can be written as JSON
+    def report(self):
+        return {
+            "stages": [{"name": name, "wall": wall, "cpu": cpu, "calls": calls, "depth": depth}
+                       for name, (wall, cpu, calls, depth) in self.stages.items()],
+            "lines": [{"instrument": bld.instrument_name[line.instrument], "note": line.note, "col": line.col, "row": line.row,
+                       "wall": wall, "cpu": cpu, "stages": {name: {"wall": t[0], "cpu": t[1]} for name, t in times.items()}}
+                      for line, wall, cpu, times in self.slowest_lines()],
+        }
+
+    def save(self, path):
+        with open(path, "w") as out:
+            dump(self.report(), out, indent=1)
+
+    # human readable: the stages with their share of the whole time, then the top slowest lines
+    def summary(self, top=10):
+        total = sum(wall for wall, cpu, calls, depth in self.stages.values() if depth == 0) or 1.0
+        rows = ["stage                          wall       CPU   calls"]
+        for name, (wall, cpu, calls, depth) in self.stages.items():
+            name = "  " * depth + name
+            rows.append(f"{name:<27} {wall:7.3f}s {cpu:8.3f}s {calls:7} {100 * wall / total:5.1f}%")
+        slowest = self.slowest_lines()[:top]
+        if slowest:
+            rows.append(f"the {len(slowest)} slowest lines:")
+            for line, wall, cpu, times in slowest:
+                name, (stage_wall, stage_cpu) = max(times.items(), key=lambda t: t[1][0])
+                rows.append(f"{bld.instrument_name[line.instrument]:>14} {line.note:2} col {line.col:3} row {line.row:3} "
+                            f"{wall:7.3f}s (of it {name} {stage_wall:.3f}s)")
+        return "\n".join(rows)
+
+# the default profiler, that records nothing, so that the conversion is just as fast without profiling
+class NullProfiler:
+
+    def __repr__(self):
+        return "[NullProfiler]"
+
+    def stage(self, name):
+        return _null_timer
+
+    def line(self, line, name):
+        return _null_timer
+
+    def add(self, name, wall, cpu, line=None):
+        pass
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+_null_timer = _NullTimer()
+NULL_PROFILER = NullProfiler()
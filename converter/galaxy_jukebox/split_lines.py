@@ -1,7 +1,13 @@
 #!/usr/bin/env python3
 
-from .vector import Vector
+from .vector import Vector, Cursor, UP
+from .block_buffer import BlockBuffer, CountingBuffer
 from . import builder as bld
+from .profiler import NULL_PROFILER
+from os import cpu_count
+from concurrent.futures import ProcessPoolExecutor
+from time import perf_counter, process_time
+import numpy as np
 
 # represents a redstone wire line corresponding to a single instrument/pitch noteblock
 # it is split enough to be actually created with redstone, and has the methods to do so
@@ -29,11 +35,11 @@ class SplitLine:
         return f"[ProcessedLine i,k:{self.instrument},{self.note} delays:{self._delays}]"
     
     # serves as a post-initialization, where it gets its position, and other attributes
-    def begin_circuit(self, schem, pos, forward, side, dist_to_middle, row, max_row, col, side_col, max_col):
-        self._schem = schem
-        pos.y -= 1 # pos.y is where the noteblock is, but it's better to store the block below
-        self._pos = pos
-        self._forward = forward
+    def begin_circuit(self, blocks, pos, forward, side, dist_to_middle, row, max_row, col, side_col, max_col):
+        self._blocks = blocks
+        # pos.y is where the noteblock is, but it's better to store the block below
+        # the cursor walks along the line, every build_* method continues where the previous one stopped
+        self._cursor = Cursor(pos - UP, forward)
         self._side = side # either "left" "middle" or "right"
         # the blocks this line needs to go sideways and forward to be aligned with the side "middle"
         # it correlates with the column it is in
@@ -49,7 +55,13 @@ class SplitLine:
         self._max_col = max_col # the max number of columns *on the same side* that the line is on (left/middle/right width)
     
     def get_pos(self):
-        return self._pos
+        return self._cursor.pos()
+
+    # the buffer isn't sent along when the line is sent to a worker process, see build_contraption
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_blocks"] = None
+        return state
     
     # this is the last note line, and it should place concrete to the right of the note blocks, so there are blocks there and it doesn't look ugly
     def last_note_fill_remaining(self):
@@ -58,11 +70,12 @@ class SplitLine:
             for x in range(min(v1.x, v2.x), max(v1.x, v2.x) + 1):
                 for y in range(min(v1.y, v2.y), max(v1.y, v2.y) + 1):
                     for z in range(min(v1.z, v2.z), max(v1.z, v2.z) + 1):
-                        bld.setblock(self._schem, Vector(x, y, z), self._buildblock)
+                        bld.setblock(self._blocks, Vector(x, y, z), self._buildblock)
 
-        left = self._forward.rotated()
-        up = Vector(0, 1, 0)
-        begin = self._pos + self._forward + left + up * (2 * (self.row + 1))
+        forward = self._cursor.forward
+        left = forward.rotated()
+        up = UP
+        begin = self._cursor + forward + left + up * (2 * (self.row + 1))
         end = begin - left * 2 - up * (2 * (self._max_row + 1))
         fill(begin, end)
 
@@ -72,56 +85,79 @@ class SplitLine:
         def conditional_patch_above_below(vec):
             # patching above the 2nd row so it has the same height as the neighbors
             if self.row == 1:
-                bld.setblock(self._schem, vec + up * 3, self._buildblock)
-                bld.setblock(self._schem, vec + up * 4, self._buildblock)
+                bld.setblock(self._blocks, vec + up * 3, self._buildblock)
+                bld.setblock(self._blocks, vec + up * 4, self._buildblock)
             # below the 2nd to last row as well
             # we also want an extra row of blocks under the wall, so it looks better 
             if self.row == self._max_row - 2:
-                bld.setblock(self._schem, vec - up * 4, self._buildblock)
-                bld.setblock(self._schem, vec - up * 3, self._buildblock)
-                bld.setblock(self._schem, vec - up * 2, self._buildblock)
+                bld.setblock(self._blocks, vec - up * 4, self._buildblock)
+                bld.setblock(self._blocks, vec - up * 3, self._buildblock)
+                bld.setblock(self._blocks, vec - up * 2, self._buildblock)
             elif self.row == self._max_row - 1:
-                bld.setblock(self._schem, vec - up * 2, self._buildblock)
+                bld.setblock(self._blocks, vec - up * 2, self._buildblock)
 
-        v = self._pos
-        up = Vector(0, 1, 0)
+        v = self._cursor
+        up = UP
         # tripwire is needed for sand/concrete powder, so that it doesn't fall off
         if use_redstone_lamp or bld.instrument_name[self.instrument] == "snare":
-            bld.setblock(self._schem, v - up, "redstone_lamp" if use_redstone_lamp else "tripwire")
-        bld.setblock(self._schem, v, bld.instrument_material[self.instrument])
-        bld.setblock(self._schem, v + up, f"note_block[note={self.note},instrument={bld.instrument_name[self.instrument]}]")
-        v += self._forward
-        bld.block_and_redstone(self._schem, v - up, self._buildblock)
-        bld.setblock(self._schem, v + up * 1, self._buildblock)
-        bld.setblock(self._schem, v + up * 2, self._buildblock)
+            bld.setblock(self._blocks, v - up, bld.redstone_lamp if use_redstone_lamp else bld.tripwire)
+        bld.setblock(self._blocks, v, bld.instrument_material[self.instrument])
+        bld.setblock(self._blocks, v + up, bld.note_block[self.instrument][self.note])
+        v.advance()
+        bld.block_and_redstone(self._blocks, v - up, self._buildblock)
+        bld.setblock(self._blocks, v + up * 1, self._buildblock)
+        bld.setblock(self._blocks, v + up * 2, self._buildblock)
 
         conditional_patch_above_below(v)
         # we also patch next to the first and the last column
         # for the first and the last col of every side, we add one more continuous pile of blocks to the left/right
         if self._side_col == 0 and self.row % 2 == 0:
-            left = self._forward.rotated()
-            bld.setblock(self._schem, v + left + up * 2, self._buildblock)
-            bld.setblock(self._schem, v + left + up * 1, self._buildblock)
-            bld.setblock(self._schem, v + left + up * 0, self._buildblock)
-            bld.setblock(self._schem, v + left - up * 1, self._buildblock)
+            left = v.forward.rotated()
+            bld.setblock(self._blocks, v + left + up * 2, self._buildblock)
+            bld.setblock(self._blocks, v + left + up * 1, self._buildblock)
+            bld.setblock(self._blocks, v + left + up * 0, self._buildblock)
+            bld.setblock(self._blocks, v + left - up * 1, self._buildblock)
             conditional_patch_above_below(v + left)
         if self._side_col == self._max_col - 1 and self.row % 2 == 1:
-            right = self._forward.rotated(positive_direction=False)
-            bld.setblock(self._schem, v + right + up * 2, self._buildblock)
-            bld.setblock(self._schem, v + right + up * 1, self._buildblock)
-            bld.setblock(self._schem, v + right + up * 0, self._buildblock)
-            bld.setblock(self._schem, v + right - up * 1, self._buildblock)
+            right = v.forward.rotated(positive_direction=False)
+            bld.setblock(self._blocks, v + right + up * 2, self._buildblock)
+            bld.setblock(self._blocks, v + right + up * 1, self._buildblock)
+            bld.setblock(self._blocks, v + right + up * 0, self._buildblock)
+            bld.setblock(self._blocks, v + right - up * 1, self._buildblock)
             conditional_patch_above_below(v + right)
 
-        v += self._forward
-        bld.block_and_repeater(self._schem, v, self._buildblock, -self._forward)
-        v += self._forward
+        v.advance()
+        bld.block_and_repeater(self._blocks, v, self._buildblock, v.backward)
+        v.advance()
     
+    """
+    the estimate_* methods do what the build_* method before them would, for block_buffer.CountingBuffer, without
+    placing the blocks one by one: the blocks are counted and their box is added to the bounds, the cursor is moved
+    to where the build_* method would leave it, and the delays are changed the same way, so the count and the
+    bounds are exact (see main.estimate)
+    """
+    def estimate_noteblock(self, use_redstone_lamp):
+        v = self._cursor
+        left = v.forward.rotated()
+        # the patches above and below, see conditional_patch_above_below
+        above = 2 if self.row == 1 else 0
+        below = 3 if self.row == self._max_row - 2 else (1 if self.row == self._max_row - 1 else 0)
+        patch_left = self._side_col == 0 and self.row % 2 == 0
+        patch_right = self._side_col == self._max_col - 1 and self.row % 2 == 1
+        count = 8 + above + below + (4 + above + below) * (patch_left + patch_right)
+        if use_redstone_lamp or bld.instrument_name[self.instrument] == "snare":
+            count += 1
+        low = Vector(v.x + left.x * patch_left, v.y - 1 - below, v.z + left.z * patch_left)
+        v.advance(2)
+        high = Vector(v.x - left.x * patch_right, v.y + 2 + above, v.z - left.z * patch_right)
+        self._blocks.count_box(low, high, count)
+        v.advance()
+
     def build_side_turn(self, max_delay):
         if self._side == "middle":
             self._delays[0] += max_delay # we just add the difference in timing to the other notes to the delay of the first note
             return
-        v = self._pos
+        v = self._cursor
         
         # rc: redstone count, before the repeater, max 15
         rc = 0
@@ -129,125 +165,203 @@ class SplitLine:
         for rotation in [True, False]:
             for i in range(self._dist_to_middle):
                 if rc == 15 or (rc == 14 and i+2 == self._dist_to_middle):
-                    bld.block_and_repeater(self._schem, v, self._buildblock, -self._forward)
+                    bld.block_and_repeater(self._blocks, v, self._buildblock, v.backward)
                     placed_delay += 1
                     rc = 0
                 else:
-                    bld.block_and_redstone(self._schem, v, self._buildblock)
+                    bld.block_and_redstone(self._blocks, v, self._buildblock)
                     rc += 1
-                v += self._forward
+                v.advance()
             
             if rotation:
-                v -= self._forward
-                self._forward.rotate(positive_direction = (self._side=="right"))
-                v += self._forward
+                v.advance(-1)
+                v.turn(positive_direction = (self._side=="right"))
+                v.advance()
         
         # here we know that we didn't end with a repeater, because if the last block had been a repeater,
         # then the 2nd to last block was rc==14 and i+2==loopmax, so we put a repeater there instead
         # this means that we are safe to place a repeater here (see builder.py and "md" for details)
         # so ending with 1 repeater everywhere, so that in the next step we can rely on that
-        bld.block_and_repeater(self._schem, v, self._buildblock, -self._forward)
-        v += self._forward
+        bld.block_and_repeater(self._blocks, v, self._buildblock, v.backward)
+        v.advance()
         placed_delay += 1
         assert rc <= 15, f"Redstone count is >15 where the lines turn towards the jukebox, it is {rc} (in col {self.col} row {self.row})!"
         assert placed_delay <= max_delay, f"Somehow we placed more delay then allowed, when turning, placed {placed_delay}, allowed {delay} (in col {self.col} row {self.row})!"
         self._delays[0] += max_delay - placed_delay # adding the remaining needed delay, to be in sync with the others
         
+    def estimate_side_turn(self, max_delay):
+        if self._side == "middle":
+            self._delays[0] += max_delay
+            return
+        v = self._cursor
+        # only the repeaters are counted, the same way as in build_side_turn
+        rc = 0
+        placed_delay = 1
+        for rotation in [True, False]:
+            for i in range(self._dist_to_middle):
+                if rc == 15 or (rc == 14 and i+2 == self._dist_to_middle):
+                    placed_delay += 1
+                    rc = 0
+                else:
+                    rc += 1
+        corner = v.pos()
+        v.advance(self._dist_to_middle - 1)
+        v.turn(positive_direction = (self._side=="right"))
+        v.advance(self._dist_to_middle + 1)
+        self._blocks.count_box(corner, v + UP, 2 * (2 * self._dist_to_middle + 1))
+        v.advance()
+        assert placed_delay <= max_delay, f"Somehow we placed more delay then allowed, when turning, placed {placed_delay}, allowed {max_delay} (in col {self.col} row {self.row})!"
+        self._delays[0] += max_delay - placed_delay
+
     def build_vertical_adjustment(self):
-        v = self._pos
+        v = self._cursor
         max_needed_diff = self._max_row - 1
         needed_diff = max_needed_diff - 2 * self.row
         for i in range(max_needed_diff + 1):
             if i + abs(needed_diff) > max_needed_diff:
-                v += Vector(0, -1 if needed_diff < 0 else 1, 0)
-            bld.block_and_redstone(self._schem, v, self._buildblock)
-            v += self._forward
+                v.y += -1 if needed_diff < 0 else 1
+            bld.block_and_redstone(self._blocks, v, self._buildblock)
+            v.advance()
             if (i+1) % 14 == 0:
-                bld.block_and_repeater(self._schem, v, self._buildblock, -self._forward)
-                v += self._forward
-                bld.block_and_redstone(self._schem, v, self._buildblock)
-                v += self._forward
+                bld.block_and_repeater(self._blocks, v, self._buildblock, v.backward)
+                v.advance()
+                bld.block_and_redstone(self._blocks, v, self._buildblock)
+                v.advance()
         # ending with a repeater again:
-        bld.block_and_repeater(self._schem, v, self._buildblock, -self._forward)
-        v += self._forward
+        bld.block_and_repeater(self._blocks, v, self._buildblock, v.backward)
+        v.advance()
     
+    def estimate_vertical_adjustment(self):
+        v = self._cursor
+        max_needed_diff = self._max_row - 1
+        needed_diff = max_needed_diff - 2 * self.row
+        # a repeater and a redstone after every 14 blocks, and the repeater at the end
+        length = max_needed_diff + 1 + 2 * ((max_needed_diff + 1) // 14) + 1
+        low = Vector(v.x, v.y + min(needed_diff, 0), v.z)
+        v.advance(length - 1)
+        high = Vector(v.x, v.y + max(needed_diff, 0) + 1, v.z)
+        v.y += needed_diff
+        self._blocks.count_box(low, high, 2 * length)
+        v.advance()
+
     # horizontal adjustment both for left/right sides and for odd rows
     def build_horizontal_adjustment(self):
-        v = self._pos
-        bld.block_and_redstone(self._schem, v, self._buildblock)
-        v += self._forward
+        v = self._cursor
+        bld.block_and_redstone(self._blocks, v, self._buildblock)
+        v.advance()
         vertical_offset = Vector(0, -1 if self.col % 2 == 0 else 1, 0)
         if self._side != "middle":
             v += vertical_offset
-            sideways = self._forward.rotated(positive_direction = (self._side=="right"))
+            sideways = v.forward.rotated(positive_direction = (self._side=="right"))
         for i in range(3):
-            bld.block_and_redstone(self._schem, v, self._buildblock)
-            v += self._forward
+            bld.block_and_redstone(self._blocks, v, self._buildblock)
+            v.advance()
             if self._side != "middle":
-                bld.block_and_redstone(self._schem, v, self._buildblock)
+                bld.block_and_redstone(self._blocks, v, self._buildblock)
                 v += sideways
-        bld.block_and_redstone(self._schem, v, self._buildblock)
-        v += self._forward
+        bld.block_and_redstone(self._blocks, v, self._buildblock)
+        v.advance()
         if self._side != "middle":
             v -= vertical_offset
-        bld.block_and_redstone(self._schem, v, self._buildblock)
-        v += self._forward
+        bld.block_and_redstone(self._blocks, v, self._buildblock)
+        v.advance()
         
         if self.row % 2 == 0:
-            bld.block_and_redstone(self._schem, v, self._buildblock)
-            v += self._forward
+            bld.block_and_redstone(self._blocks, v, self._buildblock)
+            v.advance()
         else:
             v += vertical_offset
-            sideways = self._forward.rotated()
-            bld.block_and_redstone(self._schem, v, self._buildblock)
+            sideways = v.forward.rotated()
+            bld.block_and_redstone(self._blocks, v, self._buildblock)
             v += sideways
-            bld.block_and_redstone(self._schem, v, self._buildblock)
-            v += self._forward
+            bld.block_and_redstone(self._blocks, v, self._buildblock)
+            v.advance()
             v -= vertical_offset
-        bld.block_and_redstone(self._schem, v, self._buildblock)
-        v += self._forward
+        bld.block_and_redstone(self._blocks, v, self._buildblock)
+        v.advance()
             
+    def estimate_horizontal_adjustment(self):
+        v = self._cursor
+        left = v.forward.rotated()
+        # how far it goes to the left (negative: to the right), on the side and in the odd rows
+        side_shift = 0 if self._side == "middle" else (3 if self._side == "right" else -3)
+        row_shift = self.row % 2
+        vertical_offset = -1 if self.col % 2 == 0 else 1
+        if self._side == "middle" and self.row % 2 == 0:
+            vertical_offset = 0
+        count = 2 * (8 + row_shift + (3 if self._side != "middle" else 0))
+        low_shift = min(0, side_shift, side_shift + row_shift)
+        high_shift = max(0, side_shift, side_shift + row_shift)
+        low = Vector(v.x + left.x * low_shift, v.y + min(vertical_offset, 0), v.z + left.z * low_shift)
+        high = Vector(v.x + 7 * v.forward.x + left.x * high_shift, v.y + max(vertical_offset, 0) + 1, v.z + 7 * v.forward.z + left.z * high_shift)
+        self._blocks.count_box(low, high, count)
+        v.advance(8)
+        v.x += left.x * (side_shift + row_shift)
+        v.z += left.z * (side_shift + row_shift)
+
     def build_junction(self, max_delay):
-        v = self._pos
-        left = self._forward.rotated()
-        up = Vector(0, 1, 0)
+        v = self._cursor
+        left = v.forward.rotated()
+        up = UP
         if self.col % 2 == 0:
-            bld.block_and_repeater(self._schem, v + left + up * 2, bld.even_delay_buildblock, -left)
+            bld.block_and_repeater(self._blocks, v + left + up * 2, bld.even_delay_buildblock, -left)
         else:
-            bld.block_and_redstone(self._schem, v + left + up * 2, bld.even_delay_buildblock)
-        bld.block_and_redstone(self._schem, v, self._buildblock)
-        bld.block_and_redstone(self._schem, v + up * 2, bld.even_delay_buildblock)
-        v += self._forward
+            bld.block_and_redstone(self._blocks, v + left + up * 2, bld.even_delay_buildblock)
+        bld.block_and_redstone(self._blocks, v, self._buildblock)
+        bld.block_and_redstone(self._blocks, v + up * 2, bld.even_delay_buildblock)
+        v.advance()
         
-        bld.block_and_repeater(self._schem, v, self._buildblock, -self._forward)
+        bld.block_and_repeater(self._blocks, v, self._buildblock, v.backward)
         if self._is_even:
-            bld.block_and_redstone(self._schem, v + up * 2, bld.even_delay_buildblock)
-        v += self._forward
+            bld.block_and_redstone(self._blocks, v + up * 2, bld.even_delay_buildblock)
+        v.advance()
         
         if self.col % 2 == 0:
-            bld.block_and_repeater(self._schem, v + left + up * 3, bld.odd_delay_buildblock, -left)
+            bld.block_and_repeater(self._blocks, v + left + up * 3, bld.odd_delay_buildblock, -left)
         else:
-            bld.block_and_redstone(self._schem, v + left + up * 3, bld.odd_delay_buildblock)
-        bld.setblock(self._schem, v + up, self._buildblock)
+            bld.block_and_redstone(self._blocks, v + left + up * 3, bld.odd_delay_buildblock)
+        bld.setblock(self._blocks, v + up, self._buildblock)
         if self._is_even:
-            bld.setblock(self._schem, v + up * 3, bld.even_delay_buildblock)
-            bld.setblock(self._schem, v + up * 4, bld.odd_delay_buildblock)
+            bld.setblock(self._blocks, v + up * 3, bld.even_delay_buildblock)
+            bld.setblock(self._blocks, v + up * 4, bld.odd_delay_buildblock)
         else:
-            bld.block_and_redstone(self._schem, v + up * 3, bld.odd_delay_buildblock)
-        v += self._forward
+            bld.block_and_redstone(self._blocks, v + up * 3, bld.odd_delay_buildblock)
+        v.advance()
         
-        bld.block_and_redstone(self._schem, v, self._buildblock)
-        bld.block_and_repeater(self._schem, v + up * 2, self._buildblock, self._forward)
-        v += self._forward
+        bld.block_and_redstone(self._blocks, v, self._buildblock)
+        bld.block_and_repeater(self._blocks, v + up * 2, self._buildblock, v.forward)
+        v.advance()
         assert max_delay >= self.col // 2, f"Max delay ({max_delay}) given is too low, we'd need a delay of {needed_delay}!"
         # adding to before the first note, it needs delay because of the repeaters of where the signal comes from
         self._delays[0] += max_delay - self.col // 2
     
+    def estimate_junction(self, max_delay):
+        v = self._cursor
+        left = v.forward.rotated()
+        high = Vector(v.x + 3 * v.forward.x + left.x, v.y + 4, v.z + 3 * v.forward.z + left.z)
+        self._blocks.count_box(v, high, 17 + (2 if self._is_even else 0))
+        v.advance(4)
+        assert max_delay >= self.col // 2, f"Max delay ({max_delay}) given is too low, we'd need a delay of {self.col // 2}!"
+        self._delays[0] += max_delay - self.col // 2
+    
     # this is the delay needed to build the vertical connection (15 block limit), above this line, as compensation
     def add_delay_for_vertical_connection(self):
         self._delays[0] += self.row // 3
     
     
+    # md = minimum delay, needed for how much delay can be put onto repeaters, and for more too
+    # it is the minimum of the delays from the current one until the end of the line, computed backwards in one pass
+    def _minimum_delays(self):
+        suffix_min = self._delays[:]
+        for i in range(len(suffix_min) - 2, -1, -1):
+            if suffix_min[i + 1] < suffix_min[i]:
+                suffix_min[i] = suffix_min[i + 1]
+        return suffix_min
+
+    # how many blocks long the spiral will be, without the spacers needed at the turns, see layout.py
+    def spiral_length(self):
+        return sum(map(bld.get_delay_length, self._delays, self._minimum_delays()))
+
     """
     <> : repeater
     -  : redstone
@@ -271,44 +385,47 @@ class SplitLine:
     ███????█   -  r
     and that will help with spacing the turns properly
     
-    this function builds the entire spiral thing for this particular line, taking self._delays and turns into account
+    this function plans the entire spiral thing for this particular line, taking self._delays and turns into account
     turns is [10, 22, 15] e.g., meaning it needs to turn left after 10 blocks, and again after 22,... relative to the previous turn
     corner blocks count towards the previous count
+    
+    every decision (where to split a delay at a turn, where to put redstone spacers) is made here, before any block is placed,
+    and the result is a flat list of steps, that build_delays executes one after another:
+    ("delay", delay, md, loopback): a builder.build_delay
+    ("spacer",): a builder.build_spacer, one block of redstone in both rows
+    ("turn",): turning left, the last block before the turn is the corner
     """
-    def build_delays(self, turns):
-        v = self._pos
-        up = Vector(0, 1, 0)
+    def plan_delays(self, turns):
+        suffix_min = self._minimum_delays()
+        plan = []
+        turn_index = 0
         placed_blocks = 0 # blocks placed since the previous turn
-        for delay_index, delay in enumerate(self._delays):
-            # md = minimum delay, needed for how much delay can be put onto repeaters, and for more too
-            md = min(self._delays[delay_index:]) # could be optimized: only recalculate this if previous delay==md
-            
+        for delay, md in zip(self._delays, suffix_min):
             run_again = True
             while run_again:
                 run_again = False
                 next_length = bld.get_delay_length(delay, md)
                 
-                assert turns, "Turns shouldn't run out! Line will escape into the horizon and further!"
-                # if turns is empty or there's enough space:
-                if not turns or placed_blocks + next_length + 1 < turns[0]:
-                    bld.build_delay(self._schem, self._buildblock, v, self._forward, delay, md)
+                assert turn_index < len(turns), "Turns shouldn't run out! Line will escape into the horizon and further!"
+                next_turn = turns[turn_index]
+                # if there's enough space:
+                if placed_blocks + next_length + 1 < next_turn:
+                    plan.append(("delay", delay, md, True))
                     placed_blocks += next_length
                 # if there isn't enough space to just place the delay and move on, and we have to turn somewhere
                 else:
                     # if we strech it out one more block, it will fit perfectly
-                    if placed_blocks + next_length + 1 == turns[0]:
-                        bld.block_and_redstone(self._schem, v, self._buildblock)
-                        bld.block_and_redstone(self._schem, v + up * 2, self._buildblock)
-                        v += self._forward
+                    if placed_blocks + next_length + 1 == next_turn:
+                        plan.append(("spacer",))
                         placed_blocks += 1
                     # if it fits perfectly (also including the previous case)
-                    if placed_blocks + next_length == turns[0]:
-                        bld.build_delay(self._schem, self._buildblock, v, self._forward, delay, md)
+                    if placed_blocks + next_length == next_turn:
+                        plan.append(("delay", delay, md, True))
                     # we need to cut the delay in half, or more, because it is larger than the blocks left until the turn
                     else:
                         run_again = True # we need to keep placing the delay, while staying at the current index of self._delays
                         mind = min(md, 9)
-                        remaining_blocks = turns[0] - placed_blocks
+                        remaining_blocks = next_turn - placed_blocks
                         # if we can't split it into two pieces and have to put redstone as spacer, before the turn
                         # delay should be at least minimum delay (md) when placing
                         if delay < 2 * mind or remaining_blocks < bld.get_delay_length(mind, mind):
@@ -332,13 +449,10 @@ class SplitLine:
                             also the redstone wouldn't be able to connect with the block if it was only 1 block remaining
                             """
                             assert remaining_blocks in [2, 3], f"Remaining blocks should be 2 or 3, but it is {remaining_blocks}!"
-                            for i in range(remaining_blocks):
-                                bld.block_and_redstone(self._schem, v, self._buildblock)
-                                bld.block_and_redstone(self._schem, v + up * 2, self._buildblock)
-                                v += self._forward
+                            plan += [("spacer",)] * remaining_blocks
                         # now we are sure that we can somehow split the delay into >=2 pieces, but how
                         else:
-                            delay_before_turn = bisect_delay_halving_point(remaining_blocks, delay, mind)
+                            delay_before_turn = delay_halving_point(remaining_blocks, delay, mind)
                             delay -= delay_before_turn # for next iteration
                             blocks_for_delay = bld.get_delay_length(delay_before_turn, md)
                             remaining_blocks -= blocks_for_delay
@@ -353,17 +467,65 @@ class SplitLine:
                             there should be plenty of delay remaining after the turn for it to be >=md
                             """
                             assert remaining_blocks in [0, 1, 2, 3], f"Remaining blocks should be 0, 1, 2 or 3, but it is {remaining_blocks}!"
-                            for i in range(remaining_blocks):
-                                bld.block_and_redstone(self._schem, v, self._buildblock)
-                                bld.block_and_redstone(self._schem, v + up * 2, self._buildblock)
-                                v += self._forward
-                            bld.build_delay(self._schem, self._buildblock, v, self._forward, delay_before_turn, md, loopback=False)
+                            plan += [("spacer",)] * remaining_blocks
+                            plan.append(("delay", delay_before_turn, md, False))
                     # and turning, in case we need to:
-                    v -= self._forward
-                    self._forward.rotate()
-                    v += self._forward
+                    plan.append(("turn",))
                     placed_blocks = 0
-                    turns.pop(0)
+                    turn_index += 1
+        return plan
+
+    """
+    what build_delays would do, without building anything, for block_buffer.CountingBuffer: the spiral is walked
+    along, the straight stretches of it (from one turn to the next) are added to the bounds, and its blocks are counted roughly:
+    a delay of n blocks long has a bit less than 4n blocks (the two rows of blocks with redstone or repeater on top)
+    """
+    def estimate_delays(self, turns):
+        v = self._cursor
+        length = 0 # of the straight stretch since the previous turn
+        count = 0
+        for step in self.plan_delays(turns):
+            if step[0] == "delay":
+                delay_length = bld.get_delay_length(step[1], step[2])
+                length += delay_length
+                count += 4 * delay_length - (1 if step[3] else 2)
+            elif step[0] == "spacer":
+                length += 1
+                count += 4
+            else:
+                self._blocks.count_line(v, length, 4, count)
+                v.advance(length - 1)
+                v.turn()
+                v.advance()
+                length = count = 0
+        if length > 0:
+            self._blocks.count_line(v, length, 4, count)
+            v.advance(length)
+
+    # builds the spiral planned by plan_delays
+    def build_delays(self, turns):
+        v = self._cursor
+        for step in self.plan_delays(turns):
+            if step[0] == "delay":
+                bld.build_delay(self._blocks, self._buildblock, v, step[1], step[2], loopback=step[3])
+            elif step[0] == "spacer":
+                bld.build_spacer(self._blocks, self._buildblock, v)
+            else:
+                v.advance(-1)
+                v.turn()
+                v.advance()
+
+"""
+the biggest delay_before_turn (mind <= delay_before_turn <= delay - mind), that fits into remaining_blocks with mind
+a bigger delay never needs less blocks, so it is the biggest delay that fits, but at most delay - mind:
+it's one lookup in builder's table, the binary search is only needed if the table isn't big enough
+"""
+def delay_halving_point(remaining_blocks, delay, mind):
+    fitting = bld.get_max_fitting_delay(remaining_blocks, mind)
+    if fitting is None:
+        return bisect_delay_halving_point(remaining_blocks, delay, mind)
+    assert fitting >= mind, "Impossible! No delay halving point found, this function is only meant to be called if there is a solution."
+    return min(fitting, delay - mind)
 
 # mind <= 9
 # with binary search!
@@ -392,110 +554,110 @@ def bisect_delay_halving_point(remaining_blocks, delay, mind):
 
 # begin_v is the coordinate of the even (andesite) connector of the very first (upper left) noteblock line
 # delay compensation for extra added repeaters is in line.add_delay_for_vertical_connection()
-def build_vertical_connection(schem, begin_v, height):
+def build_vertical_connection(blocks, begin_v, height):
     
-    def double_block_and_redstone(schem, andesite_v, rel_granite_v):
-        bld.block_and_redstone(schem, andesite_v, bld.even_delay_buildblock)
-        bld.block_and_redstone(schem, andesite_v + rel_granite_v, bld.odd_delay_buildblock)
+    def double_block_and_redstone(blocks, andesite_v, rel_granite_v):
+        bld.block_and_redstone(blocks, andesite_v, bld.even_delay_buildblock)
+        bld.block_and_redstone(blocks, andesite_v + rel_granite_v, bld.odd_delay_buildblock)
         
-    def double_block_and_repeater(schem, andesite_v, rel_granite_v, direction):
-        bld.block_and_repeater(schem, andesite_v, bld.even_delay_buildblock, direction)
-        bld.block_and_repeater(schem, andesite_v + rel_granite_v, bld.odd_delay_buildblock, direction)
+    def double_block_and_repeater(blocks, andesite_v, rel_granite_v, direction):
+        bld.block_and_repeater(blocks, andesite_v, bld.even_delay_buildblock, direction)
+        bld.block_and_repeater(blocks, andesite_v + rel_granite_v, bld.odd_delay_buildblock, direction)
         
     forward = Vector(1, 0, 0)
     for h in range(height - 1):
         v = begin_v - Vector(0, 4 * h, 0)
-        double_block_and_redstone(schem, v, Vector(0, 0, 2))
+        double_block_and_redstone(blocks, v, Vector(0, 0, 2))
         v += forward
-        bld.block_and_redstone(schem, v + Vector(0, -3, 0), bld.even_delay_buildblock_slab)
-        bld.block_and_redstone(schem, v + Vector(0, -3, 2), bld.odd_delay_buildblock_slab)
-        bld.block_and_redstone(schem, v + Vector(0, -1, 0), bld.even_delay_buildblock_slab)
-        bld.block_and_redstone(schem, v + Vector(0, -1, 2), bld.odd_delay_buildblock_slab)
+        bld.block_and_redstone(blocks, v + Vector(0, -3, 0), bld.even_delay_buildblock_slab)
+        bld.block_and_redstone(blocks, v + Vector(0, -3, 2), bld.odd_delay_buildblock_slab)
+        bld.block_and_redstone(blocks, v + Vector(0, -1, 0), bld.even_delay_buildblock_slab)
+        bld.block_and_redstone(blocks, v + Vector(0, -1, 2), bld.odd_delay_buildblock_slab)
         v += forward
         if (h+1) % 3 == 0:
-            double_block_and_repeater(schem, v + Vector(0, -3, 0), Vector(0, 0, 2), forward)
-            double_block_and_redstone(schem, v + Vector(0, -1, 0), Vector(0, 0, 2))
+            double_block_and_repeater(blocks, v + Vector(0, -3, 0), Vector(0, 0, 2), forward)
+            double_block_and_redstone(blocks, v + Vector(0, -1, 0), Vector(0, 0, 2))
             v += forward
-        double_block_and_redstone(schem, v + Vector(0, -2, 0), Vector(0, 0, 2))
+        double_block_and_redstone(blocks, v + Vector(0, -2, 0), Vector(0, 0, 2))
     
     # last one separately
     v = begin_v - Vector(0, 4 * (height - 1), 0)
-    double_block_and_redstone(schem, v, Vector(0, 0, 2))
+    double_block_and_redstone(blocks, v, Vector(0, 0, 2))
     v += forward
     v += Vector(0, -1, 0)
-    double_block_and_repeater(schem, v, Vector(0, 0, 2), -forward)
+    double_block_and_repeater(blocks, v, Vector(0, 0, 2), -forward)
     v += forward
-    double_block_and_redstone(schem, v, Vector(0, 0, 2))
+    double_block_and_redstone(blocks, v, Vector(0, 0, 2))
     v += forward
-    double_block_and_redstone(schem, v, Vector(0, 0, 2))
+    double_block_and_redstone(blocks, v, Vector(0, 0, 2))
     # corner:
-    bld.block_and_redstone(schem, v + Vector(1, 0, 2), bld.odd_delay_buildblock)
-    bld.block_and_redstone(schem, v + Vector(2, 0, 2), bld.odd_delay_buildblock)
-    bld.block_and_redstone(schem, v + Vector(2, 0, 1), bld.odd_delay_buildblock)
-    bld.block_and_redstone(schem, v + Vector(2, 0, 0), bld.odd_delay_buildblock)
+    bld.block_and_redstone(blocks, v + Vector(1, 0, 2), bld.odd_delay_buildblock)
+    bld.block_and_redstone(blocks, v + Vector(2, 0, 2), bld.odd_delay_buildblock)
+    bld.block_and_redstone(blocks, v + Vector(2, 0, 1), bld.odd_delay_buildblock)
+    bld.block_and_redstone(blocks, v + Vector(2, 0, 0), bld.odd_delay_buildblock)
     
-    forward.rotate()
+    forward = forward.rotated()
     v += forward
     return v
 
 # v is the coordinate of the block before the andesite/even gt repeater, at the bottom
 # v + Vector(2, 0, 0) is the block before the granite/odd gt repeater
-def build_1gt_delayer(schem, v, forward):
+def build_1gt_delayer(blocks, v, forward):
     right = forward.rotated(positive_direction=False)
-    up = Vector(0, 1, 0)
-    bld.block_and_redstone(schem, v, bld.even_delay_buildblock)
-    bld.block_and_redstone(schem, v + right * 2, bld.odd_delay_buildblock)
+    up = UP
+    bld.block_and_redstone(blocks, v, bld.even_delay_buildblock)
+    bld.block_and_redstone(blocks, v + right * 2, bld.odd_delay_buildblock)
     v += forward
-    bld.block_and_redstone(schem, v - up, bld.even_delay_buildblock)
-    bld.block_and_redstone(schem, v + right * 2, bld.odd_delay_buildblock)
+    bld.block_and_redstone(blocks, v - up, bld.even_delay_buildblock)
+    bld.block_and_redstone(blocks, v + right * 2, bld.odd_delay_buildblock)
     v += forward
-    bld.block_and_repeater(schem, v - up, bld.even_delay_buildblock, -forward)
-    bld.block_and_redstone(schem, v + up, bld.start_line_buildblock, powered=True)
-    bld.block_and_repeater(schem, v + right, bld.start_line_buildblock, right, powered=True)
-    bld.block_and_repeater(schem, v + right * 2, bld.even_delay_buildblock, -forward, locked=True)
+    bld.block_and_repeater(blocks, v - up, bld.even_delay_buildblock, -forward)
+    bld.block_and_redstone(blocks, v + up, bld.start_line_buildblock, powered=True)
+    bld.block_and_repeater(blocks, v + right, bld.start_line_buildblock, right, powered=True)
+    bld.block_and_repeater(blocks, v + right * 2, bld.even_delay_buildblock, -forward, locked=True)
     v += forward
-    bld.block_and_repeater(schem, v - up, bld.even_delay_buildblock, -forward)
-    bld.block_and_redstone(schem, v + up, bld.start_line_buildblock, powered=True)
-    bld.setblock(schem, v + up + right * 2, f"observer[facing={bld.cardinal_direction(forward)}]")
+    bld.block_and_repeater(blocks, v - up, bld.even_delay_buildblock, -forward)
+    bld.block_and_redstone(blocks, v + up, bld.start_line_buildblock, powered=True)
+    bld.setblock(blocks, v + up + right * 2, bld.observer(forward))
     v += forward
-    bld.block_and_redstone(schem, v - up, bld.even_delay_buildblock)
-    bld.block_and_redstone(schem, v + up, bld.start_line_buildblock, powered=True)
-    bld.setblock(schem, v + right * 2, f"oak_trapdoor[facing={bld.cardinal_direction(-forward)},half=top]")
-    bld.setblock(schem, v + right * 2 + up, "scaffolding")
+    bld.block_and_redstone(blocks, v - up, bld.even_delay_buildblock)
+    bld.block_and_redstone(blocks, v + up, bld.start_line_buildblock, powered=True)
+    bld.setblock(blocks, v + right * 2, bld.trapdoor_top(-forward))
+    bld.setblock(blocks, v + right * 2 + up, bld.scaffolding)
     v += forward
-    bld.block_and_redstone(schem, v - up, bld.even_delay_buildblock)
-    bld.block_and_redstone(schem, v + up, bld.start_line_buildblock, powered=True)
-    bld.block_and_redstone(schem, v + right - up, bld.even_delay_buildblock)
-    bld.setblock(schem, v + right * 2, bld.even_delay_buildblock)
-    bld.setblock(schem, v + right * 2 + up, "scaffolding")
+    bld.block_and_redstone(blocks, v - up, bld.even_delay_buildblock)
+    bld.block_and_redstone(blocks, v + up, bld.start_line_buildblock, powered=True)
+    bld.block_and_redstone(blocks, v + right - up, bld.even_delay_buildblock)
+    bld.setblock(blocks, v + right * 2, bld.even_delay_buildblock)
+    bld.setblock(blocks, v + right * 2 + up, bld.scaffolding)
     v += forward
-    bld.block_and_redstone(schem, v, bld.start_line_buildblock, powered=True)
-    bld.block_and_repeater(schem, v + right - up, bld.start_line_buildblock, right, powered=True)
-    bld.block_and_repeater(schem, v + right * 2 - up, bld.start_line_buildblock, -forward, locked=True)
+    bld.block_and_redstone(blocks, v, bld.start_line_buildblock, powered=True)
+    bld.block_and_repeater(blocks, v + right - up, bld.start_line_buildblock, right, powered=True)
+    bld.block_and_repeater(blocks, v + right * 2 - up, bld.start_line_buildblock, -forward, locked=True)
     v += forward
-    bld.setblock(schem, v, bld.start_line_buildblock)
-    bld.setblock(schem, v + up, "redstone_torch")
-    bld.block_and_repeater(schem, v + right, bld.start_line_buildblock, right, powered=True)
-    bld.block_and_redstone(schem, v + right * 2, bld.start_line_buildblock, powered=True)
+    bld.setblock(blocks, v, bld.start_line_buildblock)
+    bld.setblock(blocks, v + up, bld.redstone_torch)
+    bld.block_and_repeater(blocks, v + right, bld.start_line_buildblock, right, powered=True)
+    bld.block_and_redstone(blocks, v + right * 2, bld.start_line_buildblock, powered=True)
     v += forward
     v -= up
     return v
 
-def build_glass_walkway(schem, player_pos, forward, one_gt_delayer_pos, length, depth, title, min_render_dist):
+def build_glass_walkway(blocks, player_pos, forward, one_gt_delayer_pos, length, depth, title, min_render_dist):
     right = forward.rotated(positive_direction=False)
-    up = Vector(0, 1, 0)
+    up = UP
     v = player_pos - up - forward
     for i in range(length + 2):
-        bld.setblock(schem, v, "glass")
-        bld.setblock(schem, v + right, "glass")
+        bld.setblock(blocks, v, bld.glass)
+        bld.setblock(blocks, v + right, bld.glass)
         v += forward
 
-    bld.setblock(schem, v + up - forward + right,
+    bld.setblock(blocks, v + up - forward + right, bld.block_id(
         "birch_sign[rotation=8]{"
         "Text1: '{\"text\":\"Created with\"}', "
         "Text2: '{\"text\":\"Note Block Studio\"}', "
         "Text3: '{\"text\":\"Render distance\"}', "
-        "Text4: '{\"text\":\"must be >= " + str(min_render_dist) + " !\"}'}")
+        "Text4: '{\"text\":\"must be >= " + str(min_render_dist) + " !\"}'}"))
     # 15 characters for sure fit onto one row of the sign
     title = title.replace("'", "")
     title = title.replace("\"", "")
@@ -504,26 +666,26 @@ def build_glass_walkway(schem, player_pos, forward, one_gt_delayer_pos, length,
     title_2 = title[15:30]
     title_3 = title[30:45]
     title_4 = title[45:60]
-    bld.setblock(schem, v + up - forward,
+    bld.setblock(blocks, v + up - forward, bld.block_id(
         "birch_sign[rotation=8]{"
         "Text1: '{\"text\":\"" + title_1 + "\"}', "
         "Text2: '{\"text\":\"" + title_2 + "\"}', "
         "Text3: '{\"text\":\"" + title_3 + "\"}', "
-        "Text4: '{\"text\":\"" + title_4 + "\"}'}")
+        "Text4: '{\"text\":\"" + title_4 + "\"}'}"))
 
-    save_v = v.copy()
+    save_v = v
     for i in range(depth):
-        bld.setblock(schem, v, "glass")
-        bld.setblock(schem, v + right, "glass")
-        bld.setblock(schem, v + forward, "ladder")
-        bld.setblock(schem, v + forward + right, "ladder")
+        bld.setblock(blocks, v, bld.glass)
+        bld.setblock(blocks, v + right, bld.glass)
+        bld.setblock(blocks, v + forward, bld.ladder)
+        bld.setblock(blocks, v + forward + right, bld.ladder)
         v -= up
     
     v = save_v + right * 2
     forward = right
     goal = one_gt_delayer_pos
-    bld.setblock(schem, v, bld.start_line_buildblock)
-    bld.setblock(schem, v + up, f"stone_button[face=floor,facing={bld.cardinal_direction(forward)}]")
+    bld.setblock(blocks, v, bld.start_line_buildblock)
+    bld.setblock(blocks, v + up, bld.floor_stone_button(forward))
     v += forward
     v -= up
     # rc: redstone count, before the repeater, max 15
@@ -534,10 +696,10 @@ def build_glass_walkway(schem, player_pos, forward, one_gt_delayer_pos, length,
         diff_forward = goal.get_coord(forward) - v.get_coord(forward) + 1
         for i in range(diff_forward):
             if rc == 15 or (rc == 14 and i+2 == diff_forward):
-                bld.block_and_repeater(schem, v, bld.start_line_buildblock, forward)
+                bld.block_and_repeater(blocks, v, bld.start_line_buildblock, forward)
                 rc = 0
             else:
-                bld.block_and_redstone(schem, v, bld.start_line_buildblock)
+                bld.block_and_redstone(blocks, v, bld.start_line_buildblock)
                 rc += 1
                 if v.y > goal.y:
                     v -= up
@@ -547,7 +709,7 @@ def build_glass_walkway(schem, player_pos, forward, one_gt_delayer_pos, length,
         
         if rotation:
             v -= forward
-            forward.rotate(positive_direction=False)
+            forward = forward.rotated(positive_direction=False)
             v += forward
 
     assert v.y == goal.y, "Somehow the diorite line is not aligned well vertically!"
@@ -556,8 +718,8 @@ def build_glass_walkway(schem, player_pos, forward, one_gt_delayer_pos, length,
 # should be called after the majority of the building is done
 # min_y_block is needed for how far the ladder should go down
 # returns min_render_distance, min_y_block
-def calculate_min_render_distance_needed(schem):
-    schem_bounds = schem.getStructure().getBounds()
+def calculate_min_render_distance_needed(blocks):
+    schem_bounds = blocks.bounds()
     # assuming player is at 0,0,0 (that's the middle of the contraption)
     max_distance = max(-schem_bounds[0][0], -schem_bounds[0][2], schem_bounds[1][0], schem_bounds[1][2])
     # https://minecraft.fandom.com/wiki/Chunk#Level_and_load_type
@@ -568,7 +730,47 @@ def calculate_min_render_distance_needed(schem):
     return max_distance // 16 + 2, schem_bounds[0][1]
 
 
-def build_contraption(schem, lines, left_width, middle_width, right_width, height, title, use_redstone_lamp):
+# runs in a worker process: builds the spiral of line into a buffer of its own
+# returns it serialized, and the wall and CPU time it took
+def _build_line_delays(line, turns):
+    wall = perf_counter()
+    cpu = process_time()
+    line._blocks = BlockBuffer()
+    line.build_delays(turns)
+    return line._blocks.to_bytes(), perf_counter() - wall, process_time() - cpu
+
+"""
+the same as calling build_delays of every line one after another, but on jobs worker processes
+the spirals are independent of each other, so every line is built into its own buffer by a worker,
+and the buffers are appended to blocks in the order of the lines, giving exactly the same placements
+the spirals of different lines must never place blocks on the same position,
+as the order of the placements would matter then: this is asserted while merging
+"""
+def build_delays_parallel(blocks, lines, all_turns, jobs=None, profile=NULL_PROFILER):
+    workers = jobs or cpu_count() or 1
+    # a few chunks per worker, so that a worker with long spirals doesn't hold up the others
+    chunksize = max(1, len(lines) // (4 * workers))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        spirals = []
+        for line, (data, wall, cpu) in zip(lines, executor.map(_build_line_delays, lines, all_turns, chunksize=chunksize)):
+            profile.add("build_delays", wall, cpu, line)
+            spirals.append(BlockBuffer.from_bytes(data))
+    keys = [spiral.position_keys() for spiral in spirals]
+    owners = np.repeat(np.arange(len(spirals)), [len(k) for k in keys])
+    keys = np.concatenate(keys)
+    order = np.argsort(keys, kind="stable")
+    shared = np.flatnonzero(keys[order][1:] == keys[order][:-1])
+    if len(shared) > 0:
+        first, second = lines[owners[order[shared[0]]]], lines[owners[order[shared[0] + 1]]]
+        assert False, f"The spirals overlap on {len(shared)} positions, e.g. of the lines in col {first.col} row {first.row} and col {second.col} row {second.row}!"
+    for spiral in spirals:
+        blocks.extend(spiral)
+
+# jobs: how many worker processes build the spirals of the lines (None: one per CPU core), with 1 everything is built in this process
+# blocks can also be a block_buffer.CountingBuffer, then the spirals are only estimated, see SplitLine.estimate_delays
+# returns the render distance that is recommended on the sign
+# profile is a profiler.Profiler, that records the time of the stages, and of every line
+def build_contraption(blocks, lines, left_width, middle_width, right_width, height, title, use_redstone_lamp, jobs=1, profile=NULL_PROFILER):
     width = left_width + middle_width + right_width
     assert 1 <= len(lines) <= width * height, f"There are {len(lines)} lines, but only {width * height} places for them!"
     view_distance = max(left_width, right_width, middle_width) # this is the space between player pos and middle side
@@ -580,7 +782,7 @@ def build_contraption(schem, lines, left_width, middle_width, right_width, heigh
             v = upper_left_corner + forward * col
             # every 2nd column starts deeper because of the zig-zag
             if col % 2 == 1:
-                v.y -= 2
+                v -= UP * 2
             # if height is even then max_row=height//2 everytime, if height is odd then every 2nd time we leave one out (zig-zag)
             for row in range((height + (1 - col % 2)) // 2):
                 # if there aren't any more lines:
@@ -589,7 +791,7 @@ def build_contraption(schem, lines, left_width, middle_width, right_width, heigh
                 # this is needed for the turn:
                 dist_to_middle = 0 if side == "middle" else (2 * width - col if side == "left" else col + 1)
                 real_col = prev_width + col // 2 # not taking the zig-zagging into account, meaning one column here is 2 blocks wide
-                lines[index].begin_circuit(schem, v - Vector(0, 4 * row, 0), forward.rotated(), side, dist_to_middle, 2*row + col%2, height, real_col, col//2, width)
+                lines[index].begin_circuit(blocks, v - Vector(0, 4 * row, 0), forward.rotated(), side, dist_to_middle, 2*row + col%2, height, real_col, col//2, width)
                 index += 1
         return index
     
@@ -600,42 +802,60 @@ def build_contraption(schem, lines, left_width, middle_width, right_width, heigh
     left_side_x = player_pos.x + middle_width + 1
     right_side_x = player_pos.x - middle_width
     
-    left_side_upper_left_corner = Vector(left_side_x, player_pos.y + height, middle_side_z - 2 * left_width + 1)
-    index = begin_lines(left_side_upper_left_corner, 0, left_width, height, Vector(0, 0, 1), lines, 0, "left")
-    middle_side_upper_left_corner = Vector(left_side_x - 1, player_pos.y + height, middle_side_z)
-    index = begin_lines(middle_side_upper_left_corner, left_width, middle_width, height, Vector(-1, 0, 0), lines, index, "middle")
-    right_side_upper_left_corner = Vector(right_side_x, player_pos.y + height, middle_side_z)
-    index = begin_lines(right_side_upper_left_corner, left_width + middle_width, right_width, height, Vector(0, 0, -1), lines, index, "right")
-    assert index == len(lines), f"Something went wrong with beginning the lines, index until built is {index} but the amount of lines is {len(lines)}"
-    
-    lines[-1].last_note_fill_remaining()
+    with profile.stage("begin_lines"):
+        left_side_upper_left_corner = Vector(left_side_x, player_pos.y + height, middle_side_z - 2 * left_width + 1)
+        index = begin_lines(left_side_upper_left_corner, 0, left_width, height, Vector(0, 0, 1), lines, 0, "left")
+        middle_side_upper_left_corner = Vector(left_side_x - 1, player_pos.y + height, middle_side_z)
+        index = begin_lines(middle_side_upper_left_corner, left_width, middle_width, height, Vector(-1, 0, 0), lines, index, "middle")
+        right_side_upper_left_corner = Vector(right_side_x, player_pos.y + height, middle_side_z)
+        index = begin_lines(right_side_upper_left_corner, left_width + middle_width, right_width, height, Vector(0, 0, -1), lines, index, "right")
+        assert index == len(lines), f"Something went wrong with beginning the lines, index until built is {index} but the amount of lines is {len(lines)}"
+        
+        lines[-1].last_note_fill_remaining()
 
     shallow_depth = max(left_width, right_width)
     # the 2*2 * shallow_depth is the max amount of blocks the signal needs to travel,
     # but at the 2 ends they may place the repeater 1 block sooner, hence +2
     turn_max_delay = (2*2 * shallow_depth + 2) // 16 + 1 # +1 for the extra repeater at the end
+    estimating = isinstance(blocks, CountingBuffer)
     for line in lines:
-        line.build_noteblock(use_redstone_lamp)
-        line.build_side_turn(turn_max_delay)
-        line.build_vertical_adjustment()
-        line.build_horizontal_adjustment()
+        if estimating: # the blocks are only counted, see SplitLine.estimate_noteblock
+            line.estimate_noteblock(use_redstone_lamp)
+            line.estimate_side_turn(turn_max_delay)
+            line.estimate_vertical_adjustment()
+            line.estimate_horizontal_adjustment()
+            line.add_delay_for_vertical_connection()
+            continue
+        with profile.line(line, "build_noteblock"):
+            line.build_noteblock(use_redstone_lamp)
+        with profile.line(line, "build_side_turn"):
+            line.build_side_turn(turn_max_delay)
+        with profile.line(line, "build_adjustments"):
+            line.build_vertical_adjustment()
+            line.build_horizontal_adjustment()
         line.add_delay_for_vertical_connection()
     
-    bottom_connection_pos = build_vertical_connection(schem, lines[0].get_pos() + Vector(2, 3, 0), height)
-    bottom_connection_pos = build_1gt_delayer(schem, bottom_connection_pos, Vector(0, 0, -1))
+    with profile.stage("vertical_connection"):
+        bottom_connection_pos = build_vertical_connection(blocks, lines[0].get_pos() + Vector(2, 3, 0), height)
+        bottom_connection_pos = build_1gt_delayer(blocks, bottom_connection_pos, Vector(0, 0, -1))
     # glass walkway length, at least one block, otherwise just enough to go around the left side:
     walkway_length = max(1, left_width * 2 - view_distance)
     
     # there will be a repeater every 4th block on the horizontal line that gives the signal to the whole thing
     junction_delay = (width - 1) // 2 
     for line in lines:
-        line.build_junction(junction_delay)
+        if estimating:
+            line.estimate_junction(junction_delay)
+            continue
+        with profile.line(line, "build_junction"):
+            line.build_junction(junction_delay)
     
     # 2, because the start button redstone line needs to have space
     begin_z = player_pos.z - max(right_width * 2 - view_distance, 2 + walkway_length)
     current_z = lines[0].get_pos().z
     # this much spacing will be applied behind the player, >=0, there will be 3 blocks of space with =0 (for the start signal):
     additional_spacing = 8
+    all_turns = []
     for line in lines:
         # finding out where each line needs to turn:
         turns = []
@@ -660,8 +880,21 @@ def build_contraption(schem, lines, left_width, middle_width, right_width, heigh
             turns.append(x_difference + 4 * line.col)
             sum_of_blocks_in_turns += x_difference + 4 * line.col
             x_difference += 2 * width
-        line.build_delays(turns)
+        all_turns.append(turns)
+    if estimating:
+        for line, turns in zip(lines, all_turns):
+            line.estimate_delays(turns)
+    elif jobs == 1:
+        for line, turns in zip(lines, all_turns):
+            with profile.line(line, "build_delays"):
+                line.build_delays(turns)
+    else:
+        with profile.stage("build_delays_parallel"):
+            build_delays_parallel(blocks, lines, all_turns, jobs, profile)
 
-    min_render_dist, min_y_block = calculate_min_render_distance_needed(schem)
-    ladder_length = -min_y_block
-    build_glass_walkway(schem, player_pos, Vector(0, 0, -1), bottom_connection_pos, walkway_length, ladder_length, title, min_render_dist)
+    # this is also where the stamped delays are expanded (see BlockBuffer.stamp), when the bounds are needed
+    with profile.stage("glass_walkway"):
+        min_render_dist, min_y_block = calculate_min_render_distance_needed(blocks)
+        ladder_length = -min_y_block
+        build_glass_walkway(blocks, player_pos, Vector(0, 0, -1), bottom_connection_pos, walkway_length, ladder_length, title, min_render_dist)
+    return min_render_dist
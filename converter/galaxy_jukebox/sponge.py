@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+
+import numpy as np
+from shutil import copyfileobj
+from tempfile import TemporaryFile
+from nbtlib import parse_nbt
+from .nbt import NbtWriter
+from .parallel_gzip import gzip_writer
+from .volume import Volume, block_state, block_name, resolve_regions
+
+DATA_VERSION_1_14 = 1952 # the same as mcschematic's Version.JE_1_14
+
+"""
+varint encodes every value of the numpy array values (which are all nonnegative), returns bytes
+instead of going value by value, it goes byte by byte: every value needs at most 5 bytes, and
+the k-th bytes of all the values that are long enough are scattered into place in one numpy operation
+it works on chunk values at a time, so the temporary arrays stay small even for huge volumes
+"""
+def encode_varints(values, chunk=1 << 20):
+    if len(values) == 0 or values.max() < 0x80: # one byte each, the common case
+        return values.astype(np.uint8).tobytes()
+    return b"".join(_encode_varint_chunk(values[i:i + chunk].astype(np.uint32)) for i in range(0, len(values), chunk))
+
+def _encode_varint_chunk(values):
+    lengths = np.ones(len(values), dtype=np.int32)
+    for k in range(1, 5):
+        lengths += values >= (1 << (7 * k))
+    ends = np.cumsum(lengths, dtype=np.int32)
+    starts = ends - lengths
+    encoded = np.empty(int(ends[-1]), dtype=np.uint8)
+    for k in range(int(lengths.max())):
+        long_enough = lengths > k
+        part = (values[long_enough] >> (7 * k)) & 0x7f
+        continued = (lengths[long_enough] > k + 1).astype(np.uint8) << 7
+        encoded[starts[long_enough] + k] = part.astype(np.uint8) | continued
+    return encoded.tobytes()
+
+# the NBT of a block entity in a sponge schematic: the block's own NBT, its position and its id
+def _write_block_entity(writer, x, y, z, block):
+    for name, tag in parse_nbt(block[len(block_state(block)):]).items():
+        writer.tag(name, tag)
+    writer.int_array("Pos", (x, y, z))
+    writer.string("Id", block_name(block))
+    writer.end()
+
+"""
+writes volume (a Volume, or a BlockBuffer which is resolved into one) into path as a gzipped
+sponge schematic (version 2), the same layout MCSchematic.save writes
+the file doesn't depend on when or where it was written (no gzip mtime or file name), so the same song gives the same bytes
+a BlockBuffer is resolved region_layers Y layers at a time (see volume.resolve_regions), and the encoded block data
+is spilled into a temporary file, then streamed into the schematic, so the memory needed for writing depends on
+the size of a region, not of the whole schematic (on the benchmarks, one layer was also the fastest)
+compress_level is the gzip level (0-9), compress_threads is how many threads compress it (see parallel_gzip.gzip_writer)
+"""
+def save_schematic(volume, path, data_version=DATA_VERSION_1_14, region_layers=1, compress_level=9, compress_threads=1):
+    if not isinstance(volume, Volume):
+        volume = resolve_regions(volume, region_layers)
+    width, height, length = volume.size
+    assert max(volume.size) <= 0xffff, f"The schematic is too big ({width}x{height}x{length}), a side can be 65535 blocks at most!"
+    if isinstance(volume.blocks, np.ndarray):
+        block_data = encode_varints(volume.blocks)
+        block_data_length = len(block_data)
+    else: # the regions
+        block_data = TemporaryFile()
+        for region in volume.blocks:
+            block_data.write(encode_varints(region))
+        block_data_length = block_data.tell()
+        block_data.seek(0)
+
+    with open(path, "wb") as raw, gzip_writer(raw, compress_level, compress_threads) as out:
+        writer = NbtWriter(out)
+        writer.compound("Schematic")
+        writer.int("Version", 2)
+        writer.int("DataVersion", data_version)
+        writer.compound("Metadata")
+        writer.int("WEOffsetX", volume.origin[0])
+        writer.int("WEOffsetY", volume.origin[1])
+        writer.int("WEOffsetZ", volume.origin[2])
+        writer.end()
+        # sizes are unsigned shorts, though the tag is signed
+        writer.short("Height", height - 0x10000 if height > 0x7fff else height)
+        writer.short("Length", length - 0x10000 if length > 0x7fff else length)
+        writer.short("Width", width - 0x10000 if width > 0x7fff else width)
+        writer.int("PaletteMax", len(volume.states))
+        writer.compound("Palette")
+        for state_id, state in enumerate(volume.states):
+            writer.int(state, state_id)
+        writer.end()
+        if isinstance(block_data, bytes):
+            writer.byte_array("BlockData", block_data)
+        else:
+            writer.byte_array_header("BlockData", block_data_length)
+            with block_data:
+                copyfileobj(block_data, out, 1 << 20)
+        writer.compound_list("BlockEntities", len(volume.block_entities))
+        for x, y, z, block in volume.block_entities:
+            _write_block_entity(writer, x, y, z, block)
+        writer.end()
@@ -1,5 +1,8 @@
 #!/usr/bin/env python3
 
+import numpy as np
+from .nbs import SongTicks, song_ticks
+
 # represents the noteblocks of a certain instrument and pitch
 # may need to be split (further), because it may contain more than one of the same note playing at once
 # or for other reasons
@@ -21,72 +24,146 @@ class UnsplitLine:
     
     def is_empty(self):
         return not self.ticks
-    
-    # splits this line into 2 lines, one with even and one with odd (game)tick values
-    def _split_even(self):
-        new_line = UnsplitLine(self.key, self.instrument)
-        evenness = next(iter(self.ticks)) % 2 # first key in dict
-        for tick in list(self.ticks): # list of keys, so that we can safely remove elements
-            if tick % 2 != evenness:
-                new_line.add_note(tick, count=self.ticks[tick])
-                self.ticks.pop(tick)
-        return [self] if new_line.is_empty() else [self, new_line]
-    
-    # splits off one line, that is returned, that is fully split and can be converted to a SplitLine later
-    # self's ticks have to have the same parity already
-    def _split_further(self):
-        new_line = UnsplitLine(self.key, self.instrument)
-        previous = -42 # there can't be 2 notes closer to each other than 4 gameticks
-        for tick in sorted(self.ticks): # this creates a list, we can safely remove elements from ticks
-            if previous + 4 <= tick:
-                previous = tick
-                new_line.add_note(tick)
-                if self.ticks[tick] > 1:
-                    self.ticks[tick] -= 1
-                else:
-                    self.ticks.pop(tick)
-        return new_line
-    
-    # we need to split this line if
-    # 1) there are both odd and even tick delays (_split_even) or
-    # 2) there are more than 1 notes playing at the same time (_split_further) or
-    # 3) there is a 2 tick delay somewhere (_split_further)
-    def split(self):
-        assert not self.is_empty(), f"Empty {self} cannot be split!" # assert: true is good, false is bad
-        lines_halfsplit = self._split_even()
-        processed_lines = []
-        for line in lines_halfsplit:
-            assert len(set(k % 2 for k in line.ticks)) == 1, f"All keys should have the same parity, but they don't: {line}"
-            while not line.is_empty():
-                new_line = line._split_further()
-                assert all(count == 1 for count in new_line.ticks.values()), f"All values should be one (the line should be fully split), but they aren't: {line}"
-                processed_lines.append(new_line)
-        return processed_lines
 
-# needs a pynbs.File song and
-# gives back a list of UnsplitLines that are ready to be converted to SplitLines
-# separates the different instrument-pitch noteblocks from the song
-# after that it also splits these into multiple lines if needed
-def lines_from_song(song, override_tempo=-1):
+"""
+splits the notes of one instrument-pitch pair into lines that can be built:
+every line gets either only even or only odd gameticks, and at most one note every 4 gameticks
+ticks is a sorted numpy array of distinct gameticks, counts is how many notes play at each of them
+returns the list of the (sorted numpy) tick arrays of the lines, the lines with first_parity come first
+the lines are split off greedily, one by one: a line takes the earliest note, and then always the next note
+that's at least 4 gameticks after the previous one; with the parities separated, the ticks are 2 apart
+at least, so a line takes every second tick of every run of ticks that are exactly 2 apart, which is done
+for all the ticks at once here, instead of tick by tick
+this gives the least possible number of lines (see min_line_count): of 2 ticks that are 2 apart, one is
+always taken, so every 4 gametick window that has the most notes loses one, and so does a tick on its own
+"""
+def split_ticks(ticks, counts, first_parity):
+    lines = []
+    for parity in [first_parity, 1 - first_parity]:
+        same_parity = ticks % 2 == parity
+        remaining, remaining_counts = ticks[same_parity], counts[same_parity]
+        line_count = len(lines) + _min_same_parity_line_count(remaining, remaining_counts)
+        while len(remaining) > 0:
+            index = np.arange(len(remaining))
+            run_start = np.empty(len(remaining), dtype=bool)
+            run_start[0] = True
+            np.not_equal(np.diff(remaining), 2, out=run_start[1:])
+            first_of_run = np.maximum.accumulate(np.where(run_start, index, 0))
+            taken = (index - first_of_run) % 2 == 0
+            line = remaining[taken]
+            assert len(line) == 1 or np.diff(line).min() >= 4, f"The line should be fully split, but it isn't: {line}"
+            lines.append(line)
+            remaining_counts = remaining_counts - taken
+            left = remaining_counts > 0
+            remaining, remaining_counts = remaining[left], remaining_counts[left]
+        assert len(lines) == line_count, f"The lines should have been split into {line_count} lines, but they were split into {len(lines)}!"
+    return lines
+
+# the most notes there are in a 4 gametick window (2 ticks that are 2 apart), the ticks have the same parity
+def _min_same_parity_line_count(ticks, counts):
+    if len(ticks) == 0:
+        return 0
+    window = counts.copy()
+    two_apart = np.diff(ticks) == 2
+    window[:-1][two_apart] += counts[1:][two_apart]
+    return int(window.max())
+
+"""
+the lower bound of how many lines the notes of one instrument-pitch pair (ticks and counts, like for
+split_ticks) need: even and odd ticks can't share a line, and notes closer than 4 gameticks to each other
+can't either, so it's the peak polyphony in a 4 gametick window, for both parities
+split_ticks reaches this, so this is exactly how many lines there will be
+"""
+def min_line_count(ticks, counts):
+    even = ticks % 2 == 0
+    return _min_same_parity_line_count(ticks[even], counts[even]) + _min_same_parity_line_count(ticks[~even], counts[~even])
+
+# the notes of song (pynbs.File or nbs.SongTicks) with the tempo fixed to 20tps, for every instrument-pitch pair:
+# key, instrument and the sorted numpy arrays of the distinct gameticks and the count of notes at each of them
+def song_gameticks(song, override_tempo=-1):
+    song, multiplier = _gametick_multiplier(song, override_tempo)
+    for (key, instrument), ticks in song.ticks.items():
+        gameticks = (0.5 + np.frombuffer(ticks, dtype=np.intc) * multiplier).astype(np.int64) # rounding
+        gameticks, counts = np.unique(gameticks, return_counts=True)
+        yield key, instrument, gameticks, counts
+
+# song as an nbs.SongTicks, and what its ticks have to be multiplied with to get gameticks
+def _gametick_multiplier(song, override_tempo):
+    if not isinstance(song, SongTicks):
+        song = song_ticks(song)
     # this is hardcoded as in NBS there isn't a 6.67 tps option, so
     # 6.75 almost always wants to mean every 3 gameticks
     if song.header.tempo == 6.75:
         song.header.tempo = 20/3
     # this is where we fix the tps to 20, so we multiply tick by this:
-    multiplier = 20 / (song.header.tempo if override_tempo == -1 else override_tempo)
-    lines = {} # indexed with (key, instrument)
-    for tick, chord in song:
-        for note in chord:
-            # skipping custom instruments (whose indices are above the vanilla noteblock count)
-            if note.instrument >= song.header.default_instruments:
-                continue
-            code = (note.key, note.instrument)
-            if code not in lines:
-                lines[code] = UnsplitLine(note.key, note.instrument)
-            lines[code].add_note(int(0.5 + tick * multiplier)) # rounding
+    return song, 20 / (song.header.tempo if override_tempo == -1 else override_tempo)
+
+"""
+the notes of song (pynbs.File or nbs.SongTicks) with the tempo fixed to 20tps, like song_gameticks, but
+of all the instrument-pitch pairs at once: a group is the gameticks of one pair with the same parity,
+2 * the index of the pair (in song.ticks) + the parity, returns the pairs ((key, instrument)), and
+the numpy arrays of the groups, the distinct gameticks and the count of notes at each of them, sorted by both
+"""
+def _song_groups(song, override_tempo):
+    song, multiplier = _gametick_multiplier(song, override_tempo)
+    pair_ticks = [np.frombuffer(ticks, dtype=np.intc) for ticks in song.ticks.values()]
+    if not pair_ticks:
+        return [], np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    gameticks = (0.5 + np.concatenate(pair_ticks) * multiplier).astype(np.int64) # rounding, the same way as song_gameticks
+    groups = 2 * np.repeat(np.arange(len(pair_ticks), dtype=np.int64), [len(ticks) for ticks in pair_ticks]) + gameticks % 2
+    keys, counts = np.unique(groups << 32 | gameticks, return_counts=True)
+    return list(song.ticks), keys >> 32, keys & 0xFFFFFFFF, counts
+
+# where the groups (see _song_groups) start, and how many lines each of them needs, see _min_same_parity_line_count
+def _group_line_counts(groups, gameticks, counts):
+    window = counts.copy()
+    two_apart = (np.diff(gameticks) == 2) & (groups[1:] == groups[:-1])
+    window[:-1][two_apart] += counts[1:][two_apart]
+    starts = np.flatnonzero(np.concatenate(([True], groups[1:] != groups[:-1])))
+    return starts, np.maximum.reduceat(window, starts)
+
+"""
+needs a pynbs.File or an nbs.SongTicks song and
+gives back a list of UnsplitLines that are ready to be converted to SplitLines
+separates the different instrument-pitch noteblocks from the song
+after that it also splits these into multiple lines if needed (see split_ticks), the lines of a pair are in
+the same order as split_ticks gives them, the parity of the first note first
+the groups that fit into one line (most of them) are taken as they are, without splitting them
+"""
+def lines_from_song(song, override_tempo=-1):
+    pairs, groups, gameticks, counts = _song_groups(song, override_tempo)
+    if len(groups) == 0:
+        return []
+    starts, line_counts = _group_line_counts(groups, gameticks, counts)
+    ends = np.append(starts[1:], len(groups)).tolist()
+    group_of = groups[starts].tolist()
+    first_ticks = gameticks[starts].tolist()
+    starts, line_counts = starts.tolist(), line_counts.tolist()
     split_lines = []
-    for line in lines.values():
-        split_lines += line.split()
+    index = 0
+    while index < len(starts):
+        pair = group_of[index] // 2
+        order = [index]
+        if index + 1 < len(starts) and group_of[index + 1] // 2 == pair: # both parities, the one with the first note first
+            order = [index, index + 1] if first_ticks[index] < first_ticks[index + 1] else [index + 1, index]
+        key, instrument = pairs[pair]
+        for group in order:
+            ticks = gameticks[starts[group]:ends[group]]
+            if line_counts[group] == 1:
+                lines = [ticks]
+            else:
+                lines = split_ticks(ticks, counts[starts[group]:ends[group]], group_of[group] % 2)
+            for line_ticks in lines:
+                line = UnsplitLine(key, instrument)
+                line.ticks = dict.fromkeys(line_ticks.tolist(), 1)
+                split_lines.append(line)
+        index += len(order)
     return split_lines
 
-
+# the least number of lines (so noteblocks) the song can be built with, the sum of min_line_count for every instrument-pitch pair
+def song_min_line_count(song, override_tempo=-1):
+    pairs, groups, gameticks, counts = _song_groups(song, override_tempo)
+    if len(groups) == 0:
+        return 0
+    starts, line_counts = _group_line_counts(groups, gameticks, counts)
+    return int(line_counts.sum())
@@ -1,57 +1,107 @@
 #!/usr/bin/env python3
 
-class Vector:
-    
-    def __init__(self, x, y, z):
-        self.x = x
-        self.y = y
-        self.z = z
-    
+from collections import namedtuple
+
+# immutable, and it is a tuple, so it can be used as a position (e.g. dict key) directly, without conversion
+# every operation returns a new Vector, for moving something around in place, see Cursor
+class Vector(namedtuple("Vector", "x y z")):
+    __slots__ = ()
+
     def __repr__(self):
         return f"v({self.x},{self.y},{self.z})"
-    
+
     def __add__(self, other):
         return Vector(self.x + other.x, self.y + other.y, self.z + other.z)
-    
+
     def __sub__(self, other):
         return Vector(self.x - other.x, self.y - other.y, self.z - other.z)
-    
+
     def __mul__(self, other):
         assert type(other) == int, "Only vector*integer is implemented!"
         return Vector(self.x * other, self.y * other, self.z * other)
-    
+
+    __rmul__ = __mul__ # otherwise int*vector would be tuple repetition
+
+    def __neg__(self):
+        negated = _negated.get(self)
+        return negated if negated is not None else Vector(-self.x, -self.y, -self.z)
+
+    # rotate 90° along the y axis, in + or - direction
+    # +x -> -z , +z -> +x if pos dir
+    # +x -> +z , +z -> -x if neg dir
+    def rotated(self, positive_direction=True):
+        rotated = _rotated[positive_direction].get(self)
+        if rotated is not None:
+            return rotated
+        dir = 1 if positive_direction else -1
+        return Vector(dir * self.z, self.y, -dir * self.x)
+
+    # direction is a vector with 2 coordinates being 0 and the 3rd one being +-1
+    def get_coord(self, direction):
+        return self.x * direction.x + self.y * direction.y + self.z * direction.z
+
+UP = Vector(0, 1, 0)
+DOWN = Vector(0, -1, 0)
+# the 4 horizontal directions, every one is the previous one rotated in + direction
+DIRECTIONS = (Vector(1, 0, 0), Vector(0, 0, -1), Vector(-1, 0, 0), Vector(0, 0, 1))
+
+# lookup tables, so that turning and negating the directions doesn't create new vectors
+_negated = {UP: DOWN, DOWN: UP}
+_rotated = {True: {}, False: {}}
+for i, d in enumerate(DIRECTIONS):
+    _negated[d] = DIRECTIONS[(i + 2) % 4]
+    _rotated[True][d] = DIRECTIONS[(i + 1) % 4]
+    _rotated[False][d] = DIRECTIONS[(i - 1) % 4]
+# the direction index of a horizontal direction in DIRECTIONS
+DIRECTION_INDEX = {d: i for i, d in enumerate(DIRECTIONS)}
+
+
+# a mutable position with a horizontal heading (forward), this is what walks along while building
+# moving it (advance, turn, +=, -=) happens in place, without creating any objects
+# it can be used as a position everywhere a Vector can, and cursor + vector gives a Vector
+class Cursor:
+    __slots__ = ("x", "y", "z", "forward", "backward")
+
+    def __init__(self, pos, forward):
+        self.x = pos.x
+        self.y = pos.y
+        self.z = pos.z
+        self.forward = DIRECTIONS[DIRECTION_INDEX[forward]] # the canonical object, so turning works by lookup
+        self.backward = -self.forward
+
+    def __repr__(self):
+        return f"c({self.x},{self.y},{self.z} facing {self.forward})"
+
+    def pos(self):
+        return Vector(self.x, self.y, self.z)
+
+    # moves n blocks forward (or backward if n is negative)
+    def advance(self, n=1):
+        self.x += n * self.forward.x
+        self.z += n * self.forward.z
+
+    # rotates the heading 90° along the y axis, like Vector.rotated
+    def turn(self, positive_direction=True):
+        self.forward = _rotated[positive_direction][self.forward]
+        self.backward = _negated[self.forward]
+
+    def __add__(self, other):
+        return Vector(self.x + other.x, self.y + other.y, self.z + other.z)
+
+    def __sub__(self, other):
+        return Vector(self.x - other.x, self.y - other.y, self.z - other.z)
+
     def __iadd__(self, other):
         self.x += other.x
         self.y += other.y
         self.z += other.z
         return self
-    
+
     def __isub__(self, other):
         self.x -= other.x
         self.y -= other.y
         self.z -= other.z
         return self
-    
-    def __neg__(self):
-        return Vector(-self.x, -self.y, -self.z)
-    
-    def copy(self):
-        return Vector(self.x, self.y, self.z)
-    
-    # rotate 90° along the y axis, in + or - direction
-    def rotate(self, positive_direction=True):
-        dir = 1 if positive_direction else -1
-        # +x -> -z , +z -> +x if pos dir
-        # +x -> +z , +z -> -x if neg dir
-        temp = self.x
-        self.x = dir * self.z
-        self.z = -dir * temp
-    
-    def rotated(self, positive_direction=True):
-        v = self.copy()
-        v.rotate(positive_direction=positive_direction)
-        return v
-    
-    # direction is a vector with 2 coordinates being 0 and the 3rd one being +-1
+
     def get_coord(self, direction):
         return self.x * direction.x + self.y * direction.y + self.z * direction.z
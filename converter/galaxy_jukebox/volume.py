@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+
+from tempfile import TemporaryFile
+import numpy as np
+from .builder import palette
+
+AIR = "minecraft:air"
+
+# the part of a block string before its NBT, e.g. birch_sign[rotation=8] for birch_sign[rotation=8]{Text1:...}
+def block_state(block):
+    nbt_start = block.find("{")
+    return block if nbt_start == -1 else block[:nbt_start]
+
+# the block id of a block string, e.g. birch_sign for birch_sign[rotation=8]{Text1:...}
+def block_name(block):
+    return block_state(block).split("[", 1)[0]
+
+# the namespaced id of the block entity of a block string (that has NBT), e.g. minecraft:sign for birch_sign[rotation=8]{...}
+def block_entity_id(block):
+    name = block_name(block)
+    if name.endswith("_sign"): # every wood shares the same block entity
+        name = "sign"
+    return name if ":" in name else "minecraft:" + name
+
+# the namespaced name and the properties (a dict of strings) of a block state, e.g. ("minecraft:repeater",
+# {"delay": "2", "facing": "north", "locked": "false"}) for repeater[delay=2,facing=north,locked=False]
+# the booleans are lowercase, as the game writes them (the sponge palette has them as they are in the builder)
+def parse_state(state):
+    name, _, properties = state.partition("[")
+    if ":" not in name:
+        name = "minecraft:" + name
+    parsed = {}
+    for prop in properties.rstrip("]").split(","):
+        if prop:
+            key, value = prop.split("=", 1)
+            parsed[key] = value.lower() if value in ("True", "False") else value
+    return name, parsed
+
+"""
+packs values (nonnegative numpy integers, each less than 2**bits) into 64 bit longs, the lowest bits first, a value
+can span two longs: this is the BlockStates of a litematic region, and of a chunk section before 1.16
+returns a numpy array of int64s
+"""
+def pack_bits(values, bits):
+    longs = np.zeros((len(values) * bits + 63) // 64, dtype=np.uint64)
+    # 64 values are exactly bits longs, so every chunk of a multiple of 64 values starts at the start of a long
+    chunk = 64 << 12
+    for begin in range(0, len(values), chunk):
+        part = values[begin:begin + chunk].astype("<u4").view(np.uint8).reshape(-1, 4)
+        value_bits = np.unpackbits(part, axis=1, bitorder="little")[:, :bits]
+        packed = np.packbits(value_bits.ravel(), bitorder="little")
+        packed = np.concatenate([packed, np.zeros(-len(packed) % 8, dtype=np.uint8)])
+        start = begin * bits // 64
+        longs[start:start + len(packed) // 8] = packed.view("<u8")
+    return longs.view(np.int64)
+
+# the count values of bits bits each, packed into longs (numpy int64s) the way pack_bits packs them, as a numpy array
+def unpack_bits(longs, bits, count):
+    value_bits = np.unpackbits(np.asarray(longs, dtype=np.int64).astype("<i8").view(np.uint8), bitorder="little")[:count * bits]
+    return (value_bits.reshape(count, bits).astype(np.uint32) << np.arange(bits, dtype=np.uint32)).sum(axis=1, dtype=np.uint32)
+
+"""
+the dense form of a BlockBuffer, this is what the output formats are written from
+origin: the -X -Y -Z corner in the buffer's coordinates
+size: (width, height, length), the extent along X, Y and Z
+blocks: flat numpy array of width*height*length local palette ids, in YZX order (x changes the fastest),
+        like in a sponge schematic
+states: the local palette, block state strings, states[0] is always air
+block_entities: (x, y, z, block string with NBT) for every block that has NBT, relative to origin,
+                in the order they were placed
+"""
+class Volume:
+
+    def __init__(self, origin, size, blocks, states, block_entities):
+        self.origin = origin
+        self.size = size
+        self.blocks = blocks
+        self.states = states
+        self.block_entities = block_entities
+
+    def __repr__(self):
+        return f"[Volume of {'x'.join(map(str, self.size))} at {self.origin} with {len(self.states)} states]"
+
+    # flat index (into blocks) of a position relative to origin
+    def index(self, x, y, z):
+        width, height, length = self.size
+        return (y * length + z) * width + x
+
+    """
+    resolves the placements of the buffer: the last placement wins on every position
+    the local palette ids are given out in the order of the first placement of every block state,
+    after air, the same way MCSchematic does it, but states that don't show up in the result are left out
+    """
+    @staticmethod
+    def from_buffer(blocks):
+        assert len(blocks) > 0, "There are no blocks to save!"
+        x = np.frombuffer(blocks.x, dtype=np.intc)
+        y = np.frombuffer(blocks.y, dtype=np.intc)
+        z = np.frombuffer(blocks.z, dtype=np.intc)
+        ids = np.frombuffer(blocks.block, dtype=np.intc)
+        origin = (int(x.min()), int(y.min()), int(z.min()))
+        size = (int(x.max()) - origin[0] + 1, int(y.max()) - origin[1] + 1, int(z.max()) - origin[2] + 1)
+        width, height, length = size
+        flat = ((y - origin[1]).astype(np.int64) * length + (z - origin[2])) * width + (x - origin[0])
+
+        # the last placement of every position is the first one in the reversed order
+        positions, first_reversed = np.unique(flat[::-1], return_index=True)
+        winners = len(flat) - 1 - first_reversed # record index of the placement that stays
+        winner_ids = ids[winners]
+
+        # the states that end up in the volume, numbered in the order they were first placed
+        placed_ids, first_placed = np.unique(ids, return_index=True)
+        surviving = set(block_state(palette[block]) for block in np.unique(winner_ids).tolist())
+        state_ids = {AIR: 0}
+        lookup = np.zeros(len(palette), dtype=np.uint32)
+        for block in placed_ids[np.argsort(first_placed, kind="stable")].tolist():
+            state = block_state(palette[block])
+            if state in surviving:
+                lookup[block] = state_ids.setdefault(state, len(state_ids))
+        states = list(state_ids)
+
+        dtype = np.uint8 if len(states) <= 0xff else np.uint16 if len(states) <= 0xffff else np.uint32
+        volume = np.zeros(width * height * length, dtype=dtype)
+        volume[positions] = lookup[winner_ids]
+
+        has_nbt = np.array(["{" in block for block in palette], dtype=bool)
+        block_entities = []
+        for record in np.sort(winners[has_nbt[winner_ids]]).tolist():
+            block_entities.append((int(x[record]) - origin[0], int(y[record]) - origin[1], int(z[record]) - origin[2],
+                                   palette[ids[record]]))
+        return Volume(origin, size, volume, states, block_entities)
+
+"""
+resolves the placements of blocks (a BlockBuffer) the same way as Volume.from_buffer, but region by region, without
+ever having the whole volume (or a temporary array of its size) in memory: a region is layers Y layers of it
+only the output side is bounded like this: the placements themselves stay in memory (they are in blocks), with an
+index of them sorted by Y (8 bytes per placement), which the regions are sliced from
+first the winning placements of every region are found, and spilled into a temporary file, then the states are
+numbered (the same as in from_buffer), and the regions are read back and filled in one by one
+returns a Volume, whose blocks is a generator of the regions instead of an array: the flat local palette ids of
+every region, in order (in YZX order, the same as the blocks of a Volume, cut into pieces)
+"""
+def resolve_regions(blocks, layers=16):
+    assert len(blocks) > 0, "There are no blocks to save!"
+    x = np.frombuffer(blocks.x, dtype=np.intc)
+    y = np.frombuffer(blocks.y, dtype=np.intc)
+    z = np.frombuffer(blocks.z, dtype=np.intc)
+    ids = np.frombuffer(blocks.block, dtype=np.intc)
+    origin = (int(x.min()), int(y.min()), int(z.min()))
+    size = (int(x.max()) - origin[0] + 1, int(y.max()) - origin[1] + 1, int(z.max()) - origin[2] + 1)
+    width, height, length = size
+    has_nbt = np.array(["{" in block for block in palette], dtype=bool)
+
+    # the placements sorted by Y once (stable, so the placements of a position stay in order), every region is a slice of it
+    order = np.argsort(y, kind="stable")
+    region_starts = np.searchsorted(y[order], origin[1] + np.arange(0, height + layers, layers)).tolist()
+
+    spill = TemporaryFile()
+    region_sizes = [] # the number of positions placed in every region
+    surviving_ids = set()
+    entity_records = []
+    for region, y_begin in enumerate(range(0, height, layers)):
+        records = order[region_starts[region]:region_starts[region + 1]]
+        flat = ((y[records] - (origin[1] + y_begin)).astype(np.int64) * length + (z[records] - origin[2])) * width + (x[records] - origin[0])
+        # the last placement of every position is the first one in the reversed order
+        positions, first_reversed = np.unique(flat[::-1], return_index=True)
+        winners = records[len(records) - 1 - first_reversed]
+        winner_ids = ids[winners]
+        surviving_ids.update(np.unique(winner_ids).tolist())
+        entity_records.append(winners[has_nbt[winner_ids]])
+        positions.tofile(spill)
+        winner_ids.astype(np.intc).tofile(spill)
+        region_sizes.append(len(positions))
+    del order
+
+    # the states that end up in the volume, numbered in the order they were first placed, like in from_buffer
+    first_placed = np.full(len(palette), len(ids), dtype=np.int64)
+    for begin in range(0, len(ids), 1 << 18): # in chunks, so that the temporary arrays of unique stay small
+        placed_ids, first_in_chunk = np.unique(ids[begin:begin + (1 << 18)], return_index=True)
+        np.minimum.at(first_placed, placed_ids, first_in_chunk + begin)
+    surviving = set(block_state(palette[block]) for block in surviving_ids)
+    state_ids = {AIR: 0}
+    lookup = np.zeros(len(palette), dtype=np.uint32)
+    placed_ids = np.flatnonzero(first_placed < len(ids))
+    for block in placed_ids[np.argsort(first_placed[placed_ids], kind="stable")].tolist():
+        state = block_state(palette[block])
+        if state in surviving:
+            lookup[block] = state_ids.setdefault(state, len(state_ids))
+    states = list(state_ids)
+    dtype = np.uint8 if len(states) <= 0xff else np.uint16 if len(states) <= 0xffff else np.uint32
+
+    block_entities = []
+    for record in np.sort(np.concatenate(entity_records)).tolist():
+        block_entities.append((int(x[record]) - origin[0], int(y[record]) - origin[1], int(z[record]) - origin[2],
+                               palette[ids[record]]))
+
+    def regions():
+        with spill:
+            spill.seek(0)
+            for y_begin, count in zip(range(0, height, layers), region_sizes):
+                positions = np.fromfile(spill, dtype=np.int64, count=count)
+                winner_ids = np.fromfile(spill, dtype=np.intc, count=count)
+                region = np.zeros(min(layers, height - y_begin) * length * width, dtype=dtype)
+                region[positions] = lookup[winner_ids]
+                yield region
+
+    return Volume(origin, size, regions(), states, block_entities)
+
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+
+from os import makedirs, stat, replace, remove, cpu_count, getpid, read, close
+from os.path import join, exists
+from glob import glob
+from time import monotonic, sleep
+from select import select
+from signal import signal, SIGINT, SIG_IGN
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from .batch import ConversionResult, output_paths, _convert_one
+from .exporters import FORMATS
+
+# the inotify events that mean a file in the directory may have changed
+_IN_MODIFY, _IN_CLOSE_WRITE, _IN_MOVED_TO, _IN_CREATE = 0x2, 0x8, 0x80, 0x100
+_IN_NONBLOCK = 0o4000
+
+# wakes the watcher up when something happens in a directory, with inotify (Linux only)
+# it only tells that something happened, the directory is scanned to see what
+class _Inotify:
+
+    def __init__(self, directory):
+        from ctypes import CDLL, get_errno
+        from ctypes.util import find_library
+        libc = CDLL(find_library("c"), use_errno=True)
+        self.fd = libc.inotify_init1(_IN_NONBLOCK)
+        assert self.fd >= 0, f"inotify_init1 failed with errno {get_errno()}"
+        if libc.inotify_add_watch(self.fd, directory.encode(), _IN_MODIFY | _IN_CLOSE_WRITE | _IN_MOVED_TO | _IN_CREATE) < 0:
+            close(self.fd)
+            raise OSError(get_errno(), f"inotify_add_watch failed on {directory}")
+
+    # waits at most timeout seconds for an event, returns whether there was one
+    def wait(self, timeout):
+        if not select([self.fd], [], [], timeout)[0]:
+            return False
+        try:
+            while read(self.fd, 1 << 16): # the events themselves don't matter
+                pass
+        except BlockingIOError:
+            pass
+        return True
+
+    def close(self):
+        close(self.fd)
+
+# an _Inotify for directory, or None if inotify isn't available (not Linux, or out of watches), then it's polled
+def _open_inotify(directory):
+    try:
+        return _Inotify(directory)
+    except (OSError, AttributeError, AssertionError, TypeError):
+        return None
+
+# what tells whether a file changed: its modification time and size
+def _signature(path):
+    try:
+        status = stat(path)
+    except FileNotFoundError:
+        return None
+    return status.st_mtime_ns, status.st_size
+
+# the workers leave Ctrl+C to the watcher, which lets the running conversions finish
+def _ignore_interrupts():
+    signal(SIGINT, SIG_IGN)
+
+# runs in the worker process: converts into a temporary file next to output, and moves it into place when it's complete,
+# so a half written schematic never shows up in the output directory (and a failed conversion leaves the old one there)
+def _convert_atomically(input, output, use_redstone_lamp, sides_mode, cache, layout_objective, line_order, output_format, compress_level, compress_threads):
+    extension = FORMATS[output_format][0]
+    temp_path = f"{output[:-len(extension)]}.{getpid()}.tmp{extension}"
+    result = _convert_one(input, temp_path, use_redstone_lamp, sides_mode, cache, layout_objective, line_order, output_format, compress_level, compress_threads)
+    try:
+        if result.ok:
+            replace(temp_path, output)
+        elif exists(temp_path):
+            remove(temp_path)
+    except OSError as e:
+        result.error = f"{type(e).__name__}: {e}"
+    result.output = output
+    return result
+
+"""
+watches in_dir, and converts every .nbs file directly inside it into out_dir (with the same name, like convert_many),
+whenever one is added or changed, until cancel (a threading.Event) is set, or the generator is closed
+a file is converted when it hasn't changed for debounce seconds, so an editor saving it a few times in a row,
+or a file that is still being copied, is converted only once, when it's done
+files whose output is already newer than them are not converted again at the start
+the songs are converted on jobs worker processes (None: one per CPU core), they are started once, and stay
+there, so a song doesn't have to wait for Python and the imports to start; the outputs are written atomically
+(see _convert_atomically), a song that is changed while it's converted is converted again afterwards
+the directory is watched with inotify on Linux, and polled every poll_interval seconds otherwise
+(and also with inotify, in case an event gets lost)
+this is a generator: a ConversionResult is yielded for every conversion as soon as it finishes, a failing song
+doesn't stop the watching
+the rest of the arguments are the same as for batch.convert_many
+"""
+def watch_folder(in_dir, out_dir, use_redstone_lamp=True, sides_mode=-1, jobs=None, cancel=None, cache=None, layout_objective=None, line_order="pitch",
+                 output_format="sponge", compress_level=9, compress_threads=1, debounce=0.5, poll_interval=1.0):
+    assert output_format in FORMATS and output_format != "anvil", f"Songs can't be watched and converted into {output_format}!"
+    makedirs(out_dir, exist_ok=True)
+    extension = FORMATS[output_format][0]
+    converted = {} # input path: the signature it had when its conversion was started
+    changed = {} # input path: (its signature, when it was first seen with it), for the changed ones waiting for the debounce
+    running = {} # future: (input path, signature)
+    for input in sorted(glob(join(in_dir, "*.nbs"))):
+        output_signature = _signature(output_paths([input], out_dir, extension)[0])
+        if output_signature is not None and output_signature[0] >= _signature(input)[0]:
+            converted[input] = _signature(input)
+
+    inotify = _open_inotify(in_dir)
+    executor = ProcessPoolExecutor(max_workers=max(1, jobs or cpu_count() or 1), initializer=_ignore_interrupts)
+    try:
+        while cancel is None or not cancel.is_set():
+            now = monotonic()
+            for input in sorted(glob(join(in_dir, "*.nbs"))):
+                signature = _signature(input)
+                if signature is None or converted.get(input) == signature:
+                    changed.pop(input, None)
+                elif changed.get(input, (None,))[0] != signature:
+                    changed[input] = (signature, now)
+            busy = set(input for input, signature in running.values())
+            for input, (signature, seen) in sorted(changed.items()):
+                if now - seen >= debounce and input not in busy:
+                    output = output_paths([input], out_dir, extension)[0]
+                    future = executor.submit(_convert_atomically, input, output, use_redstone_lamp, sides_mode, cache, layout_objective, line_order,
+                                             output_format, compress_level, compress_threads)
+                    running[future] = (input, signature)
+                    converted[input] = signature
+                    del changed[input]
+
+            # waiting for a conversion to finish, a change in the directory, or the next debounce to run out
+            timeout = poll_interval
+            if changed:
+                timeout = max(0.01, min(timeout, min(seen for signature, seen in changed.values()) + debounce - now))
+            if running:
+                done, pending = wait(running, timeout=0 if inotify is not None else timeout, return_when=FIRST_COMPLETED)
+                if inotify is not None and not done:
+                    inotify.wait(min(timeout, 0.1)) # the conversions are checked on regularly
+            else:
+                done = ()
+                if inotify is not None:
+                    inotify.wait(timeout)
+                else:
+                    sleep(timeout)
+            for future in done:
+                input, signature = running.pop(future)
+                try:
+                    yield future.result()
+                except Exception as e: # the worker process itself died (e.g. ran out of memory)
+                    yield ConversionResult(input, output_paths([input], out_dir, extension)[0], f"{type(e).__name__}: {e}")
+    finally:
+        if inotify is not None:
+            inotify.close()
+        executor.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,6 @@
+#!/usr/bin/env python3
+
+# the tests use the galaxy_jukebox next to this directory, not an installed one, like the benchmarks
+import sys
+from os.path import dirname, abspath
+sys.path.insert(0, dirname(dirname(abspath(__file__))))
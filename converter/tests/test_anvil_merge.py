@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+
+from io import BytesIO
+from zlib import decompress
+import numpy as np
+import pytest
+from nbtlib import File, Compound, Int
+from galaxy_jukebox.anvil import save_region_files, _chunk, _read_region, _write_region, ZLIB
+from galaxy_jukebox import builder as bld
+from galaxy_jukebox.block_buffer import BlockBuffer
+from galaxy_jukebox.volume import unpack_bits
+from galaxy_jukebox.sponge import DATA_VERSION_1_14
+
+# a region file of 2×2 chunks of stone from Y=0 to Y=31, with a chest at 1, 20, 1 and another at 20, 5, 20, all written at 12345
+def _stone_world(directory, data_version=DATA_VERSION_1_14):
+    stone = np.ones((16, 16, 16), dtype=np.uint8)
+    states = [("minecraft:air", {}), ("minecraft:stone", {})]
+    chunks = {}
+    for chunk_x in range(2):
+        for chunk_z in range(2):
+            entities = [(x, y, z, "chest{Items: []}") for x, y, z in [(1, 20, 1), (20, 5, 20)] if (x >> 4, z >> 4) == (chunk_x, chunk_z)]
+            chunks[(chunk_x, chunk_z)] = (ZLIB, _chunk(chunk_x, chunk_z, [(0, stone), (1, stone)], states, entities, data_version), 12345)
+    _write_region(f"{directory}/r.0.0.mca", chunks)
+
+# every block of the world (the first region file), by its position, and the block entities
+def _world_blocks(directory):
+    world = {}
+    entities = []
+    for (compression, data, timestamp) in _read_region(f"{directory}/r.0.0.mca").values():
+        level = File.parse(BytesIO(decompress(data)))["Level"]
+        for section in level["Sections"]:
+            palette = [str(entry["Name"]) for entry in section["Palette"]]
+            ids = unpack_bits(section["BlockStates"], max(4, (len(palette) - 1).bit_length()), 4096).reshape(16, 16, 16)
+            for (y, z, x), block_id in np.ndenumerate(ids):
+                world[(int(level["xPos"]) * 16 + x, int(section["Y"]) * 16 + y, int(level["zPos"]) * 16 + z)] = palette[block_id]
+        entities += [(int(entity["x"]), int(entity["y"]), int(entity["z"]), str(entity["id"])) for entity in level["TileEntities"]]
+    return world, entities
+
+# a 3×3×3 box (from 10, 18, 10 in the world), with a sign at its center and glass at its lowest corner
+def _contraption():
+    blocks = BlockBuffer()
+    blocks.place(0, 0, 0, bld.block_id("glass"))
+    blocks.place(1, 1, 1, bld.block_id("birch_sign[rotation=8]{Text1: '{\"text\":\"hi\"}'}"))
+    blocks.place(2, 2, 2, bld.block_id("air"))
+    return blocks
+
+def test_merging_keeps_everything_outside_the_box(tmp_path):
+    _stone_world(tmp_path)
+    save_region_files(_contraption(), str(tmp_path), offset=(10, 18, 10))
+    world, entities = _world_blocks(tmp_path)
+    for (x, y, z), block in world.items():
+        if 10 <= x < 13 and 18 <= y < 21 and 10 <= z < 13:
+            expected = {(10, 18, 10): "minecraft:glass", (11, 19, 11): "minecraft:birch_sign"}.get((x, y, z), "minecraft:air")
+        else:
+            expected = "minecraft:stone" if y < 32 else "minecraft:air"
+        assert block == expected, f"{block} at {x}, {y}, {z} instead of {expected}"
+    assert sorted(entities) == [(1, 20, 1, "minecraft:chest"), (11, 19, 11, "minecraft:sign"), (20, 5, 20, "minecraft:chest")]
+
+def test_newer_chunks_are_refused(tmp_path):
+    _stone_world(tmp_path, data_version=2586) # 1.16.5
+    before = (tmp_path / "r.0.0.mca").read_bytes()
+    with pytest.raises(AssertionError, match="can't be merged into"):
+        save_region_files(_contraption(), str(tmp_path), offset=(10, 18, 10))
+    assert (tmp_path / "r.0.0.mca").read_bytes() == before
+
+def test_untouched_chunks_keep_their_timestamps(tmp_path):
+    _stone_world(tmp_path)
+    save_region_files(_contraption(), str(tmp_path), offset=(10, 18, 10))
+    timestamps = {position: timestamp for position, (compression, data, timestamp) in _read_region(f"{tmp_path}/r.0.0.mca").items()}
+    assert timestamps[(1, 0)] == timestamps[(0, 1)] == timestamps[(1, 1)] == 12345
+    assert timestamps[(0, 0)] > 12345
+
+def test_newer_worlds_are_refused(tmp_path):
+    File({"Data": Compound({"DataVersion": Int(2586)})}, gzipped=True).save(tmp_path / "level.dat") # 1.16.5
+    with pytest.raises(AssertionError, match="can't be written into"):
+        save_region_files(_contraption(), str(tmp_path / "region"), offset=(10, 18, 10))
+    assert not (tmp_path / "region").exists()
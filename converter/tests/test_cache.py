@@ -0,0 +1,19 @@
+#!/usr/bin/env python3
+
+import pynbs
+from os import listdir
+from galaxy_jukebox.cache import ConversionCache
+from galaxy_jukebox.main import convert
+
+# the same song without a name in two files: the titles on the signs are the filenames, so they are different schematics
+def test_unnamed_songs_are_cached_by_filename(tmp_path):
+    song = pynbs.new_file()
+    song.notes.extend([pynbs.Note(tick=tick, layer=0, instrument=0, key=45 + tick % 12) for tick in range(0, 40, 2)])
+    song.save(str(tmp_path / "first.nbs"))
+    song.save(str(tmp_path / "second.nbs"))
+    assert (tmp_path / "first.nbs").read_bytes() == (tmp_path / "second.nbs").read_bytes()
+    cache = ConversionCache(str(tmp_path / "cache"))
+    for name in ["first", "second"]:
+        convert(str(tmp_path / f"{name}.nbs"), str(tmp_path / f"{name}.schem"), cache=cache)
+    assert (tmp_path / "first.schem").read_bytes() != (tmp_path / "second.schem").read_bytes()
+    assert sum(len(listdir(tmp_path / "cache" / prefix)) for prefix in listdir(tmp_path / "cache")) == 2
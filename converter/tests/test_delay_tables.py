@@ -0,0 +1,18 @@
+#!/usr/bin/env python3
+
+from galaxy_jukebox import builder as bld
+from galaxy_jukebox.block_buffer import BlockBuffer
+from galaxy_jukebox.vector import Vector, Cursor, DIRECTIONS
+
+def test_delay_tables_match_the_formula():
+    bld.check_delay_tables()
+
+# the delays that are really built are as long as the tables say, in every direction
+def test_built_delays_have_the_table_length():
+    for md in range(2, 10):
+        for delay in list(range(md, 60)) + [97, 500, 1001]:
+            for loopback in [True, False]:
+                forward = DIRECTIONS[(delay + md) % 4]
+                v = Cursor(Vector(0, 0, 0), forward)
+                bld.build_delay(BlockBuffer(), bld.building_material[0], v, delay, md, loopback)
+                assert v.get_coord(forward) == bld.get_delay_length(delay, md), f"Delay {delay} {md} {loopback} isn't as long as the table says!"
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+
+from random import Random
+from galaxy_jukebox import builder as bld
+from galaxy_jukebox.vector import Vector, DIRECTIONS
+from galaxy_jukebox.block_buffer import CountingBuffer
+from galaxy_jukebox.split_lines import SplitLine
+
+# the same line twice, at a random place of a random wall, see split_lines.build_contraption
+def _line_pair(rng):
+    max_row = rng.randint(1, 40)
+    max_col = rng.randint(1, 30)
+    row = rng.randrange(max_row)
+    side_col = rng.randrange(max_col)
+    side = rng.choice(["left", "middle", "right"])
+    col = side_col + (0 if side == "left" else rng.randint(1, 30))
+    dist_to_middle = 0 if side == "middle" else rng.randint(1, 2 * max_col)
+    ticks = sorted(rng.sample(range(4, 400, 4), 5))
+    odd = rng.randint(0, 1)
+    instrument = rng.randrange(len(bld.instrument_name))
+    pos = Vector(rng.randint(-50, 50), rng.randint(-50, 50), rng.randint(-50, 50))
+    forward = rng.choice(DIRECTIONS)
+    pair = []
+    for i in range(2):
+        line = SplitLine(45, instrument, [tick + odd for tick in ticks])
+        line.begin_circuit(CountingBuffer(), pos, forward, side, dist_to_middle, row, max_row, col, side_col, max_col)
+        pair.append(line)
+    return pair
+
+def _state(line):
+    v = line._cursor
+    return (v.x, v.y, v.z, v.forward), line._delays, len(line._blocks), line._blocks.bounds()
+
+# every estimate_* method counts the same blocks, in the same bounds, and leaves the line the same way as its build_* method
+def test_estimates_are_exact():
+    rng = Random(4)
+    for case in range(500):
+        built, estimated = _line_pair(rng)
+        use_redstone_lamp = rng.random() < 0.5
+        max_delay = rng.randint(10, 20)
+        built.build_noteblock(use_redstone_lamp)
+        estimated.estimate_noteblock(use_redstone_lamp)
+        assert _state(built) == _state(estimated), f"build_noteblock and estimate_noteblock differ in case {case}!"
+        built.build_side_turn(max_delay)
+        estimated.estimate_side_turn(max_delay)
+        assert _state(built) == _state(estimated), f"build_side_turn and estimate_side_turn differ in case {case}!"
+        built.build_vertical_adjustment()
+        estimated.estimate_vertical_adjustment()
+        assert _state(built) == _state(estimated), f"build_vertical_adjustment and estimate_vertical_adjustment differ in case {case}!"
+        built.build_horizontal_adjustment()
+        estimated.estimate_horizontal_adjustment()
+        assert _state(built) == _state(estimated), f"build_horizontal_adjustment and estimate_horizontal_adjustment differ in case {case}!"
+        built.build_junction(max_delay + 20)
+        estimated.estimate_junction(max_delay + 20)
+        assert _state(built) == _state(estimated), f"build_junction and estimate_junction differ in case {case}!"
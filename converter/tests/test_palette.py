@@ -0,0 +1,19 @@
+#!/usr/bin/env python3
+
+import pynbs
+from galaxy_jukebox import builder as bld
+from galaxy_jukebox.main import convert, estimate
+
+# a short song with title as its name
+def _song(title):
+    song = pynbs.new_file(song_name=title)
+    song.notes.extend([pynbs.Note(tick=tick, layer=0, instrument=0, key=45 + tick % 12) for tick in range(0, 40, 2)])
+    return song
+
+# the signs with the titles of the songs are interned while building, but not kept afterwards
+def test_converting_doesnt_grow_the_palette(tmp_path):
+    before = list(bld.palette)
+    for index in range(5):
+        convert(_song(f"Song number {index}"), str(tmp_path / f"{index}.schem"))
+        estimate(_song(f"Estimated song {index}"))
+    assert bld.palette == before
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+
+from random import Random
+from galaxy_jukebox import builder as bld
+from galaxy_jukebox.split_lines import SplitLine
+
+# the turns of a line in the first column of a 10 wide contraption, see split_lines.build_contraption
+def _turns(line, width=10):
+    turns = [2, 9]
+    z_difference = 40
+    x_difference = 2 * width + 13
+    while sum(turns) <= line.max_duration * 2 + 64:
+        turns += [z_difference, x_difference]
+        z_difference += 2 * width
+        x_difference += 2 * width
+    return turns
+
+# a line with notes notes, the gaps between them are random (at least 2 redstone ticks), odd is for an odd line
+def _random_line(rng, notes, odd=False, max_gap=40):
+    ticks = [rng.randrange(0, 20, 2)]
+    for i in range(notes - 1):
+        ticks.append(ticks[-1] + 2 * rng.randint(2, max_gap))
+    return SplitLine(45, 0, [tick + odd for tick in ticks]), ticks
+
+# the delay steps of the plan, grouped by the delay of the line they belong to: a delay that is split
+# at a turn is one or more pieces without loopback, then the last piece with the loopback
+def _planned_delays(plan):
+    delays = []
+    pieces = 0
+    for step in plan:
+        if step[0] == "delay":
+            pieces += step[1]
+            if step[3]:
+                delays.append(pieces)
+                pieces = 0
+    assert pieces == 0, "The plan ends with a delay without loopback!"
+    return delays
+
+def test_planned_delays_add_up_to_the_ticks():
+    rng = Random(0)
+    for case in range(200):
+        odd = case % 2 == 1
+        line, ticks = _random_line(rng, rng.randint(1, 60), odd, max_gap=rng.choice([3, 10, 60, 300]))
+        plan = line.plan_delays(_turns(line))
+        # the first delay starts at gametick -4, and a redstone tick is 2 gameticks
+        elapsed = -4
+        for delay, tick in zip(_planned_delays(plan), ticks):
+            elapsed += 2 * delay
+            assert elapsed == tick
+        assert len(_planned_delays(plan)) == len(ticks)
+
+def test_planned_pieces_respect_the_minimum_delay():
+    rng = Random(1)
+    for case in range(200):
+        line, ticks = _random_line(rng, rng.randint(1, 60), max_gap=rng.choice([3, 10, 60]))
+        for step in line.plan_delays(_turns(line)):
+            if step[0] == "delay":
+                delay, md = step[1], step[2]
+                assert delay >= min(md, 9), f"A piece of {delay} can't be built with md {md}!"
+
+def test_plan_turns_exactly_at_the_turns():
+    rng = Random(2)
+    for case in range(200):
+        line, ticks = _random_line(rng, rng.randint(1, 60), max_gap=rng.choice([3, 10, 60, 300]))
+        turns = _turns(line)
+        blocks = 0
+        turn_index = 0
+        for step in line.plan_delays(turns):
+            if step[0] == "delay":
+                blocks += bld.get_delay_length(step[1], step[2])
+            elif step[0] == "spacer":
+                blocks += 1
+            else:
+                assert blocks == turns[turn_index], f"Turn {turn_index} is after {blocks} blocks instead of {turns[turn_index]}!"
+                blocks = 0
+                turn_index += 1
+        assert blocks < turns[turn_index]
+
+def test_planning_is_linear(monkeypatch):
+    rng = Random(3)
+    # the work is counted in how many times the length of a delay is looked up (at least once for every piece of the plan),
+    # the same kind of line, 8 times longer, should need about 8 times as many (a quadratic planner would need 64 times)
+    lookups = 0
+    get_delay_length = bld.get_delay_length
+    def counting_get_delay_length(delay, md):
+        nonlocal lookups
+        lookups += 1
+        return get_delay_length(delay, md)
+    monkeypatch.setattr(bld, "get_delay_length", counting_get_delay_length)
+    counts = []
+    for notes in [1000, 8000]:
+        line, ticks = _random_line(rng, notes)
+        turns = _turns(line)
+        lookups = 0
+        plan = line.plan_delays(turns)
+        counts.append(lookups)
+        assert len(plan) <= 3 * notes + 4 * len(turns)
+        assert lookups <= 3 * (notes + len(turns)), f"Planning {notes} notes took {lookups} lookups!"
+    assert counts[1] < 10 * counts[0], f"Planning 8 times as many notes took {counts[1] / counts[0]:.1f} times as many lookups!"
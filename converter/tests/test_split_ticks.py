@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+
+from random import Random
+from array import array
+import numpy as np
+import pynbs
+from galaxy_jukebox.nbs import SongTicks
+from galaxy_jukebox.unsplit_lines import split_ticks, min_line_count, song_min_line_count, song_gameticks, lines_from_song
+
+# the simple way of splitting, like UnsplitLine.split did before split_ticks: the parity of the first tick first,
+# then the lines are split off one by one, every line takes the earliest tick that is at least 4 gameticks
+# after the previous one it took, and there's one note less at the ticks it took
+def _reference_split(ticks, counts, first_parity):
+    lines = []
+    for parity in [first_parity, 1 - first_parity]:
+        remaining = {tick: count for tick, count in zip(ticks, counts) if tick % 2 == parity}
+        while remaining:
+            line = []
+            previous = -42
+            for tick in sorted(remaining):
+                if previous + 4 <= tick:
+                    previous = tick
+                    line.append(tick)
+                    remaining[tick] -= 1
+                    if remaining[tick] == 0:
+                        del remaining[tick]
+            lines.append(line)
+    return lines
+
+# sorted distinct random ticks and their counts, dense or sparse, with chords or without
+def _random_ticks(rng):
+    length = rng.choice([10, 50, 400, 5000])
+    ticks = sorted(set(rng.randrange(length) for i in range(rng.randint(1, 300))))
+    max_count = rng.choice([1, 2, 5])
+    counts = [rng.randint(1, max_count) for tick in ticks]
+    return np.array(ticks, dtype=np.int64), np.array(counts, dtype=np.int64)
+
+def test_split_ticks_matches_the_reference():
+    rng = Random(0)
+    for case in range(3000):
+        ticks, counts = _random_ticks(rng)
+        first_parity = rng.randint(0, 1)
+        lines = split_ticks(ticks, counts, first_parity)
+        expected = _reference_split(ticks.tolist(), counts.tolist(), first_parity)
+        assert [line.tolist() for line in lines] == expected, f"Case {case} is split differently: {ticks.tolist()} {counts.tolist()}"
+
+def test_split_ticks_reaches_the_lower_bound():
+    rng = Random(1)
+    for case in range(1000):
+        ticks, counts = _random_ticks(rng)
+        lines = split_ticks(ticks, counts, int(ticks[0] % 2))
+        assert len(lines) == min_line_count(ticks, counts)
+        # every note is in exactly one line
+        placed = np.concatenate(lines)
+        assert sorted(placed.tolist()) == sorted(np.repeat(ticks, counts).tolist())
+
+# a song of random notes, with random instruments and pitches, at a random tempo
+def _random_song(rng):
+    header = pynbs.new_file(tempo=rng.choice([5, 6.75, 10, 20])).header
+    ticks = {}
+    for pair in range(rng.randint(0, 20)):
+        ticks[(rng.randrange(88), rng.randrange(16))] = array("i", (rng.randrange(rng.choice([10, 100, 2000])) for i in range(rng.randint(1, 200))))
+    return SongTicks(header, ticks)
+
+# all the instrument-pitch pairs at once give the same as one by one
+def test_song_min_line_count_is_the_sum_of_the_pairs():
+    rng = Random(2)
+    for case in range(200):
+        song = _random_song(rng)
+        expected = sum(min_line_count(gameticks, counts) for key, instrument, gameticks, counts in song_gameticks(song))
+        assert song_min_line_count(song) == expected, f"Case {case} has a different line count!"
+
+# all the instrument-pitch pairs at once give the same lines as splitting them one by one
+def test_lines_from_song_splits_every_pair():
+    rng = Random(3)
+    for case in range(200):
+        song = _random_song(rng)
+        expected = []
+        for key, instrument, gameticks, counts in song_gameticks(song):
+            for line_ticks in split_ticks(gameticks, counts, gameticks[0] % 2):
+                expected.append((key, instrument, line_ticks.tolist()))
+        lines = [(line.key, line.instrument, list(line.ticks)) for line in lines_from_song(song)]
+        assert lines == expected, f"Case {case} is split differently!"
@@ -5,17 +5,59 @@
 # https://doc.qt.io/qtforpython-5/PySide2/QtWidgets/QFileDialog.html
 
 from sys import argv
+from os import cpu_count
 from os.path import join, basename, splitext
 from pkgutil import get_data
+from threading import Event
 
-from PyQt5.QtCore import QCoreApplication, Qt
+from PyQt5.QtCore import QThread, Qt, pyqtSignal
 from PyQt5.QtGui import QPixmap
-from PyQt5.QtWidgets import QApplication, QPushButton, QFileDialog, QGridLayout, QLabel, QWidget, QComboBox, QCheckBox
+from PyQt5.QtWidgets import QApplication, QPushButton, QFileDialog, QGridLayout, QLabel, QWidget, QComboBox, QCheckBox, QProgressBar, QTableWidget, QTableWidgetItem, QHeaderView
 # upgrading to pyqt6 should be as easy as replacing 5 with 6 here, in the imports
 
-from galaxy_jukebox import convert
+from galaxy_jukebox import convert_many
 from . import __version__
 
+# runs the conversions on worker processes, so that the window isn't frozen while converting
+# the results are sent back to the ui thread through the signal, one by one, as they finish
+class ConversionThread(QThread):
+
+    result_ready = pyqtSignal(int, object) # index of the file in inputs, ConversionResult
+
+    def __init__(self, inputs, outputs, place_redstone_lamp, sides_mode, jobs):
+        super().__init__()
+        self.inputs = inputs
+        self.outputs = outputs
+        self.place_redstone_lamp = place_redstone_lamp
+        self.sides_mode = sides_mode
+        self.jobs = jobs
+        self.cancel = Event()
+
+    def run(self):
+        index_of = {output: i for i, output in enumerate(self.outputs)}
+        for result in convert_many(self.inputs, self.outputs, self.place_redstone_lamp, self.sides_mode, self.jobs, self.cancel):
+            self.result_ready.emit(index_of[result.output], result)
+
+# the main window, closing it while converting cancels the conversion, and hides the window: the files already
+# being converted are finished in the background (so that no half written schematic is left), and the application
+# quits when the conversion thread is done, it's not destroyed while it's running, and the window isn't frozen
+class Window(QWidget):
+
+    def __init__(self):
+        super().__init__()
+        self.conversion = None # the ConversionThread of the latest conversion
+
+    def closeEvent(self, event):
+        if self.conversion is not None and self.conversion.isRunning():
+            self.conversion.cancel.set()
+            self.conversion.finished.connect(QApplication.quit)
+            self.hide()
+            event.ignore()
+            if self.conversion.isFinished(): # it may have finished before the signal was connected
+                QApplication.quit()
+            return
+        event.accept()
+
 def main():
 
     def set_label_texts(bottom_text = ""):
@@ -63,21 +105,46 @@ def main():
             output_path = QFileDialog.getExistingDirectory(window, "Choose output folder", prev_file)
         set_label_texts()
 
-    def convert_files():
-        
-        def convert_one(input, output, place_redstone_lamp, sides_mode):
-            # adding extension if not present (only for the gui text, library would add it anyway)
-            if output[-6:] != ".schem":
-                output += ".schem"
-            set_label_texts("Converting\n" + input + "\ninto\n" + output)
-            # https://pythonassets.com/posts/background-tasks-with-pyqt/
-            QCoreApplication.processEvents() # so that the text is updated
-            try:
-                convert(input, output, place_redstone_lamp, sides_mode)
-                set_label_texts("Conversion done!")
-            except Exception as e:
-                set_label_texts("Conversion failed! Reason:\n" + str(e))
+    def set_row(index, status):
+        file_table.setItem(index, 1, QTableWidgetItem(status))
 
+    # the workers take the files in order, so the first few unfinished ones are the ones being converted
+    # after cancelling, the files that weren't started are reported first, the ones left after them are being converted
+    def mark_converting_rows():
+        converting = 0
+        for i in range(len(row_finished)):
+            if converting == workers and not conversion.cancel.is_set():
+                break
+            if not row_finished[i]:
+                set_row(i, "Converting...")
+                converting += 1
+
+    def on_result(index, result):
+        nonlocal finished, failed
+        finished += 1
+        row_finished[index] = True
+        if result.ok:
+            set_row(index, f"Done ({result.seconds:.1f}s)")
+        else:
+            failed += 1
+            set_row(index, "Cancelled" if result.error == "Cancelled" else "Failed: " + result.error)
+        mark_converting_rows()
+        progress_bar.setValue(finished)
+
+    def on_finished():
+        if conversion.cancel.is_set():
+            set_label_texts("Conversion cancelled!")
+        elif failed:
+            set_label_texts(f"Conversion done, {failed} of {finished} failed!")
+        else:
+            set_label_texts("Conversion done!")
+        input_button.setDisabled(False)
+        output_button.setDisabled(False)
+        convert_button.setDisabled(False)
+        cancel_button.setDisabled(True)
+
+    def convert_files():
+        nonlocal conversion, workers, finished, failed, row_finished
         if input_files == []:
             set_label_texts("No input provided!")
             return
@@ -85,31 +152,64 @@ def main():
             set_label_texts("No output provided!")
             return
 
+        if len(input_files) == 1:
+            outputs = [output_path]
+        else:
+            outputs = [join(output_path, splitext(basename(infile))[0]) for infile in input_files]
+        # adding extension if not present (only for the gui text, library would add it anyway)
+        outputs = [output if output[-6:] == ".schem" else output + ".schem" for output in outputs]
+
         # disabling buttons, and saving states, so the user can't break anything while the conversion is done
         input_button.setDisabled(True)
         output_button.setDisabled(True)
+        convert_button.setDisabled(True)
+        cancel_button.setDisabled(False)
         place_redstone_lamp = lamp_checkbox.isChecked()
         sides_mode = side_combobox.currentIndex()
         if sides_mode == 0:
             sides_mode = -1
 
-        if len(input_files) == 1:
-            convert_one(input_files[0], output_path, place_redstone_lamp, sides_mode)
-        else:
-            for infile in input_files:
-                convert_one(infile, join(output_path, splitext(basename(infile))[0]), place_redstone_lamp, sides_mode)
+        file_table.setRowCount(len(input_files))
+        for i, infile in enumerate(input_files):
+            file_table.setItem(i, 0, QTableWidgetItem(basename(infile)))
+            set_row(i, "Waiting")
+        finished = 0
+        failed = 0
+        row_finished = [False] * len(input_files)
+        progress_bar.setMaximum(len(input_files))
+        progress_bar.setValue(0)
+        set_label_texts(f"Converting into\n{output_path}")
 
-        input_button.setDisabled(False)
-        output_button.setDisabled(False)
+        # jobs=1 would convert in the conversion thread, but even a single file is better converted
+        # in a worker process, so that it doesn't compete with the window for the GIL
+        jobs = max(2, cpu_count() or 1)
+        workers = min(jobs, len(input_files))
+        conversion = ConversionThread(input_files, outputs, place_redstone_lamp, sides_mode, jobs)
+        window.conversion = conversion
+        mark_converting_rows()
+        conversion.result_ready.connect(on_result)
+        conversion.finished.connect(on_finished)
+        conversion.start()
+
+    def cancel_conversion():
+        if conversion is not None:
+            conversion.cancel.set()
+            cancel_button.setDisabled(True)
+            set_label_texts("Cancelling, waiting for the files already being converted...")
 
 
     input_files = []
     output_path = "" # directory if len(input_files) >1, file if =1, "" if not yet chosen
+    conversion = None # the ConversionThread of the latest conversion
+    workers = 0 # how many files the latest conversion converts at the same time
+    finished = 0 # how many files the latest conversion has finished, including the failed ones
+    failed = 0 # how many of those failed or got cancelled
+    row_finished = [] # for every file of the latest conversion, whether it has been finished
 
     app = QApplication(argv)
 
     # creating window
-    window = QWidget()
+    window = Window()
     window.setWindowTitle(f"Galaxy Jukebox GUI {__version__}")
     layout = QGridLayout()
     window.setLayout(layout)
@@ -151,12 +251,26 @@ def main():
     layout.addWidget(convert_button, 6, 0)
     convert_button.pressed.connect(convert_files)
 
+    cancel_button = QPushButton("Cancel")
+    layout.addWidget(cancel_button, 7, 0)
+    cancel_button.setDisabled(True)
+    cancel_button.pressed.connect(cancel_conversion)
+
 
     # creating right side
     right_label = QLabel()
-    layout.addWidget(right_label, 0, 1, 7, 1)
+    layout.addWidget(right_label, 0, 1, 4, 1)
     layout.setAlignment(right_label, Qt.AlignmentFlag.AlignTop)
     set_label_texts()
 
+    file_table = QTableWidget(0, 2)
+    layout.addWidget(file_table, 4, 1, 3, 1)
+    file_table.setHorizontalHeaderLabels(["File", "Status"])
+    file_table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
+    file_table.verticalHeader().setVisible(False)
+
+    progress_bar = QProgressBar()
+    layout.addWidget(progress_bar, 7, 1)
+
     window.show()
     app.exec()
@@ -1,6 +1,8 @@
 #!/usr/bin/env python3
 
+from multiprocessing import freeze_support
 from galaxy_jukebox_gui.gui import main
 
 if __name__ == '__main__':
+    freeze_support() # the conversions run in worker processes, which need this in a frozen executable
     main()